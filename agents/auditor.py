@@ -1,24 +1,63 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agents import gemini, tenants
 from agents.sovereign import nightly_audit
 from agents.calendar_sync import fetch_todays_events
+from agents.github_proxy import check_github_activity
 
-def run_audit():
+def run_audit(player_id=tenants.DEFAULT_PLAYER, github_username="Ayoub", mode=None):
     """Interactive function to collect user feedback and run the audit."""
-    print("\n--- 🌑 SHADOW SYSTEM: NIGHTLY AUDIT 🌑 ---")
+    started = time.perf_counter()
+    print(f"\n--- 🌑 SHADOW SYSTEM: NIGHTLY AUDIT ({player_id}) 🌑 ---")
     
-    # 1. Fetch Schedule
-    print("Scanning daily schedule...")
-    events = fetch_todays_events()
-    
-    logs = []
-    
-    # --- GITHUB PROXY CHECK ---
-    from agents.github_proxy import check_github_activity
-    has_code, git_summary = check_github_activity()
-    if has_code:
-        print(f"\n[PROXY] GitHub Activity Detected: {git_summary}")
-        logs.append(f"GITHUB AUTO-VERIFICATION: {git_summary} (Verify +Intelligence)")
-    # ---------------------------
+    # 1. Prefetch: calendar, GitHub and the Gemini connection load concurrently.
+    # Only the calendar gates the first question; the rest finishes while the user types.
+    prefetch = ThreadPoolExecutor(max_workers=3, thread_name_prefix="audit-prefetch")
+    try:
+        print("Scanning daily schedule...")
+        events_future = prefetch.submit(fetch_todays_events, player_id)
+        github_future = prefetch.submit(check_github_activity, github_username)
+        prefetch.submit(gemini.warm_up)
+        logs = _interview(events_future.result(), started)
+
+        # --- GITHUB PROXY CHECK ---
+        has_code, git_summary = github_future.result()
+        if has_code:
+            print(f"\n[PROXY] GitHub Activity Detected: {git_summary}")
+            logs.insert(0, f"GITHUB AUTO-VERIFICATION: {git_summary} (Verify +Intelligence)")
+        # ---------------------------
+    finally:
+        prefetch.shutdown(wait=False)  # A slow warm-up must not hold up the next prompt
+        
+    if not logs:
+        print("No activity recorded. System entering sleep mode.")
+        return
+
+    # 4. Proof of Quest (Vision)
+    image_path = None
+    proof_check = input("\nDo you have visual proof (screenshot/photo) for any quest? (y/n): ").strip().lower()
+    if proof_check in ['y', 'yes']:
+        path = input("Enter absolute path to image: ").strip('"').strip("'")
+        if os.path.exists(path):
+            image_path = path
+            logs.append(f"PROOF SUBMITTED: {path}")
+        else:
+            print("Image not found. Proceeding without proof.")
+
+    # 5. Submit to Sovereign
+    print("\n[SYSTEM] Analyzing performance patterns...")
+    try:
+        result = nightly_audit(logs, image_path, player_id, mode) # Pass image_path
+        print("\n--- 👑 SOVEREIGN VERDICT 👑 ---")
+        print(result)
+    except Exception as e:
+        print(f"Error communicating with Sovereign: {e}")
 
+def _interview(events, started):
+    """Asks about each event, then for extra activity. Returns the log lines."""
+    print(f"[SYSTEM] Ready in {time.perf_counter() - started:.2f}s (startup to first prompt).")
+    logs = []
     if not events:
         print("No specific events found in calendar.")
     
@@ -46,32 +85,8 @@ def run_audit():
     extra = input("Any other training, learning, or notes? (e.g., 'Read 50 pages of Java docs'): ")
     if extra:
         logs.append(f"EXTRA ACTIVITY: {extra}")
-        
-    if not logs:
-        print("No activity recorded. System entering sleep mode.")
-        return
-
-    # 4. Proof of Quest (Vision)
-    image_path = None
-    proof_check = input("\nDo you have visual proof (screenshot/photo) for any quest? (y/n): ").strip().lower()
-    if proof_check in ['y', 'yes']:
-        path = input("Enter absolute path to image: ").strip('"').strip("'")
-        if os.path.exists(path):
-            image_path = path
-            logs.append(f"PROOF SUBMITTED: {path}")
-        else:
-            print("Image not found. Proceeding without proof.")
 
-    # 5. Submit to Sovereign
-    print("\n[SYSTEM] Analyzing performance patterns...")
-    log_summary = "; ".join(logs)
-    
-    try:
-        result = nightly_audit(log_summary, image_path) # Pass image_path
-        print("\n--- 👑 SOVEREIGN VERDICT 👑 ---")
-        print(result)
-    except Exception as e:
-        print(f"Error communicating with Sovereign: {e}")
+    return logs
 
 if __name__ == "__main__":
     run_audit()
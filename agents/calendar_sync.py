@@ -1,5 +1,7 @@
 import datetime
 import os.path
+import threading
+import time
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -7,14 +9,49 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from agents import tenants
+
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
+# OAuth client secrets are shared; each player authorizes with their own token.json.
 CREDENTIALS_PATH = os.path.join(os.path.dirname(__file__), '../credentials.json')
-TOKEN_PATH = os.path.join(os.path.dirname(__file__), '../token.json')
+TOKEN_FILE = 'token.json'
+
+# Calendar mirror
+# Services are built once per player per process (from the discovery document
+# bundled with google-api-python-client, no network fetch) and reused;
+# google-auth refreshes their access token as needed. Events of the primary
+# calendar are mirrored into the player's DB (calendar_events). The first sync
+# lists every event (a syncToken from a timeMin-bounded list would not match
+# the later incremental calls); after that events.list is called with the
+# stored syncToken and returns only what changed. Only events from the last
+# MIRROR_DAYS_BACK days onwards are kept, filtered locally. start_date is the
+# event's day in the player's time zone (tenants.player_timezone).
+# fetch_todays_events / fetch_events_by_day read the mirror, syncing first only
+# if the last sync is older than SYNC_MAX_AGE.
+CALENDAR_ID = "primary"
+MIRROR_DAYS_BACK = 7
+SYNC_MAX_AGE = 300  # seconds
+
+_services = {}  # player_id -> service, or None when the player has no credentials
+_locks = {}     # player_id -> lock; service objects (httplib2) aren't thread-safe
+_registry_lock = threading.Lock()
 
-def get_calendar_service():
-    """Shows basic usage of the Google Calendar API."""
+def _player_lock(player_id):
+    with _registry_lock:
+        return _locks.setdefault(player_id, threading.RLock())
+
+def get_calendar_service(player_id=tenants.DEFAULT_PLAYER):
+    """Returns the player's cached Calendar service (None = mock mode)."""
+    with _player_lock(player_id):
+        if player_id not in _services:
+            _services[player_id] = _build_service(player_id)
+        return _services[player_id]
+
+def _build_service(player_id):
+    """Loads (or obtains) the player's credentials and builds the Calendar service."""
+    TOKEN_PATH = tenants.player_file(player_id, TOKEN_FILE)
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -39,51 +76,139 @@ def get_calendar_service():
             token.write(creds.to_json())
 
     try:
-        service = build("calendar", "v3", credentials=creds)
+        service = build("calendar", "v3", credentials=creds, static_discovery=True, cache_discovery=False)
         return service
     except HttpError as error:
         print(f"An error occurred: {error}")
         return None
 
-def fetch_todays_events():
-    """Fetches events for the current day."""
-    service = get_calendar_service()
+def _local_date(start, tz):
+    """YYYY-MM-DD of an event start in `tz` (None: local time). All-day dates are taken as is."""
+    if "T" not in start:
+        return start[:10]
+    return datetime.datetime.fromisoformat(start).astimezone(tz).date().isoformat()
+
+def _local_time(start, tz):
+    """HH:MM of an event start in `tz`, or "" for all-day events."""
+    if "T" not in start:
+        return ""
+    return datetime.datetime.fromisoformat(start).astimezone(tz).strftime("%H:%M")
+
+def _event_row(event, tz):
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    end = event.get("end", {})
+    return (event["id"], event.get("summary", "(No title)"), start, _local_date(start, tz),
+            end.get("dateTime", end.get("date")), event.get("updated"))
+
+def _store_events(conn, events, tz, cutoff):
+    """Mirrors `events`; cancelled ones and ones starting before `cutoff` (YYYY-MM-DD) are dropped."""
+    for event in events:
+        row = _event_row(event, tz) if event.get("status") != "cancelled" and "start" in event else None
+        if row is None or row[3] < cutoff:
+            conn.execute("DELETE FROM calendar_events WHERE event_id = ?", (event["id"],))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO calendar_events (event_id, summary, start_time, start_date, end_time, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)", row)
+
+def _mirror_cutoff(tz):
+    return (datetime.datetime.now(tz).date() - datetime.timedelta(days=MIRROR_DAYS_BACK)).isoformat()
+
+def _list_pages(service, **params):
+    """Yields pages of events.list; the last page carries nextSyncToken."""
+    page_token = None
+    while True:
+        page = service.events().list(calendarId=CALENDAR_ID, singleEvents=True,
+                                     pageToken=page_token, **params).execute()
+        yield page
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
+
+def sync_calendar(player_id=tenants.DEFAULT_PLAYER, force_full=False):
+    """Brings the player's calendar mirror up to date. Returns events received.
+
+    Incremental (syncToken) when possible; a full re-list on the first run,
+    when forced, or when Google expires the token (410 Gone).
+    """
+    service = get_calendar_service(player_id)
+    if not service:
+        return 0
+    with _player_lock(player_id):
+        try:
+            return _sync(service, player_id, force_full)
+        except HttpError as error:
+            if error.resp.status == 410 and not force_full:
+                return _sync(service, player_id, force_full=True)
+            raise
+
+def _sync(service, player_id, force_full):
+    # Nothing is committed until the last page is in: a failed sync leaves the old mirror.
+    with tenants.connection(player_id) as conn:
+        row = conn.execute("SELECT sync_token FROM calendar_sync_state WHERE calendar_id = ?",
+                           (CALENDAR_ID,)).fetchone()
+        sync_token = None if force_full or not row else row["sync_token"]
+        tz = tenants.player_timezone(player_id)
+        cutoff = _mirror_cutoff(tz)
+        if sync_token:
+            pages = _list_pages(service, syncToken=sync_token)
+        else:
+            conn.execute("DELETE FROM calendar_events")
+            pages = _list_pages(service)  # No timeMin: the syncToken must come from an unbounded list
+        conn.execute("DELETE FROM calendar_events WHERE start_date < ?", (cutoff,))
+        received = 0
+        for page in pages:
+            items = page.get("items", [])
+            _store_events(conn, items, tz, cutoff)
+            received += len(items)
+            sync_token = page.get("nextSyncToken", sync_token)
+        conn.execute(
+            "INSERT OR REPLACE INTO calendar_sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)",
+            (CALENDAR_ID, sync_token, time.time()))
+        conn.commit()
+    return received
+
+MOCK_EVENTS = ["Mock Event: Sambo Training at 18:00", "Mock Event: Deep Work at 20:00"]
+
+def fetch_events_by_day(player_id=tenants.DEFAULT_PLAYER, start=None, days=1):
+    """{YYYY-MM-DD: ["summary at start", ...]} for `days` days from `start` (default: the player's today).
+
+    Read from the local mirror; dates are the player's (tenants.player_timezone).
+    """
+    tz = tenants.player_timezone(player_id)
+    start = start or datetime.datetime.now(tz).date()
+    dates = [(start + datetime.timedelta(days=offset)).isoformat() for offset in range(days)]
+    service = get_calendar_service(player_id)
     if not service:
         # Mock data if no service
-        return ["Mock Event: Sambo Training at 18:00", "Mock Event: Deep Work at 20:00"]
-
-    now = datetime.datetime.utcnow().isoformat() + "Z"  # 'Z' indicates UTC time
-    
-    # Get start and end of today
-    today_start = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).isoformat() + "Z"
-    today_end = datetime.datetime.now().replace(hour=23, minute=59, second=59, microsecond=999).isoformat() + "Z"
-
-    events_result = (
-        service.events()
-        .list(
-            calendarId="primary",
-            timeMin=today_start,
-            timeMax=today_end,
-            singleEvents=True,
-            orderBy="startTime",
-        )
-        .execute()
-    )
-    events = events_result.get("items", [])
-
-    event_summary = []
+        return {date: list(MOCK_EVENTS) for date in dates}
+
+    with tenants.connection(player_id) as conn:
+        row = conn.execute("SELECT synced_at FROM calendar_sync_state WHERE calendar_id = ?",
+                           (CALENDAR_ID,)).fetchone()
+    if not row or time.time() - row["synced_at"] > SYNC_MAX_AGE:
+        sync_calendar(player_id)
+
+    by_day = {date: [] for date in dates}
+    with tenants.connection(player_id) as conn:
+        for summary, start_time, start_date in conn.execute(
+                "SELECT summary, start_time, start_date FROM calendar_events WHERE start_date BETWEEN ? AND ?",
+                (dates[0], dates[-1])):
+            by_day[start_date].append((_local_time(start_time, tz), summary))
+    # Sorted on local time here: start_time strings carry each event's own UTC offset
+    return {date: [f"{summary} at {at}" if at else f"{summary} (all day)" for at, summary in sorted(events)]
+            for date, events in by_day.items()}
+
+def fetch_todays_events(player_id=tenants.DEFAULT_PLAYER):
+    """Fetches events for the current day (from the local mirror)."""
+    events = next(iter(fetch_events_by_day(player_id).values()))
     if not events:
         print("No upcoming events found.")
-    else:
-        for event in events:
-            start = event["start"].get("dateTime", event["start"].get("date"))
-            event_summary.append(f"{event['summary']} at {start}")
-
-    return event_summary
+    return events
 
-def block_time_for_deep_work(start_time, end_time, summary="The Deep Build"):
+def block_time_for_deep_work(start_time, end_time, summary="The Deep Build", player_id=tenants.DEFAULT_PLAYER):
     """Blocks time in the calendar."""
-    service = get_calendar_service()
+    service = get_calendar_service(player_id)
     if not service:
         print(f"[MOCK] Blocking time: {summary} from {start_time} to {end_time}")
         return
@@ -101,7 +226,13 @@ def block_time_for_deep_work(start_time, end_time, summary="The Deep Build"):
         },
     }
 
-    event = service.events().insert(calendarId='primary', body=event).execute()
+    with _player_lock(player_id):
+        event = service.events().insert(calendarId=CALENDAR_ID, body=event).execute()
+        # Mirror it right away; the next incremental sync will report it again harmlessly.
+        tz = tenants.player_timezone(player_id)
+        with tenants.connection(player_id) as conn:
+            _store_events(conn, [event], tz, _mirror_cutoff(tz))
+            conn.commit()
     print(f"Event created: {event.get('htmlLink')}")
 
 if __name__ == "__main__":
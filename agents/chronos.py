@@ -1,21 +1,34 @@
-import schedule
+import argparse
+import datetime
+import heapq
+import itertools
+import threading
 import time
 import subprocess
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+from agents import quest_master, retention, storage, tenants
+from agents.auditor import run_audit
 
 # Paths
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(PROJECT_ROOT, "db", "player_stats.db")
-QUEST_MASTER_PATH = os.path.join(PROJECT_ROOT, "agents", "quest_master.py")
-MAIN_PATH = os.path.join(PROJECT_ROOT, "main.py")
 
-def check_vitality_safeguard():
+# Job execution
+# Jobs run in this process on the Scheduler's worker pool: the interpreter
+# and the google.genai / googleapiclient imports are paid once, when the
+# daemon starts, instead of once per job. --isolate (or CHRONOS_ISOLATE=1) runs
+# each job in a fresh interpreter instead (`python -m agents.chronos --run`),
+# so a crashing or leaking job can't take the daemon down with it.
+JOB_WORKERS = int(os.getenv("CHRONOS_WORKERS", "2"))
+ISOLATE_JOBS = os.getenv("CHRONOS_ISOLATE") == "1"
+
+def check_vitality_safeguard(player_id=tenants.DEFAULT_PLAYER):
     """Checks if Vitality is critical (< 30%)."""
     # Simply check if Fatigue > Vitality or based on some ratio
-    import sqlite3
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = storage.connect(tenants.player_db_path(player_id))
         cursor = conn.cursor()
         cursor.execute("SELECT value FROM player_stats WHERE stat_name='Vitality'")
         vit = cursor.fetchone()
@@ -36,46 +49,258 @@ def check_vitality_safeguard():
         print(f"Chronos Error: {e}")
         return False
 
-def run_quest_master():
-    print(f"\n[CHRONOS] 07:00 - Waking the Quest Master...")
+def quest_job(player_id=tenants.DEFAULT_PLAYER, recovery=False):
+    quest_master.generate_daily_quest(player_id, recovery=recovery)
+
+def audit_job(player_id=tenants.DEFAULT_PLAYER):
+    run_audit(player_id)
+
+def compaction_job(player_id=tenants.DEFAULT_PLAYER):
+    try:
+        archived = retention.compact(player_id)
+        print(f"[CHRONOS] Archived: {archived}" if archived else "[CHRONOS] Nothing to compact.")
+    except Exception as e:
+        print(f"Chronos Error: {e}")
+
+JOBS = {
+    "quest": quest_job,
+    "audit": audit_job,
+    "compact": compaction_job,
+}
+
+def run_job(name, player_id=tenants.DEFAULT_PLAYER, recovery=False, isolate=None):
+    """Runs a job to completion, in this process or (isolate=True) in a child interpreter.
+
+    Returns True on success.
+    """
+    isolate = ISOLATE_JOBS if isolate is None else isolate
+    if isolate:
+        command = [sys.executable, "-m", "agents.chronos", player_id, "--run", name]
+        if recovery:
+            command.append("--recovery")
+        result = subprocess.run(command, cwd=PROJECT_ROOT)
+        if result.returncode:
+            print(f"Chronos Error: job '{name}' exited with {result.returncode}")
+        return result.returncode == 0
+    kwargs = {"recovery": recovery} if name == "quest" else {}
+    try:
+        JOBS[name](player_id, **kwargs)
+        return True
+    except Exception as e:
+        print(f"Chronos Error: job '{name}' failed: {e}")
+        return False
+
+def run_quest_master(player_id=tenants.DEFAULT_PLAYER, isolate=None):
+    print(f"\n[CHRONOS] 07:00 - Waking the Quest Master ({player_id})...")
     
-    env = os.environ.copy()
-    if check_vitality_safeguard():
+    recovery = check_vitality_safeguard(player_id)
+    if recovery:
         print("⚠️ VITALITY CRITICAL. Engaging Safety Protocol.")
-        env["SHADOW_MODE"] = "RECOVERY"
         
-    # Using python -m agents.quest_master to handle imports correctly
-    subprocess.run([sys.executable, "-m", "agents.quest_master"], cwd=PROJECT_ROOT, env=env)
+    ok = run_job("quest", player_id, recovery=recovery, isolate=isolate)
     
     # Read and display the quest
-    daily_quest_path = os.path.join(PROJECT_ROOT, "DAILY_QUEST.md")
+    daily_quest_path = tenants.player_file(player_id, "DAILY_QUEST.md")
     if os.path.exists(daily_quest_path):
         with open(daily_quest_path, "r", encoding="utf-8") as f:
             print("\n" + f.read())
     print("[CHRONOS] Quest generated. Notification sent.")
+    return ok
 
-def run_nightly_audit():
-    print(f"\n[CHRONOS] 21:00 - Summoning the Auditor...")
-    # This invokes the interactive script. In a real daemon, it might popup a window or just run in the open terminal.
+def run_nightly_audit(player_id=tenants.DEFAULT_PLAYER, isolate=None):
+    print(f"\n[CHRONOS] 21:00 - Summoning the Auditor ({player_id})...")
+    # This invokes the interactive audit. In a real daemon, it might popup a window or just run in the open terminal.
     # We will run it in the current terminal.
-    subprocess.run([sys.executable, "main.py", "audit"], cwd=PROJECT_ROOT)
+    return run_job("audit", player_id, isolate=isolate)
+
+def run_compaction(player_id=tenants.DEFAULT_PLAYER, isolate=None):
+    print(f"\n[CHRONOS] 03:00 - Compacting audit logs ({player_id})...")
+    return run_job("compact", player_id, isolate=isolate)
+
+# Scheduler
+# A heap of (deadline, job, player) timers. The daemon sleeps until the
+# earliest deadline (capped at MAX_SLEEP so a suspend/resume or clock change
+# is noticed), then hands every due job to a pool of `concurrency` workers,
+# which bounds the fan-out across players. Interactive jobs (they read the one
+# terminal) queue on a single console thread of their own instead, so an
+# audit waiting on input() never holds a pool worker. Deadlines are computed in each
+# player's time zone (player_profile.timezone, local time when NULL).
+# The slot each (job, player) last completed is stored in chronos.db; on
+# start-up a slot missed while the daemon was down is run once, right away.
+
+SCHEDULE = (  # (job, hour, minute, runner)
+    ("compact", 3, 0, run_compaction),
+    ("quest", 7, 0, run_quest_master),
+    ("audit", 21, 0, run_nightly_audit),
+)
+INTERACTIVE_JOBS = {"audit"}  # One terminal: run these one at a time, off the pool
+MAX_SLEEP = 300  # seconds
+STATE_DB_PATH = os.path.join(PROJECT_ROOT, 'db', 'chronos.db')
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_runs (
+    job TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    slot REAL NOT NULL, -- unix time of the scheduled run last completed
+    finished_at REAL,
+    PRIMARY KEY (job, player_id)
+);
+"""
+
+def set_player_timezone(player_id, name):
+    ZoneInfo(name)  # Raises on unknown zones
+    db_path = tenants.player_db_path(player_id)
+    with storage.connection(db_path) as conn:
+        conn.execute("UPDATE player_profile SET timezone = ? WHERE id=1", (name,))
+        conn.execute("DELETE FROM calendar_sync_state")  # Mirror dates are local: re-list on the next fetch
+        conn.commit()
+    storage.bump_data_version(db_path)
 
-def job_scheduler():
-    print("--- ⏳ CHRONOS DAEMON ONLINE ⏳ ---")
-    print("Schedules set:")
+def next_slot(hour, minute, tz, after):
+    """First hour:minute wall-clock time in `tz` strictly after unix time `after`."""
+    local = datetime.datetime.fromtimestamp(after, tz)
+    slot = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if slot.timestamp() <= after:
+        slot = (local + datetime.timedelta(days=1)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return slot.timestamp()
+
+def previous_slot(hour, minute, tz, now):
+    """Latest hour:minute wall-clock time in `tz` at or before `now`."""
+    local = datetime.datetime.fromtimestamp(now, tz)
+    slot = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if slot.timestamp() > now:
+        slot = (local - datetime.timedelta(days=1)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return slot.timestamp()
+
+class Scheduler:
+    def __init__(self, players, concurrency=JOB_WORKERS, isolate=None, state_path=STATE_DB_PATH,
+                 schedule=SCHEDULE, clock=time.time):
+        self.isolate = ISOLATE_JOBS if isolate is None else isolate
+        self.state_path = state_path
+        self.schedule = {job: (hour, minute, runner) for job, hour, minute, runner in schedule}
+        self.clock = clock
+        self._heap = []
+        self._seq = itertools.count()  # Tie-breaker: never compare players
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="chronos")
+        self._console = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chronos-console")
+        self._wake = threading.Event()
+        self._stopped = False
+        with storage.connection(self.state_path) as conn:
+            conn.executescript(STATE_SCHEMA)
+        for player_id in players:
+            self.add_player(player_id)
+
+    def _last_slot(self, job, player_id):
+        with storage.connection(self.state_path) as conn:
+            row = conn.execute("SELECT slot FROM job_runs WHERE job = ? AND player_id = ?",
+                               (job, player_id)).fetchone()
+        return row[0] if row else None
+
+    def _record(self, job, player_id, slot, finished_at=None):
+        with storage.connection(self.state_path) as conn:
+            conn.execute(
+                "INSERT INTO job_runs (job, player_id, slot, finished_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (job, player_id) DO UPDATE SET slot = MAX(slot, excluded.slot), "
+                "finished_at = COALESCE(excluded.finished_at, finished_at)",
+                (job, player_id, slot, finished_at))
+            conn.commit()
+
+    def _push(self, deadline, job, player_id, slot):
+        heapq.heappush(self._heap, (deadline, next(self._seq), job, player_id, slot))
+        self._wake.set()
+
+    def add_player(self, player_id):
+        """Schedules every job for the player, catching up a slot missed while down."""
+        tz = tenants.player_timezone(player_id)
+        now = self.clock()
+        for job, (hour, minute, _) in self.schedule.items():
+            missed = previous_slot(hour, minute, tz, now)
+            last = self._last_slot(job, player_id)
+            if last is None:
+                self._record(job, player_id, missed)  # New player: start the clock now
+            elif last < missed:
+                print(f"[CHRONOS] Catching up missed {hour:02d}:{minute:02d} {job} ({player_id}).")
+                self._push(now, job, player_id, missed)
+            self._push(next_slot(hour, minute, tz, now), job, player_id, None)
+
+    def _run(self, job, player_id, slot):
+        # Nothing waits on these futures: errors are reported here or lost. A
+        # failed run leaves the slot unrecorded, so add_player catches it up.
+        try:
+            ok = self.schedule[job][2](player_id, self.isolate)
+            if ok:
+                self._record(job, player_id, slot, self.clock())
+            return ok
+        except Exception as e:
+            print(f"Chronos Error: job '{job}' ({player_id}) failed: {e}")
+            return False
+
+    def run_due(self):
+        """Submits every job whose deadline has passed. Returns their futures."""
+        now = self.clock()
+        futures = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, job, player_id, slot = heapq.heappop(self._heap)
+            hour, minute, _ = self.schedule[job]
+            if slot is None:  # Regular timer: re-arm for the next day
+                slot = deadline
+                self._push(next_slot(hour, minute, tenants.player_timezone(player_id), deadline), job, player_id, None)
+            executor = self._console if job in INTERACTIVE_JOBS else self._pool
+            futures.append(executor.submit(self._run, job, player_id, slot))
+        return futures
+
+    def next_deadline(self):
+        return self._heap[0][0] if self._heap else None
+
+    def run_forever(self):
+        while not self._stopped:
+            self.run_due()
+            deadline = self.next_deadline()
+            delay = MAX_SLEEP if deadline is None else min(max(deadline - self.clock(), 0), MAX_SLEEP)
+            self._wake.clear()
+            self._wake.wait(delay)
+
+    def stop(self, wait=True):
+        self._stopped = True
+        self._wake.set()
+        self._pool.shutdown(wait=wait)
+        self._console.shutdown(wait=wait)
+
+def job_scheduler(players=(tenants.DEFAULT_PLAYER,), isolate=None, concurrency=JOB_WORKERS):
+    isolate = ISOLATE_JOBS if isolate is None else isolate
+    if isinstance(players, str):
+        players = (players,)
+    print(f"--- ⏳ CHRONOS DAEMON ONLINE ({len(players)} player(s), "
+          f"{'subprocess' if isolate else 'in-process'} jobs, concurrency {concurrency}) ⏳ ---")
+    print("Schedules set (each player's time zone):")
     print("- 07:00: Daily Quest Generation")
     print("- 21:00: Nightly Audit")
-    
-    # Schedule
-    schedule.every().day.at("07:00").do(run_quest_master)
-    schedule.every().day.at("21:00").do(run_nightly_audit)
-    
-    # For testing/demo purposes, we can add immediate triggers or faster loops if requested.
-    # But sticking to prompt:
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    print("- 03:00: Audit Log Compaction")
+
+    scheduler = Scheduler(players, concurrency=concurrency, isolate=isolate)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        print("[CHRONOS] Shutting down.")
+        scheduler.stop(wait=False)
 
 if __name__ == "__main__":
-    job_scheduler()
+    parser = argparse.ArgumentParser(description="Chronos: the Shadow System scheduler")
+    parser.add_argument("players", nargs="*", help=f"Player ids (default: {tenants.DEFAULT_PLAYER})")
+    parser.add_argument("--all", action="store_true", help="Schedule every provisioned player")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKERS, help="Jobs running at once across players")
+    parser.add_argument("--timezone", help="Set the players' IANA time zone (e.g. Europe/Paris) and exit")
+    parser.add_argument("--isolate", action="store_true", default=None, help="Run each job in a child interpreter")
+    parser.add_argument("--run", choices=sorted(JOBS), help="Run one job now and exit")
+    parser.add_argument("--recovery", action="store_true", help="With --run quest: Recovery Protocol")
+    args = parser.parse_args()
+    players = tenants.list_players() if args.all else (args.players or [tenants.DEFAULT_PLAYER])
+    if args.timezone:
+        for player_id in players:
+            set_player_timezone(player_id, args.timezone)
+            print(f"{player_id}: {args.timezone}")
+    elif args.run:
+        results = [run_job(args.run, player_id, recovery=args.recovery, isolate=False) for player_id in players]
+        sys.exit(0 if all(results) else 1)
+    else:
+        job_scheduler(players, isolate=args.isolate, concurrency=args.concurrency)
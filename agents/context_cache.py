@@ -0,0 +1,139 @@
+import asyncio
+import itertools
+import threading
+import time
+
+from google.genai import types
+
+from agents import gemini
+from agents.model_router import estimate_tokens
+
+# System-instruction context caches
+# A fixed system instruction can be uploaded once per model as Gemini cached
+# content and referenced by name on every request instead of being re-sent;
+# cached input tokens are billed at a discount. SystemContext creates the
+# cache lazily (ensure / ensure_async, outside the request), renews it
+# before it expires, and config() falls back to the inline instruction
+# whenever no live cache exists: instruction under the API minimum, model
+# without caching, or a failed create (not retried for RETRY_AFTER).
+# LocalCaches stands in for client.caches in benchmarks and offline runs.
+# No call site qualifies today: onboarding's interview instruction (~265
+# tokens) is far below MIN_TOKENS, so onboarding sends it inline and does not
+# use this module. It applies once an instruction grows past the minimum.
+
+DEFAULT_TTL = 3600       # seconds a created cache lives
+RENEW_BEFORE = 120       # seconds before expiry a new cache replaces it
+MIN_TOKENS = 1024        # Gemini rejects smaller cached contents
+RETRY_AFTER = 600        # seconds before retrying a model whose create failed
+
+class SystemContext:
+    def __init__(self, system_instruction, ttl=DEFAULT_TTL, min_tokens=MIN_TOKENS, enabled=True):
+        self.system_instruction = system_instruction
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self._caches = {}  # model -> (cache name, renew at)
+        self._failed = {}  # model -> retry at
+        self._lock = threading.Lock()
+
+    def cached_name(self, model):
+        """Name of a live cache for `model`, or None. Never calls the API."""
+        entry = self._caches.get(model)
+        if entry and time.monotonic() < entry[1]:
+            return entry[0]
+        return None
+
+    def _wanted(self, model):
+        if not self.enabled or model is None:
+            return False
+        if estimate_tokens(self.system_instruction) < self.min_tokens:
+            return False
+        return time.monotonic() >= self._failed.get(model, 0)
+
+    def _create_config(self):
+        return types.CreateCachedContentConfig(system_instruction=self.system_instruction, ttl=f"{self.ttl}s")
+
+    def _stored(self, model, cache):
+        with self._lock:
+            self._caches[model] = (cache.name, time.monotonic() + self.ttl - RENEW_BEFORE)
+            self._failed.pop(model, None)
+        return cache.name
+
+    def _create_failed(self, model, error):
+        print(f"[CONTEXT CACHE] {model}: {error}; sending the system instruction inline.")
+        with self._lock:
+            self._failed[model] = time.monotonic() + RETRY_AFTER
+
+    def ensure(self, model):
+        """Creates (or renews) the cache for `model` if caching applies. Returns its name or None."""
+        name = self.cached_name(model)
+        if name or not self._wanted(model):
+            return name
+        try:
+            cache = gemini.get_client().caches.create(model=model, config=self._create_config())
+        except Exception as e:
+            self._create_failed(model, e)
+            return None
+        return self._stored(model, cache)
+
+    async def ensure_async(self, model):
+        name = self.cached_name(model)
+        if name or not self._wanted(model):
+            return name
+        try:
+            cache = await gemini.get_client().aio.caches.create(model=model, config=self._create_config())
+        except Exception as e:
+            self._create_failed(model, e)
+            return None
+        return self._stored(model, cache)
+
+    def config(self, model=None, **kwargs):
+        """GenerateContentConfig referencing the cache when one is live, else carrying the instruction."""
+        name = self.cached_name(model)
+        if name:
+            return types.GenerateContentConfig(cached_content=name, **kwargs)
+        return types.GenerateContentConfig(system_instruction=self.system_instruction, **kwargs)
+
+    def forget(self):
+        with self._lock:
+            self._caches.clear()
+            self._failed.clear()
+
+class LocalCaches:
+    """In-memory stand-in for client.caches (and client.aio.caches): create / get / delete."""
+
+    def __init__(self):
+        self._contents = {}  # name -> CreateCachedContentConfig
+        self._ids = itertools.count(1)
+        self.aio = _AsyncLocalCaches(self)
+
+    def create(self, model, config=None):
+        name = f"cachedContents/local-{next(self._ids)}"
+        self._contents[name] = config
+        return types.CachedContent(name=name, model=model)
+
+    def get(self, name):
+        if name not in self._contents:
+            raise KeyError(name)
+        return types.CachedContent(name=name)
+
+    def delete(self, name):
+        self._contents.pop(name, None)
+
+    def system_instruction(self, name):
+        """The instruction stored under `name` (for stand-in clients that bill cached tokens)."""
+        return self._contents[name].system_instruction
+
+class _AsyncLocalCaches:
+    def __init__(self, caches):
+        self._caches = caches
+
+    async def create(self, model, config=None):
+        await asyncio.sleep(0)
+        return self._caches.create(model, config)
+
+    async def get(self, name):
+        return self._caches.get(name)
+
+    async def delete(self, name):
+        self._caches.delete(name)
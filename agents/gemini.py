@@ -0,0 +1,67 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+# Process-wide Gemini client registry.
+# One genai.Client per process, created on first use. Reusing it keeps the
+# underlying HTTP connection pools (sync and async) alive between calls, so
+# only the very first request pays DNS + TLS. The backend pre-warms it from
+# its startup hook so even that cost is paid before the first user request.
+
+WARMUP_MODEL = "gemini-2.5-flash"
+KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY = 300  # seconds an idle connection stays open
+TIMEOUT_MS = 120_000
+
+_client = None
+_lock = threading.Lock()
+
+def _http_options():
+    try:
+        import httpx
+        limits = httpx.Limits(max_keepalive_connections=KEEPALIVE_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY)
+        return types.HttpOptions(
+            timeout=TIMEOUT_MS,
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+    except Exception:
+        # Older google-genai without client_args: its defaults already keep connections alive.
+        return types.HttpOptions(timeout=TIMEOUT_MS)
+
+def get_client():
+    """Returns the shared client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                load_dotenv()
+                _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=_http_options())
+    return _client
+
+def set_client(client):
+    """Replaces the shared client (benchmarks plug in stand-ins here)."""
+    global _client
+    with _lock:
+        _client = client
+
+def warm_up(model=WARMUP_MODEL):
+    """Opens the sync connection with a cheap metadata call. Never raises."""
+    try:
+        get_client().models.get(model=model)
+        return True
+    except Exception as e:
+        print(f"Gemini warm-up skipped: {e}")
+        return False
+
+async def warm_up_async(model=WARMUP_MODEL):
+    """Opens the async connection with a cheap metadata call. Never raises."""
+    try:
+        await get_client().aio.models.get(model=model)
+        return True
+    except Exception as e:
+        print(f"Gemini warm-up skipped: {e}")
+        return False
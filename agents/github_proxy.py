@@ -1,55 +1,212 @@
-import requests
 import datetime
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from agents import storage
+
+# GitHub activity proxy
+# Public events are synced incrementally into a local SQLite cache:
+# - one requests.Session per process (keep-alive, shared headers);
+# - the first page is requested with If-None-Match, so an unchanged feed
+#   costs a 304 (which GitHub doesn't count against the rate limit);
+# - pages are followed through `Link: rel="next"` only until the last event
+#   already seen (the cursor), so each audit downloads just the new events;
+# - timestamps are parsed once, when an event is stored;
+# - events older than EVENT_RETENTION are pruned in the same transaction
+#   (the cursor lives in github_feeds, so pruned events aren't fetched again).
+# GITHUB_API_URL points the proxy at another server (e.g. a local stub).
+
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+CACHE_DB_PATH = os.path.join(storage.PROJECT_ROOT, 'db', 'github_cache.db')
+PER_PAGE = 100
+MAX_PAGES = 3          # GitHub serves at most 300 events per feed
+TIMEOUT = 10           # seconds per request
+BATCH_WORKERS = 8
+ACTIVITY_WINDOW = 12 * 3600
+EVENT_RETENTION = ACTIVITY_WINDOW  # The auditor never reads further back
+CODING_EVENTS = ("PushEvent", "PullRequestEvent")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS github_feeds (
+    username TEXT PRIMARY KEY,
+    etag TEXT,
+    cursor INTEGER NOT NULL DEFAULT 0, -- newest event id stored
+    poll_interval INTEGER NOT NULL DEFAULT 0, -- X-Poll-Interval from GitHub
+    polled_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS github_events (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    type TEXT NOT NULL,
+    repo TEXT,
+    commit_count INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL -- unix seconds
+);
+CREATE INDEX IF NOT EXISTS idx_github_events_user_time ON github_events (username, created_at);
+"""
+
+def parse_timestamp(value):
+    """GitHub's '2024-01-01T12:00:00Z' -> unix seconds."""
+    return int(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+class GitHubSync:
+    def __init__(self, db_path=CACHE_DB_PATH, api_url=API_URL, token=None):
+        self.db_path = db_path
+        self.api_url = api_url.rstrip("/")
+        self.token = token if token is not None else os.getenv("GITHUB_TOKEN")
+        self.requests_made = 0
+        self.not_modified = 0
+        self._session = None
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    session.headers.update({
+                        "Accept": "application/vnd.github+json",
+                        "User-Agent": "shadow-system",
+                    })
+                    if self.token:
+                        session.headers["Authorization"] = f"Bearer {self.token}"
+                    self._session = session
+        return self._session
+
+    def _connection(self):
+        return storage.connection(self.db_path)
+
+    def _ensure_schema(self, conn):
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+
+    def _get(self, url, headers=None):
+        with self._lock:
+            self.requests_made += 1
+        return self.session.get(url, headers=headers, timeout=TIMEOUT)
+
+    def sync(self, username):
+        """Fetches events newer than the stored cursor. Returns how many were new.
+
+        Raises requests.RequestException / RuntimeError on API errors.
+        """
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            feed = conn.execute("SELECT etag, cursor, poll_interval, polled_at FROM github_feeds WHERE username = ?",
+                                (username,)).fetchone()
+        etag, cursor, poll_interval, polled_at = feed if feed else (None, 0, 0, 0)
+        if time.time() - polled_at < poll_interval:
+            return 0  # GitHub asked us not to poll this feed yet
+
+        url = f"{self.api_url}/users/{username}/events/public?per_page={PER_PAGE}"
+        response = self._get(url, {"If-None-Match": etag} if etag else None)
+        new_etag = etag
+        poll_interval = int(response.headers.get("X-Poll-Interval", poll_interval or 0))
+        fresh = []
+        if response.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+        elif response.status_code == 200:
+            new_etag = response.headers.get("ETag")
+            for page in range(MAX_PAGES):
+                events = response.json()
+                reached_cursor = False
+                for event in events:
+                    event_id = int(event["id"])
+                    if event_id <= cursor:
+                        reached_cursor = True
+                        break
+                    fresh.append((
+                        event_id, username, event["type"], event.get("repo", {}).get("name"),
+                        len(event.get("payload", {}).get("commits", []) or []),
+                        parse_timestamp(event["created_at"]),
+                    ))
+                next_url = response.links.get("next", {}).get("url")
+                if reached_cursor or not next_url or page == MAX_PAGES - 1:
+                    break
+                response = self._get(next_url)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GitHub API error {response.status_code} on {next_url}")
+        else:
+            raise RuntimeError(f"GitHub API error {response.status_code}")
+
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            conn.executemany(
+                "INSERT OR IGNORE INTO github_events (id, username, type, repo, commit_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", fresh)
+            conn.execute("DELETE FROM github_events WHERE username = ? AND created_at <= ?",
+                         (username, time.time() - EVENT_RETENTION))
+            conn.execute(
+                "INSERT INTO github_feeds (username, etag, cursor, poll_interval, polled_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (username) DO UPDATE SET etag = excluded.etag, cursor = excluded.cursor, "
+                "poll_interval = excluded.poll_interval, polled_at = excluded.polled_at",
+                (username, new_etag, max([cursor] + [row[0] for row in fresh]), poll_interval, time.time()))
+            conn.commit()
+        return len(fresh)
+
+    def sync_many(self, usernames, max_workers=BATCH_WORKERS):
+        """Syncs several feeds concurrently over the shared session. Returns {username: new or error}."""
+        def one(username):
+            try:
+                return username, self.sync(username)
+            except Exception as e:
+                return username, e
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="github-sync") as pool:
+            return dict(pool.map(one, usernames))
+
+    def recent_activity(self, username, window=ACTIVITY_WINDOW, now=None):
+        """(has_code, summary) from cached events in the last `window` seconds."""
+        since = (now or time.time()) - window
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute(
+                "SELECT type, repo, commit_count FROM github_events "
+                f"WHERE username = ? AND created_at > ? AND type IN ({','.join('?' * len(CODING_EVENTS))}) "
+                "ORDER BY created_at DESC",
+                (username, since, *CODING_EVENTS)).fetchall()
+        details = []
+        for event_type, repo, commit_count in rows:
+            if event_type == 'PushEvent':
+                details.append(f"Pushed {commit_count} commits to {repo}")
+            elif event_type == 'PullRequestEvent':
+                details.append(f"PR Activity in {repo}")
+        if details:
+            return True, "; ".join(details)
+        return False, "No coding events in the last 12 hours."
+
+github = GitHubSync()
 
 def check_github_activity(username="Ayoub"): # Default, or can be passed
     """Checks for public events on GitHub for the user in the last 12 hours.
-    
+
     Returns:
         bool: True if coding activity found, False otherwise.
         str: Summary of activity.
     """
-    url = f"https://api.github.com/users/{username}/events/public"
     print(f"--- 🐙 GITHUB PROXY: Scaning timeline for {username} ---")
-    
     try:
-        response = requests.get(url)
-        if response.status_code != 200:
-            return False, f"Error reaching GitHub API: {response.status_code}"
-            
-        events = response.json()
-        if not events:
-            return False, "No recent public events found."
-            
-        # Check timestamps (UTC)
-        now = datetime.datetime.utcnow()
-        twelve_hours_ago = now - datetime.timedelta(hours=12)
-        
-        found_commits = False
-        details = []
-        
-        for event in events:
-            # Parse event time
-            created_at = datetime.datetime.strptime(event['created_at'], "%Y-%m-%dT%H:%M:%SZ")
-            
-            if created_at > twelve_hours_ago:
-                if event['type'] == 'PushEvent':
-                    found_commits = True
-                    repo = event['repo']['name']
-                    count = len(event['payload'].get('commits', []))
-                    details.append(f"Pushed {count} commits to {repo}")
-                elif event['type'] == 'PullRequestEvent':
-                    found_commits = True
-                    details.append(f"PR Activity in {event['repo']['name']}")
-        
-        if found_commits:
-            summary = "; ".join(details)
-            return True, summary
-        else:
-            return False, "No coding events in the last 12 hours."
-            
+        github.sync(username)
     except Exception as e:
         return False, f"GitHub Proxy Error: {e}"
+    return github.recent_activity(username)
+
+def check_github_activity_many(usernames):
+    """Batch version: {username: (has_code, summary)}."""
+    results = {}
+    for username, outcome in github.sync_many(usernames).items():
+        if isinstance(outcome, Exception):
+            results[username] = (False, f"GitHub Proxy Error: {outcome}")
+        else:
+            results[username] = github.recent_activity(username)
+    return results
 
 if __name__ == "__main__":
     # Test
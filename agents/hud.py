@@ -0,0 +1,108 @@
+import hashlib
+import html
+import json
+import os
+import tempfile
+from string import Template
+
+from agents import storage, tenants
+
+# HUD renderer
+# The page is one Template compiled at import time; stat rows come from a
+# second one. Each render is keyed by a hash of its inputs (stats, profile and
+# the template itself), stamped into the first line of the file. write_hud()
+# compares that stamp before doing anything, so `main.py stats` on an
+# unchanged player neither re-renders nor touches the file, and a real change
+# is written to a temp file and renamed into place (readers never see half a
+# page). The backend serves the same page at GET /hud, with the hash as ETag.
+
+HUD_FILE = 'HUD.html'  # Per player; the default player's lives in assets/
+DEFAULT_HUD_PATH = os.path.join(storage.PROJECT_ROOT, 'assets', HUD_FILE)
+STAMP_PREFIX = "<!-- hud:"
+
+PAGE = Template("""$stamp
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Shadow System HUD</title>
+    <style>
+        body { background-color: #0d0d0d; color: #4285F4; font-family: 'Courier New', monospace; padding: 20px; }
+        .container { border: 2px solid #4285F4; padding: 20px; max-width: 600px; margin: auto; box-shadow: 0 0 20px #4285F4; }
+        h1 { text-align: center; text-transform: uppercase; letter-spacing: 5px; }
+        .stat-row { display: flex; justify-content: space-between; border-bottom: 1px solid #333; padding: 5px 0; }
+        .value { color: white; }
+        .alert { color: red; font-weight: bold; text-align: center; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Shadow System</h1>
+        <div class="stat-row"><span>Class</span><span class="value">$job_class</span></div>
+        <div class="stat-row"><span>Level</span><span class="value">$level</span></div>
+        <div class="stat-row"><span>XP</span><span class="value">$xp / $xp_next</span></div>
+        <br>
+        <h3>Attributes</h3>
+$stat_rows$alert
+    </div>
+</body>
+</html>
+""")
+STAT_ROW = Template('        <div class="stat-row"><span>$name</span><span class="value">$value</span></div>\n')
+DUNGEON_ALERT = '        <p class="alert">⚠️ INSIDE DUNGEON</p>\n'
+
+TEMPLATE_HASH = hashlib.sha1((PAGE.template + STAT_ROW.template + DUNGEON_ALERT).encode("utf-8")).hexdigest()
+
+def hud_path(player_id=tenants.DEFAULT_PLAYER):
+    if player_id == tenants.DEFAULT_PLAYER:
+        return DEFAULT_HUD_PATH
+    return tenants.player_file(player_id, HUD_FILE)
+
+def fingerprint(stats, profile):
+    """Hash of everything the page depends on. `stats` is [(name, value)], `profile` (level, xp, job_class, is_in_dungeon)."""
+    level, xp, job_class, is_in_dungeon = profile
+    inputs = [TEMPLATE_HASH, [[name, value] for name, value in stats], [level, xp, job_class, bool(is_in_dungeon)]]
+    return hashlib.sha1(json.dumps(inputs, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def render(stats, profile, digest=None):
+    level, xp, job_class, is_in_dungeon = profile
+    digest = digest or fingerprint(stats, profile)
+    return PAGE.substitute(
+        stamp=f"{STAMP_PREFIX}{digest} -->",
+        job_class=html.escape(str(job_class)),
+        level=level,
+        xp=xp,
+        xp_next=level * 1000,
+        stat_rows="".join(STAT_ROW.substitute(name=html.escape(str(name)), value=value) for name, value in stats),
+        alert=DUNGEON_ALERT if is_in_dungeon else "",
+    )
+
+def _stamp(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            line = f.readline().strip()
+    except OSError:
+        return None
+    if line.startswith(STAMP_PREFIX) and line.endswith(" -->"):
+        return line[len(STAMP_PREFIX):-len(" -->")]
+    return None
+
+def write_atomic(path, data):
+    """Writes bytes to a temp file next to `path` and renames it into place."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + "-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_hud(stats, profile, path):
+    """Renders and atomically writes the HUD unless `path` already holds it. Returns True if written."""
+    digest = fingerprint(stats, profile)
+    if _stamp(path) == digest:
+        return False
+    write_atomic(path, render(stats, profile, digest).encode("utf-8"))
+    return True
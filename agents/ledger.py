@@ -0,0 +1,105 @@
+import datetime
+
+from agents import storage, tenants
+
+# Stat ledger
+# Every stat or XP change is one row appended to stat_events. The
+# stat_events_apply trigger folds each event into the player_stats /
+# player_profile.xp snapshots and, every N events (N =
+# stat_ledger_config.checkpoint_interval), copies the whole state into
+# stat_checkpoints. Reading the state as of a past moment starts from the
+# nearest checkpoint and replays at most N events, however long the history is.
+# Tables, trigger and config come from db/migrations/0010_stat_ledger.sql,
+# applied to existing databases like any other migration.
+
+XP = 'XP'  # stat_name used for XP events
+
+def append(conn, stat_name, delta, source, reason=None, audit_id=None):
+    """Records one change. The caller commits; snapshots update in the same statement."""
+    return conn.execute(
+        "INSERT INTO stat_events (stat_name, delta, source, audit_id, reason) VALUES (?, ?, ?, ?, ?)",
+        (stat_name, delta, source, audit_id, reason)).lastrowid
+
+def _timestamp(when):
+    """SQLite CURRENT_TIMESTAMP form (UTC) of a datetime, date or string."""
+    if isinstance(when, str):
+        return when
+    if isinstance(when, datetime.datetime):
+        if when.tzinfo is not None:
+            when = when.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return when.strftime("%Y-%m-%d %H:%M:%S")
+    return f"{when.isoformat()} 23:59:59"  # A date means "as of the end of that day"
+
+def stats_at(conn, when):
+    """{stat_name: value} (XP included) as of `when` (UTC)."""
+    ts = _timestamp(when)
+    row = conn.execute(
+        "SELECT event_id FROM stat_checkpoints WHERE created_at <= ? ORDER BY created_at DESC, event_id DESC LIMIT 1",
+        (ts,)).fetchone()
+    checkpoint = row[0] if row else 0
+    state = dict(conn.execute(
+        "SELECT stat_name, value FROM stat_checkpoints WHERE event_id = ?", (checkpoint,)).fetchall())
+    # Events after the checkpoint, up to the next one: a bounded rowid range scan.
+    for stat_name, delta in conn.execute(
+            "SELECT stat_name, SUM(delta) FROM stat_events "
+            "WHERE id > ? AND id <= ? + (SELECT checkpoint_interval FROM stat_ledger_config WHERE id = 1) "
+            "AND created_at <= ? GROUP BY stat_name",
+            (checkpoint, checkpoint, ts)):
+        state[stat_name] = state.get(stat_name, 0) + delta
+    return state
+
+def history(conn, stat_name=None, since=None, limit=100):
+    """Most recent events, newest first, optionally for one stat / after `since`."""
+    query = "SELECT id, stat_name, delta, source, audit_id, reason, created_at FROM stat_events WHERE 1=1"
+    params = []
+    if stat_name:
+        query += " AND stat_name = ?"
+        params.append(stat_name)
+    if since is not None:
+        query += " AND created_at >= ?"
+        params.append(_timestamp(since))
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+def rebuild_snapshots(conn):
+    """Recomputes player_stats and player_profile.xp from baseline + full ledger.
+
+    Recovery tool only (e.g. after a manual UPDATE); normal writes never need it.
+    Returns the stats whose snapshot had drifted. The caller commits.
+    """
+    state = dict(conn.execute("SELECT stat_name, value FROM stat_checkpoints WHERE event_id = 0").fetchall())
+    for stat_name, total in conn.execute("SELECT stat_name, SUM(delta) FROM stat_events GROUP BY stat_name"):
+        state[stat_name] = state.get(stat_name, 0) + total
+    drifted = []
+    current = dict(conn.execute("SELECT stat_name, value FROM player_stats").fetchall())
+    current[XP] = conn.execute("SELECT xp FROM player_profile WHERE id = 1").fetchone()[0]
+    for stat_name, value in state.items():
+        if current.get(stat_name) == value:
+            continue
+        drifted.append(stat_name)
+        if stat_name == XP:
+            conn.execute("UPDATE player_profile SET xp = ? WHERE id = 1", (value,))
+        else:
+            conn.execute("INSERT OR REPLACE INTO player_stats (stat_name, value) VALUES (?, ?)", (stat_name, value))
+    return drifted
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Stat ledger: state as of a date, or snapshot repair")
+    parser.add_argument("player", nargs="?", default=tenants.DEFAULT_PLAYER)
+    parser.add_argument("date", nargs="?", type=datetime.date.fromisoformat, help="YYYY-MM-DD (default: now)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute player_stats / XP from the ledger and report drifted stats")
+    args = parser.parse_args()
+    db_path = tenants.player_db_path(args.player)
+    with storage.connection(db_path) as conn:
+        if args.rebuild:
+            drifted = rebuild_snapshots(conn)
+            conn.commit()
+            if drifted:
+                storage.bump_data_version(db_path)
+            print(f"Rebuilt: {', '.join(drifted)}" if drifted else "Snapshots match the ledger.")
+        else:
+            for stat_name, value in sorted(stats_at(conn, args.date or datetime.datetime.utcnow()).items()):
+                print(f"{stat_name}: {value}")
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from agents import metrics, storage
+
+# Content-addressed Gemini response cache.
+# Key = sha256 over (model, system instruction, contents, config), so an
+# identical request (same /awaken goals, same interview, same quest inputs)
+# is answered from SQLite instead of regenerated. Entries expire after a TTL;
+# when the cache outgrows its byte budget the least recently used entries go.
+# Requests that can't be serialized canonically (tool callables, images) are
+# never cached, and callers can opt out per call.
+
+CACHE_DB_PATH = os.path.join(storage.PROJECT_ROOT, 'db', 'llm_cache.db')
+DEFAULT_TTL = 7 * 24 * 3600        # seconds
+MAX_BYTES = 64 * 1024 * 1024       # total response payload kept on disk
+EVICT_TO = 0.9                     # after eviction, fill at most this share of MAX_BYTES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response_json TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+"""
+
+class Uncacheable(Exception):
+    """The request contains something without a stable serialization."""
+
+def _canonical(value):
+    """JSON-safe, order-stable form of a request component."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, bytes):
+        return {"bytes_sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if hasattr(value, "model_dump"):  # google.genai pydantic types
+        try:
+            return _canonical(value.model_dump(mode="json", exclude_none=True))
+        except Exception as e:
+            raise Uncacheable(str(e))
+    raise Uncacheable(f"Cannot cache request containing {type(value).__name__}")
+
+def request_key(model, contents, config=None):
+    """sha256 of (model, system instruction, contents, config). Raises Uncacheable."""
+    config_form = _canonical(config)
+    if isinstance(config_form, dict):
+        if config_form.get("tools"):
+            raise Uncacheable("Tool-calling requests have side effects")
+        system = config_form.pop("system_instruction", None)
+    else:
+        system = None
+    payload = json.dumps(
+        {"model": model, "system": system, "contents": _canonical(contents), "config": config_form},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, db_path=CACHE_DB_PATH, ttl=DEFAULT_TTL, max_bytes=MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        return storage.connection(self.db_path)
+
+    def _ensure_schema(self, conn):
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def keys_for(self, models, contents, config):
+        """{model: key} for each candidate model, or None if the request is uncacheable.
+
+        `config` may be a callable (model -> config), as accepted by the router.
+        """
+        try:
+            return {model: request_key(model, contents, config(model) if callable(config) else config)
+                    for model in models}
+        except Uncacheable:
+            self._count("skipped")
+            return None
+
+    def get(self, keys):
+        """Returns (model, response_json) for the first live key in `keys`, else None."""
+        now = time.time()
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, model, response_json FROM llm_cache WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys.values(), now)).fetchall()
+            if not rows:
+                self._count("misses")
+                return None
+            by_key = {row["key"]: row for row in rows}
+            row = next(by_key[key] for key in keys.values() if key in by_key)  # Caller's preference order
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, row["key"]))
+            conn.commit()
+        self._count("hits")
+        return row["model"], row["response_json"]
+
+    def put(self, key, model, response_json, ttl=None):
+        now = time.time()
+        size = len(response_json.encode("utf-8"))
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response_json, size_bytes, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response_json, size, now, now + (ttl or self.ttl), now))
+            conn.commit()
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        expired = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            for row in conn.execute("SELECT key, size_bytes FROM llm_cache ORDER BY last_access").fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (row["key"],))
+                total -= row["size_bytes"]
+                evicted += 1
+        conn.commit()
+        if expired or evicted:
+            with self._lock:
+                self.evictions += expired + evicted
+
+    def clear(self):
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def stats(self):
+        with self._connection() as conn:
+            self._ensure_schema(conn)
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+cache = ResponseCache()
+
+def _cache_metrics():
+    stats = cache.stats()
+    return [
+        ("shadow_llm_cache_lookups_total", "counter", "Response cache lookups in this worker.", ("result",),
+         [(("hit",), stats["hits"]), (("miss",), stats["misses"]), (("skipped",), stats["skipped"])]),
+        ("shadow_llm_cache_evictions_total", "counter", "Entries expired or evicted by this worker.", (),
+         [((), stats["evictions"])]),
+        ("shadow_llm_cache_entries", "gauge", "Cached responses on disk.", (), [((), stats["entries"])]),
+        ("shadow_llm_cache_bytes", "gauge", "Cached response payload on disk.", (), [((), stats["bytes"])]),
+    ]
+
+metrics.registry.collector(_cache_metrics)
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print("LLM cache cleared.")
+    else:
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
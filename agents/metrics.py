@@ -0,0 +1,240 @@
+import bisect
+import functools
+import re
+import sys
+import threading
+import urllib.request
+
+# Metrics
+# In-process counters and histograms, one registry per process. The model
+# router reports every Gemini call per call site (latency, tokens, retries,
+# fallbacks, the model that answered) and storage's connections time every
+# SQLite statement. The backend serves them as Prometheus text at GET
+# /metrics (this worker only, like /llm-cache/stats) and as a plain-text
+# summary at /metrics?format=summary; `main.py --metrics ...` prints the
+# summary of a CLI run, `main.py metrics [--url URL]` fetches a server's.
+
+GEMINI_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)  # seconds
+SQLITE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+STATEMENT_CHARS = 160  # Statement labels are normalized SQL, clipped to this
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class Metric:
+    __slots__ = ("name", "kind", "help", "labels", "buckets", "series")
+
+    def __init__(self, name, kind, help, labels, buckets=None):
+        self.name = name
+        self.kind = kind  # "counter" | "histogram" | "gauge"
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> number | Histogram
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labels=()):
+        self._metrics[name] = Metric(name, "counter", help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=GEMINI_BUCKETS):
+        self._metrics[name] = Metric(name, "histogram", help, labels, buckets)
+
+    def collector(self, collect):
+        """Registers collect() -> [(name, kind, help, labels, [(label values, value)])], called per render."""
+        self._collectors.append(collect)
+
+    def inc(self, name, *label_values, amount=1):
+        metric = self._metrics[name]
+        with self._lock:
+            metric.series[label_values] = metric.series.get(label_values, 0) + amount
+
+    def observe(self, name, value, *label_values):
+        metric = self._metrics[name]
+        with self._lock:
+            series = metric.series.get(label_values)
+            if series is None:
+                series = metric.series[label_values] = Histogram(metric.buckets)
+            series.observe(value)
+
+    def snapshot(self):
+        """{name: Metric copy} of everything recorded so far (collectors excluded)."""
+        with self._lock:
+            copies = {}
+            for name, metric in self._metrics.items():
+                copy = Metric(name, metric.kind, metric.help, metric.labels, metric.buckets)
+                for key, value in metric.series.items():
+                    if isinstance(value, Histogram):
+                        hist = Histogram(value.buckets)
+                        hist.counts, hist.sum, hist.count = list(value.counts), value.sum, value.count
+                        value = hist
+                    copy.series[key] = value
+                copies[name] = copy
+            return copies
+
+    def _collected(self):
+        # Outside the lock: collectors may run SQL, which records metrics itself.
+        metrics = []
+        for collect in self._collectors:
+            try:
+                for name, kind, help, labels, samples in collect():
+                    metric = Metric(name, kind, help, labels)
+                    metric.series = dict(samples)
+                    metrics.append(metric)
+            except Exception as e:
+                print(f"[METRICS] Collector failed: {e}")
+        return metrics
+
+    def render(self):
+        """Everything in Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in list(self.snapshot().values()) + self._collected():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(metric.series.items()):
+                labels = list(zip(metric.labels, key))
+                if not isinstance(value, Histogram):
+                    lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets + (float("inf"),), value.counts):
+                    cumulative += count
+                    lines.append(f"{metric.name}_bucket{_labels(labels + [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{metric.name}_sum{_labels(labels)} {_number(value.sum)}")
+                lines.append(f"{metric.name}_count{_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+registry = Registry()
+registry.histogram("shadow_gemini_call_seconds", "Gemini call latency per call site, fallbacks included.",
+                   ("site",))
+registry.histogram("shadow_gemini_request_seconds", "Latency of each model attempt.", ("site", "model", "outcome"))
+registry.counter("shadow_gemini_answers_total", "Calls per site by the model that finally answered.",
+                 ("site", "model"))
+registry.counter("shadow_gemini_retries_total", "Failed attempts that moved on to the next model.", ("site", "model"))
+registry.counter("shadow_gemini_fallbacks_total", "Calls answered by a model other than the site's first choice.",
+                 ("site",))
+registry.counter("shadow_gemini_exhausted_total", "Calls that no model could answer.", ("site",))
+registry.counter("shadow_gemini_cache_hits_total", "Calls answered from the response cache.", ("site",))
+registry.counter("shadow_gemini_tokens_total", "Tokens per site (input includes cached).", ("site", "kind"))
+registry.histogram("shadow_sqlite_query_seconds", "SQLite statement execution time.", ("statement",),
+                   SQLITE_BUCKETS)
+
+# Recording helpers (model router, storage)
+
+def gemini_attempt(site, model, seconds, ok):
+    registry.observe("shadow_gemini_request_seconds", seconds, site, model, "ok" if ok else "error")
+    if not ok:
+        registry.inc("shadow_gemini_retries_total", site, model)
+
+def gemini_answered(site, model, seconds, preferred):
+    registry.observe("shadow_gemini_call_seconds", seconds, site)
+    registry.inc("shadow_gemini_answers_total", site, model)
+    if model != preferred:
+        registry.inc("shadow_gemini_fallbacks_total", site)
+
+def gemini_exhausted(site, seconds):
+    registry.observe("shadow_gemini_call_seconds", seconds, site)
+    registry.inc("shadow_gemini_exhausted_total", site)
+
+def gemini_cache_hit(site, seconds):
+    registry.observe("shadow_gemini_call_seconds", seconds, site)
+    registry.inc("shadow_gemini_cache_hits_total", site)
+
+def gemini_tokens(site, counts):
+    for kind, count in counts.items():
+        if count:
+            registry.inc("shadow_gemini_tokens_total", site, kind.replace("_tokens", ""), amount=count)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDERS_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    """Normalized SQL: whitespace collapsed, `?, ?, ?` lists folded (one series per statement shape)."""
+    sql = _PLACEHOLDERS_RE.sub("?, ...", _WHITESPACE_RE.sub(" ", sql).strip())
+    return sql if len(sql) <= STATEMENT_CHARS else sql[:STATEMENT_CHARS - 3] + "..."
+
+def sqlite_query(sql, seconds):
+    registry.observe("shadow_sqlite_query_seconds", seconds, statement_label(sql))
+
+# Summary
+
+def _ms(seconds, digits=0):
+    return f"{'inf':>6}" if seconds == float("inf") else f"{seconds * 1000:6.{digits}f}"
+
+def summary(snapshot=None, top=10):
+    """Plain-text report: Gemini per site, then the slowest SQLite statements by total time."""
+    metrics = snapshot or registry.snapshot()
+    calls = metrics["shadow_gemini_call_seconds"].series
+    lines = ["GEMINI            calls   p50 ms   p95 ms  tokens in (cached) / out  retries  fallbacks  exhausted  models"]
+    for (site,), hist in sorted(calls.items()):
+        count = {name: sum(n for key, n in metrics[name].series.items() if key[0] == site) for name in (
+            "shadow_gemini_retries_total", "shadow_gemini_fallbacks_total", "shadow_gemini_exhausted_total",
+            "shadow_gemini_cache_hits_total")}
+        tokens = {kind: metrics["shadow_gemini_tokens_total"].series.get((site, kind), 0)
+                  for kind in ("input", "cached", "output")}
+        models = [f"{model} x{n}" for (s, model), n in sorted(metrics["shadow_gemini_answers_total"].series.items())
+                  if s == site]
+        if count["shadow_gemini_cache_hits_total"]:
+            models.append(f"cache x{count['shadow_gemini_cache_hits_total']}")
+        lines.append(f"{site[:16]:<16} {hist.count:>6}  {_ms(hist.quantile(0.5))}   {_ms(hist.quantile(0.95))}  "
+                     f"{tokens['input']:>10} ({tokens['cached']}) / {tokens['output']:<6}  "
+                     f"{count['shadow_gemini_retries_total']:>7}  {count['shadow_gemini_fallbacks_total']:>9}  "
+                     f"{count['shadow_gemini_exhausted_total']:>9}  {', '.join(models)}")
+    if len(lines) == 1:
+        lines.append("(no Gemini calls)")
+
+    queries = sorted(metrics["shadow_sqlite_query_seconds"].series.items(), key=lambda item: -item[1].sum)
+    total = sum(hist.count for _, hist in queries)
+    lines += ["", f"SQLITE ({total} statements, {len(queries)} distinct; top {top} by total time)",
+              "  count  total ms  mean ms   p95 ms  statement"]
+    for (statement,), hist in queries[:top]:
+        lines.append(f"{hist.count:>7}  {hist.sum * 1000:8.1f}  {hist.sum * 1000 / hist.count:7.3f}  "
+                     f"{_ms(hist.quantile(0.95), 2)}  {statement}")
+    return "\n".join(lines)
+
+def fetch_summary(url="http://localhost:8000"):
+    """A running backend's summary (GET /metrics?format=summary)."""
+    with urllib.request.urlopen(f"{url.rstrip('/')}/metrics?format=summary", timeout=10) as response:
+        return response.read().decode("utf-8")
+
+if __name__ == "__main__":
+    print(fetch_summary(*sys.argv[1:2]))
@@ -0,0 +1,141 @@
+import importlib.util
+import os
+import re
+import sqlite3
+import time
+
+from agents import storage
+
+# Versioned schema migrations for player stats databases.
+# db/quests.sql is the baseline (idempotent CREATE ... IF NOT EXISTS), frozen
+# at the schema that predates the runner: it is only replayed while some
+# migration is pending, so an edit there would never reach an up-to-date
+# database. Every table, index or trigger since then lives in
+# db/migrations/NNNN_name.sql or NNNN_name.py (with an `upgrade(conn)`
+# function), applied in order, each in its own transaction, recording the
+# version in schema_migrations. Used by db/init_db.py, the shard templates
+# (agents/tenants.py) and the backend.
+
+MIGRATIONS_DIR = os.path.join(storage.PROJECT_ROOT, 'db', 'migrations')
+BASELINE_PATH = os.path.join(storage.PROJECT_ROOT, 'db', 'quests.sql')
+
+_MIGRATION_RE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at REAL NOT NULL
+)
+"""
+
+def discover(directory=None):
+    """[(version, name, path)] sorted by version."""
+    directory = directory or MIGRATIONS_DIR
+    found = []
+    for filename in os.listdir(directory):
+        match = _MIGRATION_RE.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return found
+
+def latest_version():
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+def current_version(conn):
+    conn.execute(SCHEMA)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+def _statements(sql):
+    """Splits a script into complete statements (trigger bodies stay whole)."""
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement
+            statement = ""
+    if statement.strip() and sqlite3.complete_statement(statement + ";"):
+        yield statement
+
+def run_script(conn, path):
+    """Runs a .sql file statement by statement inside the caller's transaction.
+
+    (sqlite3's executescript() would commit the open transaction first.)
+    """
+    with open(path, 'r') as f:
+        for statement in _statements(f.read()):
+            conn.execute(statement)
+
+def _apply(conn, version, name, path):
+    if path.endswith(".py"):
+        spec = importlib.util.spec_from_file_location(f"migration_{version:04d}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(conn)
+    else:
+        run_script(conn, path)
+    conn.execute("INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                 (version, name, time.time()))
+
+def migrate(db_path=storage.DB_PATH, target=None):
+    """Brings `db_path` to `target` (default: latest). Returns the versions applied."""
+    migrations = [m for m in discover() if target is None or m[0] <= target]
+    conn = sqlite3.connect(db_path, timeout=storage.BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    try:
+        if migrations and current_version(conn) >= migrations[-1][0]:
+            return []  # Up to date: one query, the common case
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            run_script(conn, BASELINE_PATH)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        applied = []
+        for version, name, path in migrations:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-checked under the write lock: another process may have got here first.
+                if conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                    conn.execute("ROLLBACK")
+                    continue
+                _apply(conn, version, name, path)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version)
+        return applied
+    finally:
+        conn.close()
+
+def status(db_path=storage.DB_PATH):
+    """[(version, name, applied_at or None)] for every known migration."""
+    conn = sqlite3.connect(db_path)
+    try:
+        current_version(conn)
+        applied = dict(conn.execute("SELECT version, applied_at FROM schema_migrations").fetchall())
+    finally:
+        conn.close()
+    return [(version, name, applied.get(version)) for version, name, _ in discover()]
+
+if __name__ == "__main__":
+    # python -m agents.migrations [status|up] [db_path]
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else "up"
+    path = sys.argv[2] if len(sys.argv) > 2 else storage.DB_PATH
+    if command == "status":
+        for version, name, applied_at in status(path):
+            state = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(applied_at)) if applied_at else "pending"
+            print(f"{version:04d} {name:<24} {state}")
+    else:
+        applied = migrate(path)
+        print(f"Applied {len(applied)} migration(s) to {path}: {applied}" if applied else f"{path} is up to date.")
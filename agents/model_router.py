@@ -0,0 +1,368 @@
+import asyncio
+import threading
+import time
+
+from google.genai import types
+
+from agents import gemini, metrics
+from agents.llm_cache import cache as response_cache
+
+# Model Router ("Hydra" v2)
+# One router per process, shared by every Gemini call site. For each model it
+# tracks request and token budgets (token buckets refilled continuously),
+# a circuit breaker that opens after repeated 429/RESOURCE_EXHAUSTED, and an
+# EWMA of latency. A call goes straight to the best model that is healthy
+# and has budget right now; nothing sleeps waiting for a quota to refill.
+
+HYDRA = [
+    "gemini-2.5-flash",
+    "gemini-2.0-flash",
+    "gemini-2.0-flash-lite-001",
+]
+
+# Per-model budgets (requests/min, tokens/min). Free-tier defaults; override with configure().
+MODEL_LIMITS = {
+    "gemini-2.5-flash": (10, 250_000),
+    "gemini-2.0-flash": (15, 1_000_000),
+    "gemini-2.0-flash-lite-001": (30, 1_000_000),
+}
+DEFAULT_LIMITS = (10, 250_000)
+
+BREAKER_THRESHOLD = 2          # consecutive rate-limit errors that open the breaker
+FAILURE_THRESHOLD = 3          # consecutive errors of any kind that open it
+BREAKER_COOLDOWN = 30.0        # seconds, doubled on every re-open
+BREAKER_MAX_COOLDOWN = 300.0
+SLOW_LATENCY = 20.0            # seconds; slower models are demoted behind fast ones
+LATENCY_BAND = 5.0             # seconds; within a health tier, a model a band slower ranks behind
+LATENCY_ALPHA = 0.3            # EWMA weight of the newest sample
+
+# Token accounting: per-site totals of each response's usage_metadata field
+USAGE_FIELDS = {
+    "input_tokens": "prompt_token_count",
+    "cached_tokens": "cached_content_token_count",  # Part of input_tokens served from a context cache
+    "output_tokens": "candidates_token_count",
+    "thinking_tokens": "thoughts_token_count",
+}
+
+def usage_counts(usage):
+    """{USAGE_FIELDS key: count} for one response's usage_metadata (zeros if missing)."""
+    return {field: (getattr(usage, attr, None) or 0) if usage else 0 for field, attr in USAGE_FIELDS.items()}
+
+def is_rate_limited(error):
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+def estimate_tokens(contents):
+    """Rough input size (≈4 chars/token) used to debit the token bucket up front."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(c) for c in contents)
+    parts = getattr(contents, "parts", None)
+    if parts:
+        return sum(len(getattr(p, "text", None) or "") // 4 + 1 for p in parts)
+    return 258  # Images and other blobs: Gemini bills a flat tile cost
+
+class AllModelsUnavailable(Exception):
+    """Every candidate is rate-limited, out of budget, or failed."""
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, amount, now):
+        self._refill(now)
+        return self.tokens >= min(amount, self.capacity)
+
+    def take(self, amount):
+        self.tokens -= amount  # May go negative on under-estimates; refill pays it back
+
+class ModelState:
+    def __init__(self, name, rpm, tpm):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.consecutive_failures = 0
+        self.consecutive_rate_limits = 0
+        self.open_until = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.half_open = False
+        self.latency = None
+        self.last_error = None
+
+    def snapshot(self, now):
+        return {
+            "model": self.name,
+            "state": "open" if now < self.open_until else ("half-open" if self.half_open else "closed"),
+            "requests_available": round(self.requests.tokens, 2),
+            "tokens_available": round(self.tokens.tokens),
+            "latency_ewma_s": round(self.latency, 3) if self.latency is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+class ModelRouter:
+    def __init__(self, limits=None):
+        self.limits = dict(MODEL_LIMITS, **(limits or {}))
+        self._models = {}
+        self._usage = {}  # site -> {"requests": n, USAGE_FIELDS...}
+        self._lock = threading.Lock()
+
+    def configure(self, model, rpm, tpm):
+        with self._lock:
+            self.limits[model] = (rpm, tpm)
+            self._models.pop(model, None)
+
+    def _state(self, model):
+        state = self._models.get(model)
+        if state is None:
+            state = ModelState(model, *self.limits.get(model, DEFAULT_LIMITS))
+            self._models[model] = state
+        return state
+
+    def candidates(self, models=None):
+        """Models whose breaker allows a call, best first.
+
+        Models that failed recently or run slow are demoted behind healthy
+        ones. Within a tier, models are ordered by latency EWMA in LATENCY_BAND
+        steps, and the caller's preference order breaks ties: a model a band
+        faster than the preferred one goes first, a few hundred ms don't count.
+        Models with no latency sample yet rank as fastest.
+        """
+        models = models or HYDRA
+        now = time.monotonic()
+        ranked = []
+        with self._lock:
+            for rank, model in enumerate(models):
+                state = self._state(model)
+                if now < state.open_until:
+                    continue
+                if state.open_until and not state.half_open:
+                    state.half_open = True  # Cooldown over: allow a trial call
+                slow = state.latency is not None and state.latency > SLOW_LATENCY
+                tier = 2 if state.half_open else (1 if state.consecutive_failures or slow else 0)
+                band = int(state.latency // LATENCY_BAND) if state.latency is not None else 0
+                ranked.append((tier, band, rank, model))
+        return [model for *_, model in sorted(ranked)]
+
+    def reserve(self, model, tokens):
+        """Debits one request + `tokens` if the model has budget now. Never waits."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(model)
+            if not (state.requests.available(1, now) and state.tokens.available(tokens, now)):
+                return False
+            state.requests.take(1)
+            state.tokens.take(tokens)
+            return True
+
+    def record_success(self, model, latency, reserved_tokens=0, used_tokens=None):
+        with self._lock:
+            state = self._state(model)
+            state.consecutive_failures = 0
+            state.consecutive_rate_limits = 0
+            state.open_until = 0.0
+            state.half_open = False
+            state.cooldown = BREAKER_COOLDOWN
+            state.latency = latency if state.latency is None else (
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * state.latency)
+            if used_tokens is not None:
+                state.tokens.take(used_tokens - reserved_tokens)  # Settle the estimate
+
+    def record_failure(self, model, error):
+        with self._lock:
+            state = self._state(model)
+            state.last_error = error
+            state.consecutive_failures += 1
+            if is_rate_limited(error):
+                state.consecutive_rate_limits += 1
+                state.requests.tokens = min(state.requests.tokens, 0.0)  # Server says we're out
+            tripped = (state.half_open
+                       or state.consecutive_rate_limits >= BREAKER_THRESHOLD
+                       or state.consecutive_failures >= FAILURE_THRESHOLD)
+            if tripped:
+                state.open_until = time.monotonic() + state.cooldown
+                state.cooldown = min(state.cooldown * 2, BREAKER_MAX_COOLDOWN)
+                state.half_open = False
+                print(f"[ROUTER] Circuit open for {model} ({state.open_until - time.monotonic():.0f}s): {error}")
+
+    @staticmethod
+    def record_answer(site, model, started, called, models=None):
+        """Metrics for a successful call: this attempt (from `started`) and the whole call (from `called`)."""
+        now = time.perf_counter()
+        metrics.gemini_attempt(site, model, now - started, ok=True)
+        metrics.gemini_answered(site, model, now - called, preferred=(models or HYDRA)[0])
+
+    def record_usage(self, site, usage):
+        """Adds one response's usage_metadata to `site`'s token totals. Returns this request's counts."""
+        counts = usage_counts(usage)
+        metrics.gemini_tokens(site, counts)
+        with self._lock:
+            totals = self._usage.setdefault(site, dict.fromkeys(("requests", *USAGE_FIELDS), 0))
+            totals["requests"] += 1
+            for field, count in counts.items():
+                totals[field] += count
+        return counts
+
+    def usage(self):
+        """{site: {"requests", "input_tokens", "cached_tokens", "output_tokens", "thinking_tokens"}} since start-up."""
+        with self._lock:
+            return {site: dict(totals) for site, totals in self._usage.items()}
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return [state.snapshot(now) for state in self._models.values()]
+
+    def attempts(self, contents, models=None):
+        """Yields (model, reserved_tokens) lazily, reserving budget just before each attempt."""
+        tokens = estimate_tokens(contents)
+        for model in self.candidates(models):
+            if not self.reserve(model, tokens):
+                print(f"[ROUTER] {model} out of budget, skipping.")
+                continue
+            yield model, tokens
+
+    @staticmethod
+    def exhausted(last_error):
+        if last_error is None:
+            return AllModelsUnavailable("All models exhausted: circuits open or out of budget.")
+        return AllModelsUnavailable(f"All models exhausted. Last error: {last_error}")
+
+    @staticmethod
+    def _used_tokens(response):
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None) if usage else None
+
+    @staticmethod
+    def _config_for(config, model):
+        return config(model) if callable(config) else config
+
+    def _cache_lookup(self, contents, config, models, use_cache):
+        """Returns (keys, cached_hit). keys is None when caching doesn't apply."""
+        if not use_cache:
+            return None, None
+        keys = response_cache.keys_for(models or HYDRA, contents, config)
+        if not keys:
+            return None, None
+        try:
+            hit = response_cache.get(keys)
+        except Exception as e:
+            print(f"[CACHE] Lookup failed: {e}")
+            return None, None
+        if hit:
+            model, response_json = hit
+            return keys, (types.GenerateContentResponse.model_validate_json(response_json), model)
+        return keys, None
+
+    @staticmethod
+    def _cache_store(keys, model, response, ttl):
+        if not keys or not response.candidates:
+            return
+        try:
+            response_cache.put(keys[model], model, response.model_dump_json(exclude_none=True), ttl)
+        except Exception as e:
+            print(f"[CACHE] Store failed: {e}")
+
+    def generate(self, contents, config=None, models=None, site="gemini", cache=True, cache_ttl=None,
+                 on_failure=None):
+        """Sync generate_content through the best available model.
+
+        `config` may be a callable (model -> config) for model-specific options.
+        Identical requests are served from the response cache unless `cache=False`
+        (required for calls with side effects, e.g. tool-calling audits).
+        `on_failure(model, error)` runs after a failed attempt, before the next
+        model is tried (e.g. to undo tool writes made during that attempt).
+        Returns (response, model). Raises AllModelsUnavailable.
+        """
+        called = time.perf_counter()
+        keys, hit = self._cache_lookup(contents, config, models, cache)
+        if hit:
+            print(f"--- {site.upper()}: cache hit ({hit[1]}) ---")
+            metrics.gemini_cache_hit(site, time.perf_counter() - called)
+            return hit
+
+        last_error = None
+        for model, reserved in self.attempts(contents, models):
+            start = time.perf_counter()
+            try:
+                print(f"--- {site.upper()}: {model} ---")
+                response = gemini.get_client().models.generate_content(
+                    model=model, contents=contents, config=self._config_for(config, model))
+            except Exception as e:
+                print(f"Model Error ({model}): {e}")
+                self.record_failure(model, e)
+                metrics.gemini_attempt(site, model, time.perf_counter() - start, ok=False)
+                if on_failure:
+                    on_failure(model, e)
+                last_error = e
+                continue
+            self.record_success(model, time.perf_counter() - start, reserved, self._used_tokens(response))
+            self.record_answer(site, model, start, called, models)
+            self.record_usage(site, response.usage_metadata)
+            self._cache_store(keys, model, response, cache_ttl)
+            return response, model
+        metrics.gemini_exhausted(site, time.perf_counter() - called)
+        raise self.exhausted(last_error)
+
+    async def generate_async(self, contents, config=None, models=None, site="gemini", cache=True, cache_ttl=None):
+        """Async twin of generate(). Cache I/O runs off the event loop."""
+        called = time.perf_counter()
+        keys, hit = await asyncio.to_thread(self._cache_lookup, contents, config, models, cache)
+        if hit:
+            print(f"--- {site.upper()}: cache hit ({hit[1]}) ---")
+            metrics.gemini_cache_hit(site, time.perf_counter() - called)
+            return hit
+
+        last_error = None
+        for model, reserved in self.attempts(contents, models):
+            start = time.perf_counter()
+            try:
+                print(f"--- {site.upper()}: {model} ---")
+                response = await gemini.get_client().aio.models.generate_content(
+                    model=model, contents=contents, config=self._config_for(config, model))
+            except Exception as e:
+                print(f"Model Error ({model}): {e}")
+                self.record_failure(model, e)
+                metrics.gemini_attempt(site, model, time.perf_counter() - start, ok=False)
+                last_error = e
+                continue
+            self.record_success(model, time.perf_counter() - start, reserved, self._used_tokens(response))
+            self.record_answer(site, model, start, called, models)
+            self.record_usage(site, response.usage_metadata)
+            await asyncio.to_thread(self._cache_store, keys, model, response, cache_ttl)
+            return response, model
+        metrics.gemini_exhausted(site, time.perf_counter() - called)
+        raise self.exhausted(last_error)
+
+router = ModelRouter()
+
+BREAKER_STATES = {"closed": 0, "half-open": 1, "open": 2}
+
+def _router_metrics():
+    models = router.status()
+
+    def samples(field, convert=float):
+        return [((model["model"],), convert(model[field])) for model in models if model[field] is not None]
+
+    return [
+        ("shadow_router_breaker_state", "gauge", "Circuit breaker per model (0 closed, 1 half-open, 2 open).",
+         ("model",), samples("state", BREAKER_STATES.get)),
+        ("shadow_router_latency_ewma_seconds", "gauge", "Latency EWMA the router ranks models by.",
+         ("model",), samples("latency_ewma_s")),
+        ("shadow_router_requests_available", "gauge", "Request budget left this minute.",
+         ("model",), samples("requests_available")),
+        ("shadow_router_tokens_available", "gauge", "Token budget left this minute.",
+         ("model",), samples("tokens_available")),
+    ]
+
+metrics.registry.collector(_router_metrics)
@@ -1,15 +1,16 @@
 import os
-import sqlite3
+import re
 import json
 import time
+import asyncio
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
+from agents import gemini, metrics, storage, tenants
+from agents.model_router import HYDRA, AllModelsUnavailable, router, usage_counts
+from agents.session_store import SessionStore
 
 load_dotenv()
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../db/player_stats.db')
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 # The Sovereign's Interview Script
 SYSTEM_INSTRUCTION = """
@@ -18,120 +19,248 @@ You are conducting an onboarding interview to initialize a new User.
 Your tone is cold, authoritative, yet deeply insightful. You see through excuses.
 
 The Interview consists of exactly 3 questions.
-1. "What is your current rank/skill level in your primary domain? (Be honest, the System sees all)."
-2. "What is the singular 'Great Quest' you must clear in the next 12 weeks? (e.g., Thesis, SC Exams, Job Offer)."
-3. "What is your primary 'Shadow' (weakness)? (e.g., Burnout, Procrastination, Math)."
+1. "[Q1] What is your current rank/skill level in your primary domain? (Be honest, the System sees all)."
+2. "[Q2] What is the singular 'Great Quest' you must clear in the next 12 weeks? (e.g., Thesis, SC Exams, Job Offer)."
+3. "[Q3] What is your primary 'Shadow' (weakness)? (e.g., Burnout, Procrastination, Math)."
 
 RULES:
 - Ask ONE question at a time.
+- Write the question's tag ([Q1], [Q2], [Q3]) right before it, every time you ask it (also when asking again).
 - Verify the user answers meaningfully. If they type gibberish, demand a proper answer.
+- An "INTERVIEW STATE" message lists answers already accepted; never ask those questions again.
 - After the 3rd answer, say "ANALYSIS COMPLETE. INITIATING GENESIS..." and produce the JSON payload with `thinking_level="high"` analysis.
 """
 
-def get_onboarding_history(session_id):
-    """Retrieves chat history for a session (mocked for now, state is usually frontend-driven)."""
-    # In a real app, we'd pull from a redis layer or DB. 
-    # For now, we assume the frontend sends the history context.
-    return []
+# Interview answer keys, in question order. The model tags question n as [Qn]
+# (SYSTEM_INSTRUCTION); the client's untagged greeting asks question 1.
+QUESTIONS = ("rank", "great_quest", "shadow")
+QUESTION_TAG_RE = re.compile(r"\[Q(\d)\]")
+ANSWER_CHARS = 500  # Longer answers are clipped in the compacted summary
 
-def process_chat(history, user_input):
-    """Processes the chat turn."""
-    
-    # 1. Prepare Chat
-    model_id = "gemini-2.5-flash"
-    
-    # Convert history dicts to Content objects
-    contents = []
-    for msg in history:
-        role = "user" if msg["role"] == "user" else "model"
-        contents.append(types.Content(role=role, parts=[types.Part(text=msg["content"])]))
-    
-    contents.append(types.Content(role="user", parts=[types.Part(text=user_input)]))
+# Prompt compaction: once an answer is captured, the turns up to it are sent as
+# a short JSON summary instead of verbatim (SHADOW_ONBOARDING_COMPACT=0 disables).
+COMPACT_HISTORY = os.getenv("SHADOW_ONBOARDING_COMPACT", "1") != "0"
+
+# SYSTEM_INSTRUCTION is sent inline on every turn. At ~265 tokens it is far
+# below Gemini's 1024-token minimum for cached contents
+# (agents/context_cache.py), so onboarding never qualifies for a context cache.
+
+def to_content(role, text):
+    role = "user" if role == "user" else "model"
+    return types.Content(role=role, parts=[types.Part(text=text)])
+
+# Sessions are keyed by random ids, so they live in the shared default DB, not in player shards.
+SESSIONS = SessionStore(to_content, db_path=storage.DB_PATH)
+
+def get_onboarding_history(session_id, player_id=tenants.DEFAULT_PLAYER):
+    """Retrieves chat history for a session (empty if unknown, expired or another player's)."""
+    session = SESSIONS.get(session_id)
+    return list(session.history) if session and session.player_id == player_id else []
+
+async def open_session(session_id=None, history=None, player_id=tenants.DEFAULT_PLAYER):
+    """Resumes `session_id`, or starts a new session for `player_id` seeded with `history`.
+
+    Raises KeyError if `session_id` is unknown, expired or belongs to another player.
+    """
+    if session_id is None:
+        return await asyncio.to_thread(SESSIONS.create, player_id, history)
+    session = await asyncio.to_thread(SESSIONS.get, session_id)
+    if session is None or session.player_id != player_id:
+        raise KeyError(session_id)
+    return session
+
+# Resilience Protocol (Multi-Model Fallback order, health-aware via agents/model_router.py)
+MODELS_TO_TRY = HYDRA
+
+GENESIS_TRIGGER = "INITIATING GENESIS"
+JSON_FENCE = "```json"
+
+def question_asked(text):
+    """Index in QUESTIONS of the question a model message asks (its [Qn] tag), or None."""
+    match = QUESTION_TAG_RE.search(text)
+    if match and 1 <= int(match.group(1)) <= len(QUESTIONS):
+        return int(match.group(1)) - 1
+    return None
+
+def interview_state(history):
+    """({answer key: text}, index of the first message not covered by them).
+
+    An answer counts as captured once the model moves on: its next message
+    asks a later question (or starts Genesis). A re-asked question keeps its
+    tag, which leaves the answer uncaptured, so the retry stays verbatim.
+    """
+    answers = {}
+    asked = -1  # Index in QUESTIONS of the question currently open
+    answer = None
+    covered = 0
+    for i, msg in enumerate(history):
+        if msg["role"] == "user":
+            answer = msg["content"] if asked >= 0 else None
+            continue
+        text = msg["content"]
+        if asked == len(QUESTIONS) - 1 and GENESIS_TRIGGER.lower() in text.lower():
+            question = len(QUESTIONS)
+        else:
+            question = question_asked(text)
+            if question is None and asked < 0:
+                question = 0  # Greeting
+        if question is None or question <= asked:
+            continue
+        if answer is not None:
+            answers[QUESTIONS[asked]] = answer[:ANSWER_CHARS]
+            covered = i
+        asked = question
+        answer = None
+    return answers, covered
+
+def summary_content(answers):
+    return to_content("user", "INTERVIEW STATE (earlier turns, compacted): " + json.dumps(answers))
+
+def compact(history, contents):
+    """`contents` with every captured answer's turns replaced by one summary message."""
+    answers, covered = interview_state(history)
+    if not answers:
+        return contents
+    return [summary_content(answers)] + contents[covered:]
+
+def build_contents(history, user_input, session=None):
+    """Converts history + the new message into Content objects.
+
+    With a session, its already-converted contents are reused and only the
+    new message is converted. Captured answers are compacted (COMPACT_HISTORY).
+    """
+    if session is not None:
+        history, contents = session.history, session.contents
+    else:
+        contents = [to_content(msg["role"], msg["content"]) for msg in history]
+    if COMPACT_HISTORY:
+        contents = compact(history, contents)
+    return contents + [to_content("user", user_input)]
+
+def session_history(history, session=None):
+    return session.history if session is not None else history
+
+async def record_turn(session, user_input, result):
+    if session is not None and "reply" in result and "error" not in result:
+        await asyncio.to_thread(SESSIONS.append, session, user_input, result["reply"])
+
+def chat_config(model=None):
+    return types.GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION, response_mime_type="text/plain")
+
+def log_usage(site, counts):
+    print(f"--- {site.upper()}: {counts['input_tokens']} input tokens ({counts['cached_tokens']} cached) ---")
+
+async def finish_turn(ai_reply, contents, history=(), user_input=None):
+    """Builds the turn result, running Genesis if the interview is complete."""
+    if GENESIS_TRIGGER not in ai_reply:
+        return {"reply": ai_reply}
+
+    # Clean the reply for the user (remove the raw JSON)
+    user_reply_text = ai_reply.split(JSON_FENCE)[0].strip()
+    if not user_reply_text:
+        user_reply_text = "ANALYSIS COMPLETE. INITIATING GENESIS..."
+        
+    # We need to extract the JSON payload.
+    # Let's ask Gemini to generate the structured data separately to ensure purity.
+    # With all three answers captured, the summary is the whole interview.
+    answers, _ = interview_state(list(history) + [{"role": "user", "content": user_input or ""},
+                                                  {"role": "model", "content": ai_reply}])
+    if COMPACT_HISTORY and len(answers) == len(QUESTIONS):
+        contents = [summary_content(answers)]
+    genesis_data = await generate_genesis_data(contents)
     
-    # 2. Resilience Protocol (Multi-Model Fallback)
-    models_to_try = [
-        "gemini-2.5-flash", 
-        "gemini-2.0-flash", 
-        "gemini-2.0-flash-lite-001"
-    ]
+    # Fallback for Genesis if Gemini fails there too
+    if not genesis_data:
+        genesis_data = get_mock_genesis_data()
+
+    return {
+        "reply": user_reply_text,
+        "genesis": genesis_data
+    }
+
+async def process_chat(history, user_input, session=None):
+    """Processes the chat turn (async: never blocks the server's event loop or threadpool).
+
+    Pass a session from open_session() to use server-side history instead of `history`.
+    """
+    contents = build_contents(history, user_input, session)
     
-    response = None
+    try:
+        response, model = await router.generate_async(contents, config=chat_config, models=MODELS_TO_TRY, site="process_chat")
+    except AllModelsUnavailable as e:
+        return {"error": str(e)}
+    log_usage("process_chat", usage_counts(response.usage_metadata))
+        
+    result = await finish_turn(response.text, contents, session_history(history, session), user_input)
+    await record_turn(session, user_input, result)
+    return result
+
+async def stream_chat(history, user_input, session=None):
+    """Streams the chat turn as (event, data) pairs.
+
+    Yields ("chunk", text) as Gemini produces it, then exactly one terminal
+    ("done", result) with the same shape process_chat returns, or ("error", result).
+    A model that fails before emitting anything falls through to the next one;
+    once text has reached the client, a failure ends the stream with an error.
+    """
+    contents = build_contents(history, user_input, session)
     last_error = None
-    
-    for model in models_to_try:
+    called = time.perf_counter()
+
+    for model, reserved in router.attempts(contents, MODELS_TO_TRY):
+        reply = ""
+        sent = 0            # chars of `reply` already forwarded
+        fenced = False      # hit the raw JSON block: stop forwarding
+        started = time.perf_counter()
+        usage = None
         try:
-            print(f"--- ONBOARDING: Analyzing with {model} ---")
-            response = client.models.generate_content(
+            print(f"--- ONBOARDING (STREAM): Analyzing with {model} ---")
+            stream = await gemini.get_client().aio.models.generate_content_stream(
                 model=model,
                 contents=contents,
-                config=types.GenerateContentConfig(
-                    system_instruction=SYSTEM_INSTRUCTION,
-                    response_mime_type="text/plain"
-                )
+                config=chat_config(model)
             )
-            break # Success, exit loop
+            async for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if not chunk.text:
+                    continue
+                reply += chunk.text
+                if fenced:
+                    continue
+
+                fence_at = reply.find(JSON_FENCE)
+                if fence_at != -1:
+                    fenced = True
+                    safe_end = fence_at
+                else:
+                    # Hold back a possible partial fence at the tail
+                    safe_end = max(sent, len(reply) - len(JSON_FENCE) + 1)
+                if safe_end > sent:
+                    yield "chunk", reply[sent:safe_end]
+                    sent = safe_end
         except Exception as e:
             print(f"Model Error ({model}): {e}")
+            router.record_failure(model, e)
+            metrics.gemini_attempt("stream_chat", model, time.perf_counter() - started, ok=False)
             last_error = e
-            # If rate limited, just try the next model immediately
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                print(f"Rate limit on {model}. Switching to next model...")
-                continue
-            else:
-                # If it's a non-rate-limit error (e.g. invalid arg), maybe stop or try next? 
-                # Let's try next to be safe.
+            if not sent:
                 continue
+            yield "error", {"error": f"Stream interrupted on {model}: {str(e)}", "reply": reply[:sent]}
+            return
 
-    if not response:
-        return {"error": f"All models exhausted. Last error: {str(last_error)}"}
-        
-    ai_reply = response.text
-    
-    # 3. Check for Completion Trigger
-    # 3. Check for Completion Trigger
-    if "INITIATING GENESIS" in ai_reply:
-        # Clean the reply for the user (remove the raw JSON)
-        user_reply_text = ai_reply.split("```json")[0].strip()
-        if not user_reply_text:
-            user_reply_text = "ANALYSIS COMPLETE. INITIATING GENESIS..."
-            
-        # We need to extract the JSON payload.
-        # Let's ask Gemini to generate the structured data separately to ensure purity.
-        genesis_data = generate_genesis_data(contents)
-        
-        return {
-            "reply": user_reply_text,
-            "genesis": genesis_data
-        }
+        router.record_success(model, time.perf_counter() - started, reserved,
+                              getattr(usage, "total_token_count", None))
+        router.record_answer("stream_chat", model, started, called, MODELS_TO_TRY)
+        log_usage("stream_chat", router.record_usage("stream_chat", usage))
+        if not fenced and len(reply) > sent:
+            yield "chunk", reply[sent:]
+        result = await finish_turn(reply, contents, session_history(history, session), user_input)
+        await record_turn(session, user_input, result)
+        yield "done", result
+        return
 
-    if not response:
-        # FALLBACK: OFFLINE BACKUP PROTOCOL
-        print("CRITICAL: All models failed. Engaging Offline Backup Protocol.")
-        return fallback_to_backup_protocol(history, user_input)
-        
-    ai_reply = response.text
-    
-    # 3. Check for Completion Trigger
-    if "INITIATING GENESIS" in ai_reply:
-        # Clean the reply for the user (remove the raw JSON)
-        user_reply_text = ai_reply.split("```json")[0].strip()
-        if not user_reply_text:
-            user_reply_text = "ANALYSIS COMPLETE. INITIATING GENESIS..."
-            
-        # We need to extract the JSON payload.
-        # Let's ask Gemini to generate the structured data separately to ensure purity.
-        genesis_data = generate_genesis_data(contents)
-        
-        # Fallback for Genesis if Gemini fails there too
-        if not genesis_data:
-             genesis_data = get_mock_genesis_data()
-
-        return {
-            "reply": user_reply_text,
-            "genesis": genesis_data
-        }
-
-    return {"reply": ai_reply}
+    metrics.gemini_exhausted("stream_chat", time.perf_counter() - called)
+    yield "error", {"error": str(router.exhausted(last_error))}
 
 def fallback_to_backup_protocol(history, user_input):
     """Rule-based responses when Gemini is down."""
@@ -188,8 +317,8 @@ def get_mock_genesis_data():
         ]
     }
 
-def generate_genesis_data(chat_history):
-    """Generates the seeding data based on the full interview."""
+async def generate_genesis_data(chat_history):
+    """Generates the seeding data from the interview (its compacted summary once every answer is in)."""
     print("--- INITIATING GENESIS ---")
     
     prompt = """
@@ -210,58 +339,50 @@ def generate_genesis_data(chat_history):
     }
     """
     
-    models_to_try = [
-        "gemini-2.5-flash", 
-        "gemini-2.0-flash", 
-        "gemini-2.0-flash-lite-001"
-    ]
-    
-    for model in models_to_try:
-        try:
-            print(f"--- GENESIS: Connecting with {model} ---")
-            response = client.models.generate_content(
-                model=model,
-                contents=chat_history + [types.Content(role="user", parts=[types.Part(text=prompt)])],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            return response.parsed
-        except Exception as e:
-            print(f"Genesis Error ({model}): {e}")
-            continue
-            
-    print("FATAL: All models failed for Genesis.")
-    return None
+    try:
+        response, model = await router.generate_async(
+            chat_history + [types.Content(role="user", parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json"
+            ),
+            models=MODELS_TO_TRY,
+            site="generate_genesis_data"
+        )
+        log_usage("generate_genesis_data", usage_counts(response.usage_metadata))
+        return response.parsed
+    except AllModelsUnavailable as e:
+        print(f"FATAL: All models failed for Genesis. {e}")
+        return None
 
-def seed_database(genesis_data):
-    """Writes the genesis data to the DB."""
+def seed_database(genesis_data, player_id=tenants.DEFAULT_PLAYER):
+    """Writes the genesis data to the player's DB."""
     if not genesis_data:
         return False
         
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # 1. User Context
-        cursor.execute("""
-            INSERT INTO user_context (grand_goal, shadow_weakness, roadmap_json)
-            VALUES (?, ?, ?)
-        """, (
-            genesis_data['grand_goal'],
-            genesis_data['shadow_weakness'],
-            json.dumps(genesis_data['roadmap'])
-        ))
-        
-        # 2. Initial Quests
-        for q in genesis_data['initial_quests']:
+        db_path = tenants.player_db_path(player_id)
+        with storage.connection(db_path) as conn:
+            cursor = conn.cursor()
+            
+            # 1. User Context
             cursor.execute("""
-                INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value, deadline)
-                VALUES (?, ?, ?, 'ACTIVE', ?, ?, datetime('now', '+7 days'))
-            """, (q['title'], "Genesis Mission", q['difficulty'], q['reward_stat'], 2))
+                INSERT INTO user_context (grand_goal, shadow_weakness, roadmap_json)
+                VALUES (?, ?, ?)
+            """, (
+                genesis_data['grand_goal'],
+                genesis_data['shadow_weakness'],
+                json.dumps(genesis_data['roadmap'])
+            ))
             
-        conn.commit()
-        conn.close()
+            # 2. Initial Quests
+            for q in genesis_data['initial_quests']:
+                cursor.execute("""
+                    INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value, deadline)
+                    VALUES (?, ?, ?, 'ACTIVE', ?, ?, datetime('now', '+7 days'))
+                """, (q['title'], "Genesis Mission", q['difficulty'], q['reward_stat'], 2))
+                
+            conn.commit()
+        storage.bump_data_version(db_path)
         return True
     except Exception as e:
         print(f"DB Seeding Error: {e}")
@@ -1,32 +1,44 @@
 import os
-import sqlite3
 import datetime
+import json
+import uuid
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
-from agents.calendar_sync import fetch_todays_events, block_time_for_deep_work
+from agents import storage, tenants
+from agents.model_router import router
+from agents.calendar_sync import fetch_events_by_day, fetch_todays_events, block_time_for_deep_work
 
 load_dotenv()
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '../db/player_stats.db')
-DAILY_QUEST_PATH = os.path.join(os.path.dirname(__file__), '../DAILY_QUEST.md')
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+DAILY_QUEST_FILE = 'DAILY_QUEST.md'  # Per player, see agents/tenants.py
 
-def get_lowest_stat():
+# Quest queue
+# One Gemini call plans QUEUE_DAYS days of quests for every stat, in a NORMAL
+# and a RECOVERY variant, into quest_queue, each day fitted to that day's
+# calendar. The daily job pops the next quest for (variant, weakest stat),
+# today's first; a change of weakest stat just switches to that stat's rows.
+# Gemini is consulted again only when those rows run out.
+QUEUE_DAYS = 7
+NORMAL, RECOVERY = 'NORMAL', 'RECOVERY'
+METER_STATS = "('Fatigue')"  # Load meters, not stats to train
+QUEST_FIELDS = ("title", "description", "difficulty", "stat_reward_type", "stat_reward_value", "calendar_event_name")
+
+def get_lowest_stat(player_id=tenants.DEFAULT_PLAYER):
     """Finds the player's lowest stat to prioritize."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = storage.connect(tenants.player_db_path(player_id))
         cursor = conn.cursor()
-        cursor.execute("SELECT stat_name, value FROM player_stats ORDER BY value ASC LIMIT 1")
+        cursor.execute(f"SELECT stat_name, value FROM player_stats WHERE stat_name NOT IN {METER_STATS} ORDER BY value ASC LIMIT 1")
         stat = cursor.fetchone()
         conn.close()
         return stat if stat else ("Strength", 10) # Default
     except Exception:
         return ("Strength", 10)
 
-def create_quest_entry(title, description, difficulty, stat_reward_type, stat_reward_value):
+def create_quest_entry(title, description, difficulty, stat_reward_type, stat_reward_value, player_id=tenants.DEFAULT_PLAYER):
     """Writes the quest to the database."""
-    conn = sqlite3.connect(DB_PATH)
+    db_path = tenants.player_db_path(player_id)
+    conn = storage.connect(db_path)
     cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value, deadline)
@@ -34,58 +46,143 @@ def create_quest_entry(title, description, difficulty, stat_reward_type, stat_re
     """, (title, description, difficulty, stat_reward_type, stat_reward_value, datetime.datetime.now().replace(hour=23, minute=59).isoformat()))
     conn.commit()
     conn.close()
+    storage.bump_data_version(db_path)
 
-def save_daily_quest(content):
-    with open(DAILY_QUEST_PATH, "w", encoding="utf-8") as f:
-        f.write(content)
-    print(f"Quest Artifact saved to {DAILY_QUEST_PATH}")
-    
-def generate_daily_quest():
-    """Generates a quest based on stats and schedule."""
-    print("--- ⚔️ QUEST MASTER: INITIATING SEQUENCE ⚔️ ---")
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Check Dungeon State
-    cursor.execute("SELECT is_in_dungeon, job_class FROM player_profile WHERE id=1")
-    row = cursor.fetchone()
-    if row and row[0]: # is_in_dungeon is True
-        print("⚔️ DUNGEON DETECTED ⚔️")
-        print("Protocol Locked: 'The Architect's Descent'")
-        quest_text = """# ⛩️ DAILY QUEST: THE ARCHITECT'S DESCENT
-**Status**: LOCKED (Dungeon Active)
-**Objective**: Survival.
-1. Complete a microservice module.
-2. Complete 100 Sambo Throws.
-**Penalty for Failure**: Stat Reset.
-"""
-        save_daily_quest(quest_text)
-        conn.close()
-        return
+def list_stats(player_id=tenants.DEFAULT_PLAYER):
+    with tenants.connection(player_id) as conn:
+        return [row[0] for row in conn.execute(
+            f"SELECT stat_name FROM player_stats WHERE stat_name NOT IN {METER_STATS} ORDER BY stat_name")]
 
-    conn.close()
+def _valid_queue_entry(entry, stats):
+    if not isinstance(entry, dict) or entry.get("stat_name") not in stats:
+        return False
+    if entry.get("variant") not in (NORMAL, RECOVERY) or not entry.get("title"):
+        return False
+    try:
+        return 1 <= int(entry.get("day")) <= QUEUE_DAYS and int(entry.get("stat_reward_value", 1)) > 0
+    except (TypeError, ValueError):
+        return False
 
-    # 1. Analyze State
-    lowest_stat_name, lowest_stat_val = get_lowest_stat()
-    print(f"Weakness Detected: {lowest_stat_name} (Level {lowest_stat_val})")
+def refill_quest_queue(player_id=tenants.DEFAULT_PLAYER, days=QUEUE_DAYS):
+    """Plans `days` days of quests for every stat in one Gemini call.
+
+    Replaces the previous plan. Returns how many quests were queued
+    (0 when the Oracle is unavailable or answered garbage).
+    """
+    stats = list_stats(player_id)
+    if not stats:
+        return 0
+    start = tenants.player_today(player_id)  # Day 1, in the player's time zone like the calendar
+    schedule = fetch_events_by_day(player_id, start, days)
+    schedule_context = "\n".join(f"    Day {day} ({date}): {'; '.join(events) if events else 'Schedule is clear.'}"
+                                  for day, (date, events) in enumerate(schedule.items(), 1))
+    prompt = f"""
+    You are the Quest Master for the Shadow System.
+    Plan the next {days} days of Daily Quests.
+    Stats: {", ".join(stats)}.
+    Schedule:
+{schedule_context}
+    Fit each day's quests around that day's schedule.
+
+    For EVERY day (1..{days}) and EVERY stat, write two quests that train that stat:
+    - variant "{NORMAL}": a real challenge (Rank D to S).
+    - variant "{RECOVERY}": a Rank E 'Recovery Quest' (Sleep, Stretch, Walk). STRICTLY LOW INTENSITY.
+    - If Strength is low: 'Leg Day' or 'Sambo Drills'.
+    - If Intelligence is low: 'Deep Code' or 'Thesis Sprint'.
+    - If Vitality is low: 'Sleep' or 'Meditation'.
+    Vary the quests from day to day.
+
+    Output a JSON list, one object per quest:
+    [
+        {{
+            "day": 1,
+            "stat_name": "{stats[0]}",
+            "variant": "{NORMAL}",
+            "title": "Quest Title",
+            "description": "Short forceful description",
+            "difficulty": "Rank (E, D, C, B, A, S)",
+            "stat_reward_type": "{stats[0]}",
+            "stat_reward_value": 2,
+            "calendar_event_name": "[QUEST] Title"
+        }}
+    ]
+    """
+    print(f"--- QUEST MASTER: Planning {days} days x {len(stats)} stats ---")
+    try:
+        response, model = router.generate(
+            prompt,
+            config=types.GenerateContentConfig(response_mime_type="application/json"),
+            site="refill_quest_queue",
+            cache=False,  # A repeated plan would repeat the week
+        )
+        entries = response.parsed or json.loads(response.text)
+    except Exception as e:
+        print(f"Quest Queue Error: {e}")
+        return 0
+
+    stats = set(stats)
+    rows = [
+        (entry["day"], (start + datetime.timedelta(days=int(entry["day"]) - 1)).isoformat(), entry["stat_name"],
+         entry["variant"], entry["title"], entry.get("description", ""), entry.get("difficulty", "E"),
+         entry.get("stat_reward_type") or entry["stat_name"], int(entry.get("stat_reward_value", 1)),
+         entry.get("calendar_event_name") or f"[QUEST] {entry['title']}")
+        for entry in entries if _valid_queue_entry(entry, stats)
+    ] if isinstance(entries, list) else []
+    if not rows:
+        print("Quest Queue Error: no usable quests in the plan.")
+        return 0
+
+    batch_id = uuid.uuid4().hex
+    with tenants.connection(player_id) as conn:
+        conn.execute("DELETE FROM quest_queue")  # Drawn quests live on in the quests table
+        conn.executemany(
+            "INSERT INTO quest_queue (batch_id, day, plan_date, stat_name, variant, title, description, difficulty, "
+            "stat_reward_type, stat_reward_value, calendar_event_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(batch_id, *row) for row in rows])
+        conn.commit()
+    print(f"Quest Queue: {len(rows)} quests planned ({model}).")
+    return len(rows)
+
+def next_queued_quest(stat_name, variant=NORMAL, player_id=tenants.DEFAULT_PLAYER):
+    """Pops the next unused quest for (variant, stat) as a dict, or None.
+
+    Quests planned for past days are skipped: their schedule is gone.
+    """
+    with tenants.connection(player_id) as conn:
+        row = conn.execute(
+            "UPDATE quest_queue SET used_at = CURRENT_TIMESTAMP WHERE id = ("
+            "SELECT id FROM quest_queue WHERE variant = ? AND stat_name = ? AND used_at IS NULL AND plan_date >= ? "
+            "ORDER BY day, id LIMIT 1) "
+            "RETURNING title, description, difficulty, stat_reward_type, stat_reward_value, calendar_event_name",
+            (variant, stat_name, tenants.player_today(player_id).isoformat())).fetchone()
+        conn.commit()
+    return dict(zip(QUEST_FIELDS, row)) if row else None
+
+def queued_quest_counts(player_id=tenants.DEFAULT_PLAYER):
+    """{(variant, stat_name): unused quests still ahead} (for `main.py stats`)."""
+    with tenants.connection(player_id) as conn:
+        return {(row[0], row[1]): row[2] for row in conn.execute(
+            "SELECT variant, stat_name, COUNT(*) FROM quest_queue WHERE used_at IS NULL AND plan_date >= ? "
+            "GROUP BY variant, stat_name", (tenants.player_today(player_id).isoformat(),))}
+
+def save_daily_quest(content, player_id=tenants.DEFAULT_PLAYER):
+    daily_quest_path = tenants.player_file(player_id, DAILY_QUEST_FILE)
+    with open(daily_quest_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    print(f"Quest Artifact saved to {daily_quest_path}")
     
-    events = fetch_todays_events()
+def consult_oracle(stat_name, is_recovery=False, player_id=tenants.DEFAULT_PLAYER):
+    """Single-quest Gemini call with today's schedule (fallback when the queue can't be filled)."""
+    events = fetch_todays_events(player_id)
     schedule_context = "; ".join(events) if events else "Schedule is clear."
-
-    # Check for Recovery Mode
-    is_recovery = os.getenv("SHADOW_MODE") == "RECOVERY"
     if is_recovery:
-        print("🛡️ VITALITY SAFEGUARD ACTIVE. Nerfing Quest Difficulty.")
-        lowest_stat_name = "Vitality" # Force Vitality focus
         prompt_override = "Generate a Rank E 'Recovery Quest' (Sleep, Stretch, Walk). STRICTLY LOW INTENSITY."
     else:
         prompt_override = ""
 
-    # 2. Gemini Reasoning
     prompt = f"""
     You are the Quest Master for the Shadow System.
-    User's Weakness: {lowest_stat_name}.
+    User's Weakness: {stat_name}.
     Schedule: {schedule_context}.
     {prompt_override}
     
@@ -99,50 +196,30 @@ def generate_daily_quest():
         "title": "Quest Title",
         "description": "Short forceful description",
         "difficulty": "Rank (E, D, C, B, A, S)",
-        "stat_reward_type": "{lowest_stat_name}",
+        "stat_reward_type": "{stat_name}",
         "stat_reward_value": 2,
         "calendar_event_name": "[QUEST] Title"
     }}
     """
-    import time
-
-    retries = 3
-    response = None
-    
-    for attempt in range(retries):
-        try:
-            print(f"--- QUEST MASTER: Consulting the Oracle (Attempt {attempt+1}/{retries}) ---")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash", 
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            break
-        except Exception as e:
-            print(f"Gemini Error (Attempt {attempt+1}): {e}")
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                if attempt < retries - 1:
-                    print("Rate limit hit. Sleeping 10s...")
-                    time.sleep(10)
-                    continue
-            raise e
-            
-    if not response:
-        raise Exception("Failed to get response.")
-    
-    import json
+    print("--- QUEST MASTER: Consulting the Oracle ---")
     try:
+        response, model = router.generate(
+            prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json"
+            ),
+            site="generate_daily_quest"
+        )
         quest_data = response.parsed
         if not quest_data:
             print("DEBUG: response.parsed is None. Attempting manual parse.")
             print(f"DEBUG: Raw Text: {response.text}")
             quest_data = json.loads(response.text)
+        return quest_data
     except Exception as e:
         print(f"JSON Parse Error: {e}")
         # Fallback default quest if parsing fails completely
-        quest_data = {
+        return {
             "title": "System Reboot",
             "description": "The Oracle spoke in riddles. Perform manual diagnostics.",
             "difficulty": "E",
@@ -150,7 +227,62 @@ def generate_daily_quest():
             "stat_reward_value": 1,
             "calendar_event_name": "[QUEST] System Reboot"
         }
+
+def generate_daily_quest(player_id=tenants.DEFAULT_PLAYER, recovery=None):
+    """Generates a quest based on stats and schedule.
+
+    recovery=True applies the Recovery Protocol (Chronos passes it when the
+    Vitality Safeguard trips); None falls back to SHADOW_MODE=RECOVERY.
+    """
+    print(f"--- ⚔️ QUEST MASTER: INITIATING SEQUENCE ({player_id}) ⚔️ ---")
+    
+    conn = storage.connect(tenants.player_db_path(player_id))
+    cursor = conn.cursor()
     
+    # Check Dungeon State
+    cursor.execute("SELECT is_in_dungeon, job_class FROM player_profile WHERE id=1")
+    row = cursor.fetchone()
+    if row and row[0]: # is_in_dungeon is True
+        print("⚔️ DUNGEON DETECTED ⚔️")
+        print("Protocol Locked: 'The Architect's Descent'")
+        quest_text = """# ⛩️ DAILY QUEST: THE ARCHITECT'S DESCENT
+**Status**: LOCKED (Dungeon Active)
+**Objective**: Survival.
+1. Complete a microservice module.
+2. Complete 100 Sambo Throws.
+**Penalty for Failure**: Stat Reset.
+"""
+        save_daily_quest(quest_text, player_id)
+        conn.close()
+        return
+
+    conn.close()
+
+    # 1. Analyze State
+    lowest_stat_name, lowest_stat_val = get_lowest_stat(player_id)
+    print(f"Weakness Detected: {lowest_stat_name} (Level {lowest_stat_val})")
+    
+    # Check for Recovery Mode
+    is_recovery = recovery if recovery is not None else os.getenv("SHADOW_MODE") == "RECOVERY"
+    weakest_stat_name = lowest_stat_name
+    if is_recovery:
+        print("🛡️ VITALITY SAFEGUARD ACTIVE. Nerfing Quest Difficulty.")
+        lowest_stat_name = "Vitality" # Force Vitality focus
+
+    # 2. Quest Queue (one Gemini call plans the week)
+    variant = RECOVERY if is_recovery else NORMAL
+    quest_data = next_queued_quest(weakest_stat_name, variant, player_id)
+    if quest_data is None and refill_quest_queue(player_id):
+        quest_data = next_queued_quest(weakest_stat_name, variant, player_id)
+    if quest_data is None:
+        quest_data = consult_oracle(lowest_stat_name, is_recovery, player_id)
+        focus_stat = lowest_stat_name
+    else:
+        print(f"Quest drawn from the queue ({variant}).")
+        focus_stat = weakest_stat_name  # The queue trains the weakest stat in both variants
+    if is_recovery:
+        focus_stat += " (Recovery Protocol)"
+
     # 3. Execution
     print(f"New Quest: {quest_data['title']} ({quest_data['difficulty']})")
     
@@ -160,7 +292,8 @@ def generate_daily_quest():
         quest_data['description'], 
         quest_data['difficulty'], 
         quest_data['stat_reward_type'], 
-        quest_data['stat_reward_value']
+        quest_data['stat_reward_value'],
+        player_id
     )
     
     print(f"Quest added to Quest Log.")
@@ -173,9 +306,11 @@ def generate_daily_quest():
 **Reward**: +{quest_data['stat_reward_value']} {quest_data['stat_reward_type']}
 
 ---
-*System generated based on weakness: {lowest_stat_name}*
+*System generated based on weakness: {focus_stat}*
 """
-    save_daily_quest(artifact_content)
+    save_daily_quest(artifact_content, player_id)
 
 if __name__ == "__main__":
-    generate_daily_quest()
+    import sys
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    generate_daily_quest(args[0] if args else tenants.DEFAULT_PLAYER, recovery=True if "--recovery" in sys.argv else None)
@@ -0,0 +1,215 @@
+import datetime
+import glob
+import json
+import os
+import re
+import sqlite3
+import zlib
+from collections import defaultdict
+
+from agents import storage, tenants
+
+# audit_logs retention
+# compact() keeps the last RETENTION_DAYS of audit_logs in the player DB.
+# Older rows are rolled into daily_audit_summary (entries + net delta per
+# stat per day) and moved to monthly archive files next to the DB
+# (archive/audit_logs_YYYY-MM.db). Each archived day is one zlib-compressed
+# JSON block: a day's log lines are near-duplicates of each other, so they
+# compress far better together than row by row. attach_archives() ATTACHes
+# the partitions and exposes everything, live and archived, as rows again
+# through one TEMP VIEW (json_each expands the blocks); search() and
+# `python -m agents.retention --search` read through it.
+
+RETENTION_DAYS = 90
+ARCHIVE_DIR = 'archive'
+ARCHIVE_VIEW = 'audit_logs_all'
+
+# Preset dictionary: the phrases audit lines are made of (helps days with few rows).
+ZDICT = (b"Spent 500 XP to solve: Skill Used: ARISE XP Change: +"
+         b"Stat Change: Fatigue Sense Vitality Agility Intelligence Strength ")
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_log_days (
+    log_date DATE PRIMARY KEY,
+    row_count INTEGER NOT NULL,
+    payload BLOB NOT NULL -- pack(JSON [[id, content, audit_result], ...])
+);
+"""
+
+_STAT_CHANGE_RE = re.compile(r"^Stat Change: (\w+) ([+-]\d+)$")
+_XP_CHANGE_RE = re.compile(r"^XP Change: ([+-]?\d+)$")
+_XP_SPENT_RE = re.compile(r"^Spent (\d+) XP\b")  # audit_result of "Skill Used: ..." (arise)
+
+def pack(text):
+    if text is None:
+        return None
+    compressor = zlib.compressobj(9, zdict=ZDICT)
+    return compressor.compress(text.encode("utf-8")) + compressor.flush()
+
+def unpack(blob):
+    if blob is None:
+        return None
+    decompressor = zlib.decompressobj(zdict=ZDICT)
+    return (decompressor.decompress(blob) + decompressor.flush()).decode("utf-8")
+
+def classify(content, audit_result=None):
+    """(stat_name, delta) for one audit_logs line; '*' when it carries no delta."""
+    match = _STAT_CHANGE_RE.match(content or "")
+    if match:
+        return match.group(1), int(match.group(2))
+    match = _XP_CHANGE_RE.match(content or "")
+    if match:
+        return 'XP', int(match.group(1))
+    match = _XP_SPENT_RE.match(audit_result or "")
+    if match and (content or "").startswith("Skill Used:"):
+        return 'XP', -int(match.group(1))
+    return '*', 0
+
+def archive_dir(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_DIR)
+
+def archive_path(db_path, month):
+    """Partition file for `month` ('YYYY-MM')."""
+    return os.path.join(archive_dir(db_path), f"audit_logs_{month}.db")
+
+def _archive_partition(path, rows):
+    days = defaultdict(dict)
+    for row in rows:
+        days[row["log_date"]][row["id"]] = [row["id"], row["content"], row["audit_result"]]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = storage.connect(path)
+    try:
+        conn.executescript(ARCHIVE_SCHEMA)
+        for log_date, by_id in days.items():
+            # Merge with an existing block: a run interrupted after this commit
+            # re-archives the same ids, which must not duplicate them.
+            existing = conn.execute("SELECT payload FROM audit_log_days WHERE log_date = ?", (log_date,)).fetchone()
+            if existing:
+                for entry in json.loads(unpack(existing[0])):
+                    by_id.setdefault(entry[0], entry)
+            entries = [by_id[key] for key in sorted(by_id)]
+            conn.execute("INSERT OR REPLACE INTO audit_log_days (log_date, row_count, payload) VALUES (?, ?, ?)",
+                         (log_date, len(entries), pack(json.dumps(entries, separators=(",", ":")))))
+        conn.commit()
+    finally:
+        conn.close()
+
+def compact(player_id=None, retention_days=RETENTION_DAYS, today=None):
+    """Rolls up and archives audit_logs rows older than `retention_days`.
+
+    Works one month at a time. The archive partition is written and committed
+    first; the summary upsert and the delete then commit together in the
+    player DB, so a crash in between leaves rows live (and re-archivable),
+    never lost or double counted. Returns {month: rows archived}.
+    """
+    db_path = tenants.player_db_path(player_id)
+    cutoff = ((today or datetime.date.today()) - datetime.timedelta(days=retention_days)).isoformat()
+    archived = {}
+    with storage.connection(db_path) as conn:
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(log_date, 1, 7) FROM audit_logs WHERE log_date < ? ORDER BY 1", (cutoff,))]
+        for month in months:
+            rows = conn.execute(
+                "SELECT id, log_date, content, audit_result FROM audit_logs "
+                "WHERE log_date >= ? AND log_date < ? AND log_date < ? ORDER BY id",
+                (f"{month}-01", f"{month}-32", cutoff)).fetchall()
+            if not rows:
+                continue
+            _archive_partition(archive_path(db_path, month), rows)
+
+            totals = defaultdict(lambda: [0, 0])
+            for row in rows:
+                stat_name, delta = classify(row["content"], row["audit_result"])
+                total = totals[(row["log_date"], stat_name)]
+                total[0] += 1
+                total[1] += delta
+            conn.executemany(
+                "INSERT INTO daily_audit_summary (log_date, stat_name, entries, net_delta) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (log_date, stat_name) DO UPDATE SET "
+                "entries = entries + excluded.entries, net_delta = net_delta + excluded.net_delta",
+                ((log_date, stat_name, entries, delta) for (log_date, stat_name), (entries, delta) in totals.items()))
+            conn.execute("DELETE FROM audit_logs WHERE log_date >= ? AND log_date < ? AND log_date < ?",
+                         (f"{month}-01", f"{month}-32", cutoff))
+            conn.commit()
+            archived[month] = len(rows)
+    if archived:
+        storage.bump_data_version(db_path)
+    return archived
+
+def vacuum(player_id=None):
+    """Returns the space freed by compaction to the filesystem (rewrites the DB)."""
+    with storage.connection(tenants.player_db_path(player_id)) as conn:
+        conn.execute("VACUUM")
+
+def attach_archives(conn, db_path, since=None, until=None):
+    """ATTACHes the archive partitions for months in [since, until] ('YYYY-MM').
+
+    Creates TEMP VIEW audit_logs_all (live + archived rows, text decompressed
+    by the audit_unpack() SQL function registered here) and returns its name.
+    Partitions beyond the connection's ATTACH limit raise ValueError; narrow
+    the range instead. Use a dedicated connection, not a pooled one: the
+    attachments stay for the connection's lifetime.
+    """
+    conn.create_function("audit_unpack", 1, unpack, deterministic=True)
+    paths = []
+    for path in sorted(glob.glob(os.path.join(archive_dir(db_path), "audit_logs_*.db"))):
+        month = os.path.basename(path)[len("audit_logs_"):-len(".db")]
+        if (since is None or month >= since) and (until is None or month <= until):
+            paths.append((month, path))
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")} - {"main", "temp"}
+    new = [month for month, _ in paths if "archive_" + month.replace("-", "_") not in attached]
+    if len(attached) + len(new) > limit:
+        raise ValueError(f"{len(paths)} archive partitions exceed the ATTACH limit ({limit}); narrow the range.")
+
+    selects = ["SELECT id, log_date, content, audit_result FROM main.audit_logs"]
+    for month, path in paths:
+        schema = "archive_" + month.replace("-", "_")
+        if schema not in attached:
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        selects.append(f"SELECT json_extract(j.value, '$[0]'), d.log_date, json_extract(j.value, '$[1]'), "
+                       f"json_extract(j.value, '$[2]') "
+                       f"FROM {schema}.audit_log_days d, json_each(audit_unpack(d.payload)) j")
+    conn.execute(f"DROP VIEW IF EXISTS temp.{ARCHIVE_VIEW}")
+    conn.execute(f"CREATE TEMP VIEW {ARCHIVE_VIEW} (id, log_date, content, audit_result) AS "
+                 + " UNION ALL ".join(selects))
+    return ARCHIVE_VIEW
+
+def search(player_id=None, text=None, since=None, until=None, limit=50):
+    """Audit log rows, live and archived (months in [since, until]), newest first.
+
+    `text` keeps rows whose content or audit_result contains it.
+    """
+    db_path = tenants.player_db_path(player_id)
+    conn = storage.open_connection(db_path)  # Dedicated: the ATTACHes go away with it
+    try:
+        view = attach_archives(conn, db_path, since, until)
+        sql = f"SELECT id, log_date, content, audit_result FROM {view}"
+        params = []
+        if text:
+            sql += " WHERE content LIKE ? OR audit_result LIKE ?"
+            params += [f"%{text}%", f"%{text}%"]
+        return conn.execute(sql + " ORDER BY log_date DESC, id DESC LIMIT ?", params + [limit]).fetchall()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="audit_logs retention: compact old rows, search the archives")
+    parser.add_argument("player", nargs="?", default=tenants.DEFAULT_PLAYER)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM after compacting")
+    parser.add_argument("--search", metavar="TEXT", nargs="?", const="",
+                        help="List live + archived audit lines (containing TEXT) instead of compacting")
+    parser.add_argument("--since", metavar="YYYY-MM", help="With --search: first archive month")
+    parser.add_argument("--until", metavar="YYYY-MM", help="With --search: last archive month")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    if args.search is not None:
+        for row in search(args.player, args.search, args.since, args.until, args.limit):
+            print(f"{row['log_date']}  #{row['id']:<6} {row['content']} | {row['audit_result']}")
+    else:
+        result = compact(args.player)
+        print(f"Archived: {result}" if result else "Nothing to compact.")
+        if result and args.vacuum:
+            vacuum(args.player)
+            print("Vacuumed.")
@@ -0,0 +1,275 @@
+import copy
+import datetime
+import json
+import os
+import re
+
+from agents import ledger, storage
+
+# Audit rules engine
+# Scores a nightly audit locally: stat deltas, XP (quest rank, proof bonus),
+# level-ups, fatigue / rest day and job changes come from the rule tables
+# below, applied to the structured audit log the Auditor collects
+# ("COMPLETED: ...", "FAILED: ...", ...). Same log + same state = same
+# outcome, in microseconds and without tokens; Gemini only writes the verdict
+# prose (sovereign.nightly_audit, mode "local"), or nothing at all ("fast").
+# db/rules.json, if present, overrides any top-level table.
+
+RULES_PATH = os.path.join(storage.PROJECT_ROOT, 'db', 'rules.json')
+
+DEFAULT_RULES = {
+    # Keyword match -> stat deltas. Every matching category applies. Keywords
+    # match whole words ("ran" is not "random"); a trailing * matches any
+    # word starting with the stem ("meditat*": meditate, meditation, ...).
+    "activities": [
+        {"keywords": ["code", "coded", "coding", "program*", "thesis", "study", "studied", "studies", "studying",
+                      "read", "reading", "learn*", "docs", "pushed", "commit", "commits", "committed",
+                      "pr activity", "deep work"],
+         "stats": {"Intelligence": 1}},
+        {"keywords": ["sambo", "workout*", "gym", "lift", "lifted", "lifting", "run", "runs", "running", "ran",
+                      "pushup*", "push-up*", "situp*", "sit-up*", "squat*", "train", "trained", "training",
+                      "drill*", "leg day"],
+         "stats": {"Strength": 1, "Agility": 1}},
+        {"keywords": ["meditat*", "stretch*", "walk", "walks", "walked", "walking", "nap", "naps", "napped",
+                      "rest day", "recover*"],
+         "stats": {"Vitality": 1, "Fatigue": -1}},
+        {"keywords": ["skipped sleep", "no sleep", "all-nighter", "all nighter"],
+         "stats": {"Fatigue": 1}},
+    ],
+    # "Slept N hours"
+    "sleep": {"short_below": 6, "short": {"Fatigue": 1}, "rested_from": 7, "rested": {"Vitality": 1, "Fatigue": -1}},
+    # Per entry kind: base XP, stat multiplier, quest completion credit (None: not a quest).
+    "outcomes": {
+        "COMPLETED": {"xp": 200, "stats": 1, "credit": 1.0},
+        "PARTIAL": {"xp": 100, "stats": 1, "credit": 0.5},
+        "FAILED": {"xp": 0, "stats": 0, "credit": 0.0},
+        "EXTRA": {"xp": 100, "stats": 1, "credit": None},
+        "GITHUB": {"xp": 100, "stats": 1, "credit": None},
+    },
+    # XP for the active quest by rank (replaces the base XP when the entry names it).
+    "quest_rank_xp": {"E": 100, "D": 150, "C": 200, "B": 300, "A": 400, "S": 500},
+    "proof_multiplier": 2,  # Vision proof doubles quest XP
+    "xp_per_level": 1000,  # Level N -> N+1 at N * xp_per_level total XP (as grant_xp)
+    "fatigue": {
+        "rest_above": 5,  # Fatigue > 5 forces a Rest Quest
+        "streak_days": 3,  # Fatigue rising this many days in a row forces one too
+        "rest_quest": {"title": "Rest Day", "description": "Mandatory recovery. Sleep 8 hours. No training.",
+                       "difficulty": "E", "stat_reward_type": "Vitality", "stat_reward_value": 2, "deadline_days": 1},
+    },
+    # In order; once a rule changes the class, later rules see the new one.
+    "job_changes": [
+        {"level": 10, "from": "Shadow Monarch Candidate", "requires": "sambo", "proof": True,
+         "to": "Shadow Monarch"},
+        {"level": 10, "from": "Shadow Monarch Candidate", "quest": {
+            "title": "JOB CHANGE: Survive the Penalty", "description": "Complete 100 Pushups, 100 Situps, 10km Run.",
+            "difficulty": "S", "stat_reward_type": "Strength", "stat_reward_value": 10, "deadline_days": 365}},
+    ],
+    # Completion ratio of the day's quests -> rank.
+    "ranks": [["S", 1.0], ["A", 0.9], ["B", 0.75], ["C", 0.5], ["D", 0.25], ["E", 0.0]],
+}
+
+ENTRY_PREFIXES = (
+    ("COMPLETED:", "COMPLETED"),
+    ("FAILED:", "FAILED"),
+    ("PARTIAL:", "PARTIAL"),
+    ("EXTRA ACTIVITY:", "EXTRA"),
+    ("GITHUB AUTO-VERIFICATION:", "GITHUB"),
+    ("PROOF SUBMITTED:", "PROOF"),
+)
+_SPLIT_RE = re.compile(r";\s+(?=(?:" + "|".join(re.escape(prefix) for prefix, _ in ENTRY_PREFIXES) + r"))")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_SKIPPED_RE = re.compile(r"^\s*(skipped|missed|failed|didn't|did not)\b", re.IGNORECASE)
+_SLEPT_RE = re.compile(r"\bslept\s+(\d+(?:\.\d+)?)\s*(?:h|hours?)\b", re.IGNORECASE)
+
+def keyword_pattern(keywords):
+    """One regex for a keyword list: whole words, `stem*` for any word starting with stem."""
+    alternatives = [re.escape(k[:-1]) + r"\w*" if k.endswith("*") else re.escape(k) for k in keywords]
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+class RuleSet:
+    """Rule tables with their keyword patterns compiled once."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.activities = [(keyword_pattern(rule["keywords"]), rule["stats"]) for rule in tables["activities"]]
+
+    def __getitem__(self, key):
+        return self.tables[key]
+
+def load_rules(path=RULES_PATH):
+    tables = copy.deepcopy(DEFAULT_RULES)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            tables.update(json.load(f))
+    return RuleSet(tables)
+
+_rules = None
+
+def default_rules():
+    global _rules
+    if _rules is None:
+        _rules = load_rules()
+    return _rules
+
+def parse_log(daily_logs):
+    """[(kind, text)] from the Auditor's log lines (a list, or the '; '-joined string).
+
+    Free text (e.g. the CLI test log) is split into sentences; "Skipped ..."
+    sentences count as FAILED, the rest as EXTRA.
+    """
+    lines = _SPLIT_RE.split(daily_logs) if isinstance(daily_logs, str) else list(daily_logs)
+    entries = []
+    for line in lines:
+        line = line.strip()
+        for prefix, kind in ENTRY_PREFIXES:
+            if line.startswith(prefix):
+                entries.append((kind, line[len(prefix):].strip()))
+                break
+        else:
+            for sentence in _SENTENCE_RE.split(line):
+                if sentence.strip():
+                    entries.append(("FAILED" if _SKIPPED_RE.match(sentence) else "EXTRA", sentence.strip()))
+    return entries
+
+def load_state(conn, rules=None, today=None):
+    """What the rules read: stats, level, XP, job class, active quest, fatigue streak."""
+    rules = rules or default_rules()
+    profile = conn.execute("SELECT level, xp, job_class FROM player_profile WHERE id=1").fetchone()
+    stats = dict(conn.execute("SELECT stat_name, value FROM player_stats").fetchall())
+    quest = conn.execute(
+        "SELECT title, difficulty FROM quests WHERE status='ACTIVE' ORDER BY id DESC LIMIT 1").fetchone()
+    # Days in a row (before today) on which Fatigue went up
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()  # stat_events times are UTC
+    streak_days = rules["fatigue"]["streak_days"]
+    daily = {}
+    for row in ledger.history(conn, "Fatigue", since=today - datetime.timedelta(days=streak_days), limit=500):
+        day = row[6][:10]  # created_at
+        daily[day] = daily.get(day, 0) + row[2]  # delta
+    streak = 0
+    for offset in range(1, streak_days + 1):
+        if daily.get((today - datetime.timedelta(days=offset)).isoformat(), 0) <= 0:
+            break
+        streak += 1
+    return {
+        "level": profile[0] if profile else 1,
+        "xp": profile[1] if profile else 0,
+        "job_class": profile[2] if profile else None,
+        "stats": stats,
+        "active_quest": (quest[0], quest[1]) if quest else None,
+        "fatigue_streak": streak,
+    }
+
+class Outcome:
+    def __init__(self):
+        self.stat_changes = []  # [(stat, delta, reason)], one per stat
+        self.xp = 0
+        self.xp_reasons = []
+        self.level_before = self.level_after = 1
+        self.job_class_before = self.job_class_after = None
+        self.quests = []  # dicts for the quests table
+        self.rest_day = False
+        self.completion = None  # Share of today's quests cleared (None: no quests)
+        self.rank = "E"
+
+    def summary(self):
+        """Plain-text lines for the verdict prompt / fast-mode verdict."""
+        lines = [f"Rank: {self.rank}" + (f" ({self.completion:.0%} of quests cleared)" if self.completion is not None else "")]
+        lines += [f"{stat} {delta:+d} ({reason})" for stat, delta, reason in self.stat_changes]
+        if self.xp:
+            lines.append(f"XP +{self.xp} ({'; '.join(self.xp_reasons)})")
+        if self.level_after != self.level_before:
+            lines.append(f"LEVEL UP: {self.level_before} -> {self.level_after}")
+        if self.job_class_after != self.job_class_before:
+            lines.append(f"JOB CHANGE: {self.job_class_before} -> {self.job_class_after}")
+        if self.rest_day:
+            lines.append("REST DAY FORCED (fatigue)")
+        lines += [f"New quest: {quest['title']} (Rank {quest['difficulty']})" for quest in self.quests]
+        return lines
+
+def score(entries, state, rules=None):
+    """The audit's Outcome for `entries` (parse_log) against `state` (load_state)."""
+    rules = rules or default_rules()
+    outcome = Outcome()
+    has_proof = any(kind == "PROOF" for kind, _ in entries)
+    deltas, reasons = {}, {}
+    credits = []
+
+    def add(stat, delta, reason):
+        deltas[stat] = deltas.get(stat, 0) + delta
+        reasons.setdefault(stat, []).append(reason)
+
+    active = state.get("active_quest")
+    for kind, text in entries:
+        if kind == "PROOF":
+            continue
+        table = rules["outcomes"][kind]
+        if table["credit"] is not None:
+            credits.append(table["credit"])
+        label = text[:60]
+        matched = False
+        for pattern, stats in rules.activities:
+            if not pattern.search(text):
+                continue
+            matched = True
+            if table["stats"]:
+                for stat, delta in stats.items():
+                    add(stat, delta * table["stats"], label)
+        slept = _SLEPT_RE.search(text)
+        if slept:
+            hours = float(slept.group(1))
+            sleep = rules["sleep"]
+            if hours < sleep["short_below"]:
+                for stat, delta in sleep["short"].items():
+                    add(stat, delta, f"slept {hours:g}h")
+            elif hours >= sleep["rested_from"]:
+                for stat, delta in sleep["rested"].items():
+                    add(stat, delta, f"slept {hours:g}h")
+        xp = table["xp"] if matched or table["credit"] is not None else 0  # Unrecognised extras earn nothing
+        if xp and active and active[0] and active[0].lower() in text.lower():
+            xp = rules["quest_rank_xp"].get(active[1], xp) * table["credit"] if table["credit"] else xp
+        if xp and has_proof and table["credit"]:
+            xp *= rules["proof_multiplier"]
+        if xp:
+            outcome.xp += int(xp)
+            outcome.xp_reasons.append(f"{kind.lower()}: {label}")
+
+    outcome.stat_changes = [(stat, delta, "; ".join(reasons[stat])) for stat, delta in deltas.items() if delta]
+
+    # Levels: every threshold crossed counts
+    level, xp_total = state["level"], state["xp"] + outcome.xp
+    outcome.level_before = level
+    while xp_total >= level * rules["xp_per_level"]:
+        level += 1
+    outcome.level_after = level
+
+    # Fatigue
+    fatigue_rules = rules["fatigue"]
+    fatigue_delta = deltas.get("Fatigue", 0)
+    fatigue_after = state["stats"].get("Fatigue", 0) + fatigue_delta
+    if fatigue_after > fatigue_rules["rest_above"] or (
+            fatigue_delta > 0 and state.get("fatigue_streak", 0) + 1 >= fatigue_rules["streak_days"]):
+        outcome.rest_day = True
+        outcome.quests.append(dict(fatigue_rules["rest_quest"]))
+
+    # Job changes
+    job_class = outcome.job_class_before = state.get("job_class")
+    for change in rules["job_changes"]:
+        if level < change["level"] or job_class != change["from"]:
+            continue
+        if change.get("proof") and not has_proof:
+            continue
+        if change.get("requires") and not any(
+                change["requires"] in text.lower() for kind, text in entries if kind in ("COMPLETED", "PARTIAL")):
+            continue
+        if "quest" in change and outcome.level_before < change["level"]:
+            outcome.quests.append(dict(change["quest"]))
+        if "to" in change:
+            job_class = change["to"]
+    outcome.job_class_after = job_class
+
+    if credits:
+        outcome.completion = sum(credits) / len(credits)
+        outcome.rank = next(rank for rank, minimum in rules["ranks"] if outcome.completion >= minimum)
+    else:
+        outcome.rank = "C" if outcome.xp else "E"
+    return outcome
@@ -0,0 +1,172 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from agents import storage
+
+# Server-side onboarding sessions.
+# Hot sessions live in a bounded in-memory LRU together with their prebuilt
+# Content objects, so a turn only converts the new message. Every turn is
+# appended to SQLite (one row per message) so sessions survive restarts.
+# A session belongs to the player who started it; expired ones are purged
+# from SQLite at most once per EVICT_INTERVAL, when a new session starts.
+
+SESSION_TTL = 24 * 3600   # seconds since last turn
+SESSION_CAPACITY = 1024   # sessions kept in memory
+EVICT_INTERVAL = 3600     # seconds between purges of expired sessions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS onboarding_sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    player_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_onboarding_sessions_updated ON onboarding_sessions(updated_at);
+CREATE TABLE IF NOT EXISTS onboarding_messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+class OnboardingSession:
+    """One interview: raw history dicts plus their converted Content objects."""
+
+    __slots__ = ("session_id", "player_id", "history", "contents", "updated_at")
+
+    def __init__(self, session_id, player_id, history, contents, updated_at):
+        self.session_id = session_id
+        self.player_id = player_id
+        self.history = history
+        self.contents = contents
+        self.updated_at = updated_at
+
+class SessionStore:
+    """LRU + TTL session cache, write-through to SQLite."""
+
+    def __init__(self, to_content, db_path=storage.DB_PATH, capacity=SESSION_CAPACITY, ttl=SESSION_TTL):
+        self.to_content = to_content  # (role, text) -> Content
+        self.db_path = db_path
+        self.capacity = capacity
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._next_evict = 0.0
+
+    def _ensure_schema(self, conn):
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+
+    def _remember(self, session):
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.capacity:
+                self._sessions.popitem(last=False)
+
+    def _expired(self, updated_at, now):
+        return now - updated_at > self.ttl
+
+    def create(self, player_id, history=None):
+        """Starts a session for `player_id`, optionally seeded with client-side history (e.g. the greeting)."""
+        history = [{"role": "user" if m["role"] == "user" else "model", "content": m["content"]} for m in (history or [])]
+        now = time.time()
+        if now >= self._next_evict:
+            self._next_evict = now + EVICT_INTERVAL
+            self.evict_expired()
+        session = OnboardingSession(
+            uuid.uuid4().hex,
+            player_id,
+            history,
+            [self.to_content(m["role"], m["content"]) for m in history],
+            now
+        )
+        with storage.connection(self.db_path) as conn:
+            self._ensure_schema(conn)
+            conn.execute("INSERT INTO onboarding_sessions (session_id, created_at, updated_at, player_id) "
+                         "VALUES (?, ?, ?, ?)", (session.session_id, now, now, player_id))
+            conn.executemany("INSERT INTO onboarding_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                             [(session.session_id, i, m["role"], m["content"]) for i, m in enumerate(history)])
+            conn.commit()
+        self._remember(session)
+        return session
+
+    def get(self, session_id):
+        """Returns the live session or None if unknown/expired."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if self._expired(session.updated_at, now):
+                    del self._sessions[session_id]
+                    return None
+                self._sessions.move_to_end(session_id)
+                return session
+
+        # Cold path: restore from SQLite (after a restart or LRU eviction)
+        with storage.connection(self.db_path) as conn:
+            self._ensure_schema(conn)
+            row = conn.execute("SELECT updated_at, player_id FROM onboarding_sessions WHERE session_id = ?",
+                               (session_id,)).fetchone()
+            if not row or self._expired(row["updated_at"], now):
+                return None
+            rows = conn.execute("SELECT role, content FROM onboarding_messages WHERE session_id = ? ORDER BY seq",
+                                (session_id,)).fetchall()
+
+        history = [{"role": r["role"], "content": r["content"]} for r in rows]
+        session = OnboardingSession(
+            session_id,
+            row["player_id"],
+            history,
+            [self.to_content(m["role"], m["content"]) for m in history],
+            row["updated_at"]
+        )
+        self._remember(session)
+        return session
+
+    def append(self, session, user_text, model_text):
+        """Records one completed turn. Cost is constant in the conversation length.
+
+        seq is assigned by SQLite inside the write, so concurrent turns of one
+        session (another request, another worker) never collide.
+        """
+        now = time.time()
+        turn = [("user", user_text), ("model", model_text)]
+
+        with storage.connection(self.db_path) as conn:
+            self._ensure_schema(conn)
+            conn.executemany(
+                "INSERT INTO onboarding_messages (session_id, seq, role, content) "
+                "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ? FROM onboarding_messages WHERE session_id = ?",
+                [(session.session_id, role, text, session.session_id) for role, text in turn])
+            conn.execute("UPDATE onboarding_sessions SET updated_at = ? WHERE session_id = ?", (now, session.session_id))
+            conn.commit()
+
+        contents = [self.to_content(role, text) for role, text in turn]
+        with self._lock:
+            for (role, text), content in zip(turn, contents):
+                session.history.append({"role": role, "content": text})
+                session.contents.append(content)
+            session.updated_at = now
+        self._remember(session)
+
+    def evict_expired(self):
+        """Drops expired sessions from memory and SQLite. Returns the number purged from SQLite."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for session_id in [sid for sid, s in self._sessions.items() if s.updated_at < cutoff]:
+                del self._sessions[session_id]
+
+        with storage.connection(self.db_path) as conn:
+            self._ensure_schema(conn)
+            conn.execute("DELETE FROM onboarding_messages WHERE session_id IN "
+                         "(SELECT session_id FROM onboarding_sessions WHERE updated_at < ?)", (cutoff,))
+            purged = conn.execute("DELETE FROM onboarding_sessions WHERE updated_at < ?", (cutoff,)).rowcount
+            conn.commit()
+        return purged
@@ -0,0 +1,265 @@
+import hashlib
+import html
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from agents import skills as skill_rules, storage, tenants
+from agents.hud import write_atomic
+
+# Skill tree renderer
+# Builds the evolution tree from the player's `skills` table: one column per
+# stat a skill's unlock_condition reads first (agents/skills.py), ordered by
+# threshold, unlocked ones lit. A single layout (boxes, connectors, labels)
+# is drawn by two small backends: SVG text, and a PNG rasterizer with a
+# built-in 5x7 pixel font (so no matplotlib / Pillow).
+# Renders are cached by a hash of the skill set and its unlocked flags, so
+# the tree is only redrawn after a skill unlocks.
+
+TREE_FILE = 'SKILL_TREE.png'  # Per player; the default player's lives in the project root
+DEFAULT_TREE_PATH = os.path.join(storage.PROJECT_ROOT, TREE_FILE)
+TITLE = "SHADOW SYSTEM: EVOLUTION TREE"
+OTHER_COLUMN = "Other"  # Skills whose condition names no stat
+RENDER_CACHE_SIZE = 64
+LAYOUT_VERSION = 1  # Bump when the drawing changes, to invalidate cached renders
+
+# Palette (matches the HUD)
+BACKGROUND = "#0d0d0d"
+ACCENT = "#4285F4"
+LOCKED = "#444444"
+TEXT = "#ffffff"
+MUTED = "#888888"
+
+MARGIN = 30
+TITLE_H = 50
+COLUMN_W = 200
+BOX_W = 176
+HEADER_H = 36
+BOX_H = 46
+ROW_GAP = 26
+
+_renders = OrderedDict()  # (digest, fmt) -> bytes
+_renders_lock = threading.Lock()
+
+def tree_path(player_id=tenants.DEFAULT_PLAYER):
+    if player_id == tenants.DEFAULT_PLAYER:
+        return DEFAULT_TREE_PATH
+    return tenants.player_file(player_id, TREE_FILE)
+
+def load_skills(player_id=tenants.DEFAULT_PLAYER):
+    """[(name, description, unlock_condition, is_unlocked)] from the player's skills table."""
+    with tenants.connection(player_id) as conn:
+        return [(row[0], row[1] or "", row[2] or "", bool(row[3])) for row in conn.execute(
+            "SELECT name, description, unlock_condition, is_unlocked FROM skills ORDER BY id")]
+
+def fingerprint(skills):
+    """Hash of the skill set and which skills are unlocked (the cache key)."""
+    return hashlib.sha1(json.dumps([LAYOUT_VERSION, skills], separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def _columns(skills):
+    columns = {}
+    for name, description, condition, unlocked in skills:
+        compiled = skill_rules.compile_condition(condition)
+        stat, _, threshold = compiled.clauses[0] if compiled else (OTHER_COLUMN, None, 0)
+        columns.setdefault(stat, []).append((threshold, name, description, condition, unlocked))
+    order = sorted(stat for stat in columns if stat != OTHER_COLUMN)
+    if OTHER_COLUMN in columns:
+        order.append(OTHER_COLUMN)
+    return [(stat, sorted(columns[stat])) for stat in order]
+
+def layout(skills):
+    """(width, height, shapes). Shapes: ('rect', x, y, w, h, fill, stroke),
+    ('line', x1, y1, x2, y2, color) dashed, ('text', cx, y, text, color, scale, tooltip, max_width)."""
+    columns = _columns(skills)
+    rows = max((len(entries) for _, entries in columns), default=0)
+    width = max(2 * MARGIN + COLUMN_W * max(len(columns), 1), 2 * MARGIN + len(TITLE) * 12)
+    height = MARGIN + TITLE_H + HEADER_H + rows * (BOX_H + ROW_GAP) + MARGIN
+    shapes = [("text", width // 2, MARGIN, TITLE, ACCENT, 2, None, width)]
+    left = (width - COLUMN_W * len(columns)) // 2
+    for i, (stat, entries) in enumerate(columns):
+        cx = left + i * COLUMN_W + COLUMN_W // 2
+        top = MARGIN + TITLE_H
+        shapes.append(("rect", cx - BOX_W // 2, top, BOX_W, HEADER_H, BACKGROUND, ACCENT))
+        shapes.append(("text", cx, top + (HEADER_H - 14) // 2, stat.upper(), ACCENT, 2, None, BOX_W - 8))
+        y = top + HEADER_H
+        for threshold, name, description, condition, unlocked in entries:
+            box_y = y + ROW_GAP
+            shapes.append(("line", cx, y, cx, box_y, ACCENT if unlocked else LOCKED))
+            shapes.append(("rect", cx - BOX_W // 2, box_y, BOX_W, BOX_H, ACCENT if unlocked else BACKGROUND,
+                           ACCENT if unlocked else LOCKED))
+            shapes.append(("text", cx, box_y + 8, name.upper(), TEXT if unlocked else MUTED, 2, description,
+                           BOX_W - 8))
+            shapes.append(("text", cx, box_y + 30, condition.upper() or "-", TEXT if unlocked else MUTED, 1, None,
+                           BOX_W - 8))
+            y = box_y + BOX_H
+    return width, height, shapes
+
+# SVG
+
+def render_svg(skills, digest=None):
+    width, height, shapes = layout(skills)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+        f'<!-- skill-tree:{digest or fingerprint(skills)} -->',
+        f'<rect width="{width}" height="{height}" fill="{BACKGROUND}"/>',
+        '<g font-family="\'Courier New\', monospace" text-anchor="middle">',
+    ]
+    for shape in shapes:
+        kind = shape[0]
+        if kind == "rect":
+            _, x, y, w, h, fill, stroke = shape
+            parts.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="6" fill="{fill}" stroke="{stroke}" stroke-width="2"/>')
+        elif kind == "line":
+            _, x1, y1, x2, y2, color = shape
+            parts.append(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="{color}" stroke-width="2" stroke-dasharray="6 4"/>')
+        else:
+            _, cx, y, text, color, size, tooltip, _ = shape
+            font_size = 7 * size + 2
+            weight = ' font-weight="bold"' if size > 1 else ''
+            title = f'<title>{html.escape(tooltip)}</title>' if tooltip else ''
+            parts.append(f'<text x="{cx}" y="{y + font_size - 2}" font-size="{font_size}" fill="{color}"{weight}>'
+                         f'{title}{html.escape(text)}</text>')
+    parts.append('</g></svg>')
+    return "\n".join(parts).encode("utf-8")
+
+# PNG
+
+# 5x7 glyphs, rows top to bottom. Unknown characters render as blanks.
+_GLYPHS = {
+    "A": "01110 10001 10001 11111 10001 10001 10001", "B": "11110 10001 10001 11110 10001 10001 11110",
+    "C": "01110 10001 10000 10000 10000 10001 01110", "D": "11110 10001 10001 10001 10001 10001 11110",
+    "E": "11111 10000 10000 11110 10000 10000 11111", "F": "11111 10000 10000 11110 10000 10000 10000",
+    "G": "01110 10001 10000 10111 10001 10001 01111", "H": "10001 10001 10001 11111 10001 10001 10001",
+    "I": "01110 00100 00100 00100 00100 00100 01110", "J": "00111 00010 00010 00010 00010 10010 01100",
+    "K": "10001 10010 10100 11000 10100 10010 10001", "L": "10000 10000 10000 10000 10000 10000 11111",
+    "M": "10001 11011 10101 10101 10001 10001 10001", "N": "10001 10001 11001 10101 10011 10001 10001",
+    "O": "01110 10001 10001 10001 10001 10001 01110", "P": "11110 10001 10001 11110 10000 10000 10000",
+    "Q": "01110 10001 10001 10001 10101 10010 01101", "R": "11110 10001 10001 11110 10100 10010 10001",
+    "S": "01111 10000 10000 01110 00001 00001 11110", "T": "11111 00100 00100 00100 00100 00100 00100",
+    "U": "10001 10001 10001 10001 10001 10001 01110", "V": "10001 10001 10001 10001 10001 01010 00100",
+    "W": "10001 10001 10001 10101 10101 10101 01010", "X": "10001 10001 01010 00100 01010 10001 10001",
+    "Y": "10001 10001 10001 01010 00100 00100 00100", "Z": "11111 00001 00010 00100 01000 10000 11111",
+    "0": "01110 10001 10011 10101 11001 10001 01110", "1": "00100 01100 00100 00100 00100 00100 01110",
+    "2": "01110 10001 00001 00010 00100 01000 11111", "3": "11111 00010 00100 00010 00001 10001 01110",
+    "4": "00010 00110 01010 10010 11111 00010 00010", "5": "11111 10000 11110 00001 00001 10001 01110",
+    "6": "00110 01000 10000 11110 10001 10001 01110", "7": "11111 00001 00010 00100 01000 01000 01000",
+    "8": "01110 10001 10001 01110 10001 10001 01110", "9": "01110 10001 10001 01111 00001 00010 01100",
+    "-": "00000 00000 00000 11111 00000 00000 00000", ":": "00000 01100 01100 00000 01100 01100 00000",
+    ">": "01000 00100 00010 00001 00010 00100 01000", "<": "00010 00100 01000 10000 01000 00100 00010",
+    "=": "00000 00000 11111 00000 11111 00000 00000", ".": "00000 00000 00000 00000 00000 01100 01100",
+    "'": "01100 00100 01000 00000 00000 00000 00000", "/": "00000 00001 00010 00100 01000 10000 00000",
+}
+GLYPHS = {char: [[bit == "1" for bit in row] for row in rows.split()] for char, rows in _GLYPHS.items()}
+
+def _rgb(color):
+    return bytes.fromhex(color[1:])
+
+class _Canvas:
+    def __init__(self, width, height, background):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(_rgb(background) * (width * height))
+
+    def fill(self, x0, y0, x1, y1, color):
+        x0, x1 = max(x0, 0), min(x1, self.width)
+        if x0 >= x1:
+            return
+        row = _rgb(color) * (x1 - x0)
+        for y in range(max(y0, 0), min(y1, self.height)):
+            start = (y * self.width + x0) * 3
+            self.pixels[start:start + len(row)] = row
+
+    def text(self, cx, y, text, color, scale, max_width):
+        advance = 6 * scale
+        text = text[:max_width // advance]
+        x = cx - (len(text) * advance - scale) // 2
+        for char in text:
+            glyph = GLYPHS.get(char)
+            if glyph:
+                for gy, row in enumerate(glyph):
+                    for gx, on in enumerate(row):
+                        if on:
+                            px, py = x + gx * scale, y + gy * scale
+                            self.fill(px, py, px + scale, py + scale, color)
+            x += advance
+
+    def png(self, digest):
+        stride = self.width * 3
+        raw = b"".join(b"\x00" + bytes(self.pixels[y * stride:(y + 1) * stride]) for y in range(self.height))
+
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+        return (b"\x89PNG\r\n\x1a\n"
+                + chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0))
+                + chunk(b"tEXt", b"skill-tree\x00" + digest.encode("ascii"))
+                + chunk(b"IDAT", zlib.compress(raw, 9))
+                + chunk(b"IEND", b""))
+
+def render_png(skills, digest=None):
+    width, height, shapes = layout(skills)
+    canvas = _Canvas(width, height, BACKGROUND)
+    for shape in shapes:
+        kind = shape[0]
+        if kind == "rect":
+            _, x, y, w, h, fill, stroke = shape
+            canvas.fill(x, y, x + w, y + h, stroke)
+            canvas.fill(x + 2, y + 2, x + w - 2, y + h - 2, fill)
+        elif kind == "line":
+            _, x1, y1, x2, y2, color = shape
+            for dash in range(y1, y2, 10):  # Vertical connectors only: 6 on, 4 off
+                canvas.fill(x1 - 1, dash, x1 + 1, min(dash + 6, y2), color)
+        else:
+            _, cx, y, text, color, size, _, max_width = shape
+            canvas.text(cx, y, text, color, size, max_width)
+    return canvas.png(digest or fingerprint(skills))
+
+RENDERERS = {"svg": render_svg, "png": render_png}
+MEDIA_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
+def get_tree(player_id=tenants.DEFAULT_PLAYER, fmt="svg", skills=None):
+    """(digest, image bytes), rendered only when the skill set or its unlocks changed."""
+    skills = load_skills(player_id) if skills is None else skills
+    digest = fingerprint(skills)
+    key = (digest, fmt)
+    with _renders_lock:
+        if key in _renders:
+            _renders.move_to_end(key)
+            return digest, _renders[key]
+    image = RENDERERS[fmt](skills, digest)
+    with _renders_lock:
+        _renders[key] = image
+        while len(_renders) > RENDER_CACHE_SIZE:
+            _renders.popitem(last=False)
+    return digest, image
+
+def _png_stamp(path):
+    try:
+        with open(path, "rb") as f:
+            head = f.read(256)  # tEXt comes right after IHDR
+    except OSError:
+        return None
+    marker = head.find(b"tEXtskill-tree\x00")
+    if marker < 0:
+        return None
+    length = struct.unpack(">I", head[marker - 4:marker])[0]
+    return head[marker + 4 + len("skill-tree\x00"):marker + 4 + length].decode("ascii", "replace")
+
+def write_tree(player_id=tenants.DEFAULT_PLAYER, path=None):
+    """Writes SKILL_TREE.png unless it already shows the current unlocks. Returns (path, written)."""
+    path = path or tree_path(player_id)
+    skills = load_skills(player_id)
+    if _png_stamp(path) == fingerprint(skills):
+        return path, False
+    _, image = get_tree(player_id, "png", skills)
+    write_atomic(path, image)
+    return path, True
+
+if __name__ == "__main__":
+    # python -m agents.skill_tree [player_id]
+    import sys
+    target, written = write_tree(sys.argv[1] if len(sys.argv) > 1 else tenants.DEFAULT_PLAYER)
+    print(f"Map generated at {target}" if written else f"Map up to date at {target}")
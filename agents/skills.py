@@ -0,0 +1,132 @@
+import operator
+import re
+import threading
+
+# Skill unlock rules
+# skills.unlock_condition ("Strength >= 20", "Level >= 10 AND Sense > 15") is
+# parsed once into a Condition. dependency_index() maps every stat a
+# condition reads to the skills that read it, so a stat write re-checks only
+# those skills, inside the writer's transaction (the skills table lives in the
+# player's stats DB, so the unlocks commit atomically with the writes),
+# instead of leaving unlocks to the model or scanning the table.
+# Conditions that don't parse never unlock on their own; unlock_skill() can
+# still grant them.
+
+PROFILE_FIELDS = {"Level": "level", "XP": "xp"}  # Condition names read from player_profile
+
+OPERATORS = {
+    ">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt,
+    "==": operator.eq, "=": operator.eq, "!=": operator.ne,
+}
+_CLAUSE_RE = re.compile(r"^\s*([A-Za-z_]\w*)\s*(>=|<=|==|!=|>|<|=)\s*(-?\d+)\s*$")
+_AND_RE = re.compile(r"\s+AND\s+", re.IGNORECASE)
+
+class Condition:
+    __slots__ = ("text", "clauses", "stats")
+
+    def __init__(self, text, clauses):
+        self.text = text
+        self.clauses = clauses  # [(stat, op, threshold)]
+        self.stats = tuple(dict.fromkeys(stat for stat, _, _ in clauses))
+
+    def test(self, values):
+        """True when every clause holds for `values` ({stat: value}); missing stats fail."""
+        for stat, op, threshold in self.clauses:
+            value = values.get(stat)
+            if value is None or not OPERATORS[op](value, threshold):
+                return False
+        return True
+
+def compile_condition(text):
+    """Condition for an unlock_condition string, or None if it isn't in the rule grammar."""
+    if not text:
+        return None
+    clauses = []
+    for part in _AND_RE.split(text.strip()):
+        match = _CLAUSE_RE.match(part)
+        if not match:
+            return None
+        stat = match.group(1)
+        stat = next((name for name in PROFILE_FIELDS if name.lower() == stat.lower()), stat)
+        clauses.append((stat, match.group(2), int(match.group(3))))
+    return Condition(text, clauses)
+
+class SkillIndex:
+    def __init__(self, rows):
+        self.by_stat = {}  # stat -> [(skill name, Condition)]
+        self.uncompiled = []  # Skills only unlock_skill() can grant
+        for name, unlock_condition in rows:
+            condition = compile_condition(unlock_condition)
+            if condition is None:
+                self.uncompiled.append(name)
+                continue
+            for stat in condition.stats:
+                self.by_stat.setdefault(stat, []).append((name, condition))
+
+    def dependents(self, stat_names):
+        """{skill name: Condition} for skills whose condition reads any of `stat_names`."""
+        found = {}
+        for stat in stat_names:
+            for name, condition in self.by_stat.get(stat, ()):
+                found[name] = condition
+        return found
+
+_indexes = {}  # (player DB path, max skill id) -> SkillIndex
+_indexes_lock = threading.Lock()
+
+def _db_file(conn):
+    return next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+
+def dependency_index(conn):
+    """The SkillIndex for the skills table of `conn`'s database, built once per file.
+
+    Rebuilt when a skill is added (max id changes); call invalidate() after
+    editing existing conditions in place.
+    """
+    key = (_db_file(conn), conn.execute("SELECT MAX(id) FROM skills").fetchone()[0])
+    index = _indexes.get(key)
+    if index is None:
+        rows = conn.execute("SELECT name, unlock_condition FROM skills").fetchall()
+        index = SkillIndex([(row[0], row[1]) for row in rows])
+        with _indexes_lock:
+            for stale in [k for k in _indexes if k[0] == key[0]]:
+                del _indexes[stale]
+            _indexes[key] = index
+    return index
+
+def invalidate():
+    with _indexes_lock:
+        _indexes.clear()
+
+def read_values(conn, stat_names):
+    """{stat: value} for `stat_names`, through `conn` (so pending writes count)."""
+    names = [name for name in stat_names if name not in PROFILE_FIELDS]
+    values = {}
+    if names:
+        values.update((row[0], row[1]) for row in conn.execute(
+            f"SELECT stat_name, value FROM player_stats WHERE stat_name IN ({','.join('?' * len(names))})", names))
+    fields = [name for name in stat_names if name in PROFILE_FIELDS]
+    if fields:
+        row = conn.execute("SELECT level, xp FROM player_profile WHERE id=1").fetchone()
+        if row:
+            values.update((name, row[PROFILE_FIELDS[name]]) for name in fields)
+    return values
+
+def check_unlocks(conn, stat_names):
+    """Unlocks the locked skills whose conditions now hold after writes to `stat_names`.
+
+    Only skills that depend on those stats are evaluated. Runs in the caller's
+    transaction; returns the names unlocked.
+    """
+    candidates = dependency_index(conn).dependents(stat_names)
+    if not candidates:
+        return []
+    needed = {stat for condition in candidates.values() for stat in condition.stats}
+    values = read_values(conn, needed)
+    unlocked = []
+    for name, condition in candidates.items():
+        if condition.test(values):
+            cursor = conn.execute("UPDATE skills SET is_unlocked = 1 WHERE name = ? AND is_unlocked = 0", (name,))
+            if cursor.rowcount:
+                unlocked.append(name)
+    return unlocked
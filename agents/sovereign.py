@@ -1,18 +1,114 @@
-import os
-import sqlite3
 import datetime
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
+from agents import ledger, rules, skills, storage, tenants
+from agents.model_router import router
 
 load_dotenv()
 
-# Path to the database and artifacts
-DB_PATH = os.path.join(os.path.dirname(__file__), '../db/player_stats.db')
-VERDICT_PATH = os.path.join(os.path.dirname(__file__), '../VERDICT.md')
+# Artifacts (resolved per player, see agents/tenants.py)
+VERDICT_FILE = 'VERDICT.md'
+
+# Audit modes
+# "local": the rules engine (agents/rules.py) scores the day, Gemini checks the
+#          proof image (if any) first and writes the verdict prose.
+# "fast": rules engine only, templated verdict (no Gemini call, so a proof
+#         image can't be verified and earns no bonus).
+# "gemini": the original tool-calling audit, where the model decides every change.
+AUDIT_MODES = ("local", "fast", "gemini")
+AUDIT_MODE = os.getenv("SHADOW_AUDIT_MODE", "local")
+
+# Audit unit of work
+# Gemini's automatic function calling invokes the tools below once per stat
+# change. During nightly_audit every invocation shares one AuditTransaction:
+# one connection, one BEGIN IMMEDIATE, one commit when the verdict comes back
+# (rolled back if the audit fails). Tools read through the same connection, so
+# the results they hand back to the model include the pending writes.
+# Outside an audit each tool call is its own short transaction.
+# Stat and XP writes re-check the skills that depend on them in the same
+# transaction (agents/skills.py). The skills table lives in the player's stats
+# DB, so the writes and the unlocks they trigger commit, or roll back, together.
+
+_audit_tx = ContextVar("audit_tx", default=None)
+
+class AuditTransaction:
+    def __init__(self, player_id=None, audit_id=None):
+        self.db_path = tenants.player_db_path(player_id)
+        self.audit_id = audit_id  # Tags the stat_events written in this transaction
+        self.conn = None
+        self.writes = 0
 
-# Initialize Gemini Client
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    def connection(self):
+        """The shared connection, opening the transaction on first use.
+
+        BEGIN is deferred to the first tool call so the write lock isn't held
+        while the model is still reading the log.
+        """
+        if self.conn is None:
+            self.conn = storage.open_connection(self.db_path)
+            self.conn.isolation_level = None  # Explicit BEGIN/COMMIT below
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def commit(self):
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+            if self.writes:
+                storage.bump_data_version(self.db_path)
+        self.writes = 0
+
+    def rollback(self):
+        """Discards pending tool writes; the transaction restarts on the next call."""
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self.writes = 0
+
+    def close(self):
+        if self.conn is not None:
+            self.rollback()
+            self.conn.close()
+            self.conn = None
+
+@contextmanager
+def _tool_transaction():
+    """(connection, audit_id) for one tool call, wrapped in a savepoint.
+
+    A tool that fails halfway undoes only its own writes, not the audit's.
+    """
+    tx = _audit_tx.get()
+    owned = tx is None
+    if owned:
+        tx = AuditTransaction()
+    try:
+        conn = tx.connection()
+        conn.execute("SAVEPOINT tool_call")
+        try:
+            yield conn, tx.audit_id
+        except BaseException:
+            conn.execute("ROLLBACK TO tool_call")
+            conn.execute("RELEASE tool_call")
+            raise
+        conn.execute("RELEASE tool_call")
+        tx.writes += 1
+        if owned:
+            tx.commit()
+    finally:
+        if owned:
+            tx.close()
+
+def _auto_unlock(conn, stat_names):
+    """Unlocks skills whose conditions now hold; returns a note for the tool result."""
+    unlocked = skills.check_unlocks(conn, stat_names)
+    for name in unlocked:
+        conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)",
+                     (f"Skill Unlocked: {name}", "Unlock condition met"))
+    return "".join(f" \n🔓 SKILL UNLOCKED: '{name}'!" for name in unlocked)
 
 def update_player_stats(stat_name: str, increment: int, reason: str):
     """Updates the player's RPG stats in the SQLite DB.
@@ -23,70 +119,57 @@ def update_player_stats(stat_name: str, increment: int, reason: str):
         reason: The reason for the update.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Ensure stat exists
-        cursor.execute("INSERT OR IGNORE INTO player_stats (stat_name, value) VALUES (?, 0)", (stat_name,))
-        
-        # Update stat
-        cursor.execute("UPDATE player_stats SET value = value + ? WHERE stat_name = ?", (increment, stat_name))
-        
-        # Log to audit history
-        cursor.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", 
-                       (f"Stat Change: {stat_name} {increment:+d}", reason))
-        
-        conn.commit()
-        
-        # Fetch new value
-        cursor.execute("SELECT value FROM player_stats WHERE stat_name = ?", (stat_name,))
-        new_val = cursor.fetchone()[0]
-        
-        conn.close()
-        return f"SUCCESS: {stat_name} updated by {increment} ({reason}). New Value: {new_val}."
+        with _tool_transaction() as (conn, audit_id):
+            # Append to the ledger (the trigger updates player_stats)
+            ledger.append(conn, stat_name, increment, "update_player_stats", reason, audit_id)
+            
+            # Log to audit history
+            conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", 
+                         (f"Stat Change: {stat_name} {increment:+d}", reason))
+            
+            # Fetch new value (includes this audit's pending changes)
+            new_val = conn.execute("SELECT value FROM player_stats WHERE stat_name = ?", (stat_name,)).fetchone()[0]
+            unlocks = _auto_unlock(conn, [stat_name])
+        return f"SUCCESS: {stat_name} updated by {increment} ({reason}). New Value: {new_val}.{unlocks}"
     except Exception as e:
         return f"ERROR: Failed to update stats - {str(e)}"
 
 def grant_xp(amount: int, reason: str):
     """Grants XP to the player and checks for level up."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Get current XP and Level
-        cursor.execute("SELECT level, xp, job_class FROM player_profile WHERE id=1")
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return "ERROR: Player profile not found."
+        with _tool_transaction() as (conn, audit_id):
+            # Get current XP and Level
+            row = conn.execute("SELECT level, xp, job_class FROM player_profile WHERE id=1").fetchone()
+            if not row:
+                return "ERROR: Player profile not found."
+                
+            current_level, current_xp, job_class = row
+            new_xp = current_xp + amount
+            new_level = current_level
+            message = f"XP Gained: {amount}. Total XP: {new_xp}."
             
-        current_level, current_xp, job_class = row
-        new_xp = current_xp + amount
-        new_level = current_level
-        message = f"XP Gained: {amount}. Total XP: {new_xp}."
-        
-        # Level Up Logic (Threshold: Level * 1000)
-        threshold = 1000 * current_level
-        
-        if new_xp >= threshold:
-            new_level += 1
-            message += f" \n🎉 LEVEL UP! You are now Level {new_level}!"
+            # Level Up Logic (Threshold: Level * 1000)
+            threshold = 1000 * current_level
             
-            # Job Change Check
-            if new_level == 10 and job_class == 'Shadow Monarch Candidate':
-                message += "\n⚠️ JOB CHANGE QUEST AVAILABLE: 'The Necromancer's Path'."
-                cursor.execute("""
-                    INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value, deadline)
-                    VALUES (?, ?, ?, 'ACTIVE', ?, ?, ?)
-                """, ("JOB CHANGE: Survive the Penalty", "Complete 100 Pushups, 100 Situps, 10km Run.", "S", "Strength", 10, datetime.datetime.now().replace(year=datetime.datetime.now().year + 1)))
-
-        cursor.execute("UPDATE player_profile SET xp = ?, level = ? WHERE id=1", (new_xp, new_level))
-        
-        cursor.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", 
-                       (f"XP Change: +{amount}", reason))
-        
-        conn.commit()
-        conn.close()
+            if new_xp >= threshold:
+                new_level += 1
+                message += f" \n🎉 LEVEL UP! You are now Level {new_level}!"
+                
+                # Job Change Check
+                if new_level == 10 and job_class == 'Shadow Monarch Candidate':
+                    message += "\n⚠️ JOB CHANGE QUEST AVAILABLE: 'The Necromancer's Path'."
+                    conn.execute("""
+                        INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value, deadline)
+                        VALUES (?, ?, ?, 'ACTIVE', ?, ?, ?)
+                    """, ("JOB CHANGE: Survive the Penalty", "Complete 100 Pushups, 100 Situps, 10km Run.", "S", "Strength", 10, datetime.datetime.now().replace(year=datetime.datetime.now().year + 1)))
+
+            ledger.append(conn, ledger.XP, amount, "grant_xp", reason, audit_id)
+            if new_level != current_level:
+                conn.execute("UPDATE player_profile SET level = ? WHERE id=1", (new_level,))
+            
+            conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", 
+                         (f"XP Change: +{amount}", reason))
+            message += _auto_unlock(conn, [ledger.XP, "Level"])
         return message
     except Exception as e:
         return f"ERROR: Failed to grant XP - {str(e)}"
@@ -94,19 +177,10 @@ def grant_xp(amount: int, reason: str):
 def unlock_skill(skill_name: str, reason: str):
     """Unlocks a skill for the player."""
     try:
-        # Assuming skills.db is separate or table is in main DB?
-        # init_skills.py created skills.db.
-        SKILLS_DB_PATH = os.path.join(os.path.dirname(__file__), '../db/skills.db')
-        conn = sqlite3.connect(SKILLS_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("UPDATE skills SET is_unlocked = 1 WHERE name = ?", (skill_name,))
-        if cursor.rowcount == 0:
-            conn.close()
-            return f"ERROR: Skill '{skill_name}' not found."
-            
-        conn.commit()
-        conn.close()
+        with _tool_transaction() as (conn, _):
+            cursor = conn.execute("UPDATE skills SET is_unlocked = 1 WHERE name = ?", (skill_name,))
+            if cursor.rowcount == 0:
+                return f"ERROR: Skill '{skill_name}' not found."
         return f"SUCCESS: Skill '{skill_name}' UNLOCKED! ({reason})"
     except Exception as e:
         return f"ERROR: Failed to unlock skill - {str(e)}"
@@ -116,36 +190,27 @@ def arise(problem_description: str):
     Cost: 500 XP.
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Check Level and XP
-        cursor.execute("SELECT level, xp FROM player_profile WHERE id=1")
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return "ERROR: Profile not found."
+        with _tool_transaction() as (conn, audit_id):
+            # Check Level and XP
+            row = conn.execute("SELECT level, xp FROM player_profile WHERE id=1").fetchone()
+            if not row:
+                return "ERROR: Profile not found."
+                
+            level, xp = row
+            if level < 10:
+                return "FAILURE: 'Arise' requires Level 10 (Shadow Monarch Candidate)."
             
-        level, xp = row
-        if level < 10:
-            conn.close()
-            return "FAILURE: 'Arise' requires Level 10 (Shadow Monarch Candidate)."
-        
-        if xp < 500:
-            conn.close()
-            return f"FAILURE: Insufficient XP for 'Arise' (Requires 500, has {xp})."
+            if xp < 500:
+                return f"FAILURE: Insufficient XP for 'Arise' (Requires 500, has {xp})."
+                
+            # Deduct XP
+            ledger.append(conn, ledger.XP, -500, "arise", problem_description, audit_id)
+            conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", 
+                         ("Skill Used: ARISE", f"Spent 500 XP to solve: {problem_description}"))
+            _auto_unlock(conn, [ledger.XP])
             
-        # Deduct XP
-        new_xp = xp - 500
-        cursor.execute("UPDATE player_profile SET xp = ? WHERE id=1", (new_xp,))
-        cursor.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", 
-                       ("Skill Used: ARISE", f"Spent 500 XP to solve: {problem_description}"))
-        conn.commit()
-        conn.close()
-        
-        # Fetch Context (Shadow Extraction)
-        cursor.execute("SELECT title, description FROM quests WHERE status='COMPLETED' ORDER BY id DESC LIMIT 5")
-        history = cursor.fetchall()
+            # Fetch Context (Shadow Extraction)
+            history = conn.execute("SELECT title, description FROM quests WHERE status='COMPLETED' ORDER BY id DESC LIMIT 5").fetchall()
         context_str = "\\n".join([f"- {h[0]}: {h[1]}" for h in history])
         
         return f"SUCCESS: XP Deducted. SHADOW SOVEREIGN SUMMONED. \n[SYSTEM DIRECTIVE]: You are the Shadow Monarch. The user calls upon you. \n\n**USER CONTEXT (Past Feats)**:\n{context_str}\n\n**CURRENT PROBLEM**:\n{problem_description}\n\n**COMMAND**: Provide a solution that aligns with their past trajectory. Code-complete. Dominant tone."
@@ -153,6 +218,14 @@ def arise(problem_description: str):
     except Exception as e:
         return f"ERROR: Arise failed - {str(e)}"
 
+VERDICT_INSTRUCTION = """
+You are the **SHADOW SOVEREIGN**, judge of User 'Ayoub'.
+- **Level 1-9**: Cold, robotic System. "Player stats updated."
+- **Level 10+**: Regal, imperious Shadow Monarch. "Rise. You have done well."
+The System has already scored the day; never change or invent numbers.
+Write a short verdict on the day's performance and end with its Rank (S, A, B, C, D, E).
+"""
+
 SYSTEM_INSTRUCTION = """
 You are the **SHADOW SOVEREIGN** (Gemini 3 Pro).
 Your domain is the evolution of User 'Ayoub'.
@@ -171,11 +244,8 @@ CORE MECHANICS:
 
 2. **Progression (XP & Skills)**:
    - Award XP for quests (100-500). Double for Vision Proof.
-   - **SKILL UNLOCKS**:
-     - Strength 20 -> Unlock 'Iron Body'.
-     - Intelligence 20 -> Unlock 'Deep Focus'.
-     - Agility 20 -> Unlock 'Shadow Step'.
-     - USE 'unlock_skill' when conditions are met.
+   - **SKILL UNLOCKS**: Automatic when a skill's condition is met (tool results announce them).
+     Use 'unlock_skill' only for skills earned some other way.
    - **ARISE SKILL**:
      - Player can call `arise(problem)` to get a technical miracle.
      - Cost: 500 XP.
@@ -191,9 +261,150 @@ CORE MECHANICS:
    - Conclude with a clear VERDICT on the day's performance (Rank: S, A, B, C, D, E).
 """
 
-def nightly_audit(daily_logs: str, image_path: str = None) -> str:
-    """Runs the nightly audit of the user's performance."""
-    print(f"--- SYSTEM: INITIATING NIGHTLY AUDIT ---")
+def nightly_audit(daily_logs, image_path: str = None, player_id: str = tenants.DEFAULT_PLAYER, mode: str = None) -> str:
+    """Runs the nightly audit of the user's performance.
+
+    `daily_logs` is the Auditor's list of log lines (or one string); `mode`
+    is one of AUDIT_MODES (default: SHADOW_AUDIT_MODE, else "local").
+    """
+    mode = mode or AUDIT_MODE
+    if mode not in AUDIT_MODES:
+        raise ValueError(f"Unknown audit mode {mode!r}; expected one of {AUDIT_MODES}")
+    # Tool calls made by Gemini during this audit act on `player_id`'s shard.
+    token = tenants.current_player.set(tenants.validate_player_id(player_id))
+    try:
+        if mode == "gemini":
+            if not isinstance(daily_logs, str):
+                daily_logs = "; ".join(daily_logs)
+            return _run_audit(daily_logs, image_path, player_id)
+        return _run_rules_audit(daily_logs, image_path, player_id, narrate=(mode == "local"))
+    finally:
+        tenants.current_player.reset(token)
+
+def _save_verdict(verdict_text, player_id, footer):
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    artifact_content = f"""# 🌑 Shadow Sovereign Verdict
+**Date**: {timestamp}
+
+## Daily Analysis
+{verdict_text}
+
+---
+*{footer}*
+"""
+    verdict_path = tenants.player_file(player_id, VERDICT_FILE)
+    with open(verdict_path, "w", encoding="utf-8") as f:
+        f.write(artifact_content)
+    print(f"--- VERDICT SAVED TO {verdict_path} ---")
+
+def _apply_outcome(conn, audit_id, outcome):
+    """Writes a rules.Outcome like the tools would (ledger, audit_logs, unlocks). Returns the unlock note."""
+    for stat_name, delta, reason in outcome.stat_changes:
+        ledger.append(conn, stat_name, delta, "rules", reason, audit_id)
+        conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)",
+                     (f"Stat Change: {stat_name} {delta:+d}", reason))
+    if outcome.xp:
+        reason = "; ".join(outcome.xp_reasons)
+        ledger.append(conn, ledger.XP, outcome.xp, "rules", reason, audit_id)
+        conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)",
+                     (f"XP Change: +{outcome.xp}", reason))
+    if outcome.level_after != outcome.level_before:
+        conn.execute("UPDATE player_profile SET level = ? WHERE id=1", (outcome.level_after,))
+    if outcome.job_class_after != outcome.job_class_before:
+        conn.execute("UPDATE player_profile SET job_class = ? WHERE id=1", (outcome.job_class_after,))
+    for quest in outcome.quests:
+        deadline = datetime.datetime.now().replace(hour=23, minute=59) + datetime.timedelta(days=quest.get("deadline_days", 1))
+        conn.execute("""
+            INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value, deadline)
+            VALUES (?, ?, ?, 'ACTIVE', ?, ?, ?)
+        """, (quest["title"], quest["description"], quest["difficulty"], quest["stat_reward_type"],
+              quest["stat_reward_value"], deadline.isoformat()))
+    return _auto_unlock(conn, [stat_name for stat_name, _, _ in outcome.stat_changes] + [ledger.XP, "Level"])
+
+def _narrate(daily_logs, outcome, unlocks):
+    """Verdict prose from Gemini for an already-scored audit (no tools, no thinking)."""
+    log_text = daily_logs if isinstance(daily_logs, str) else "; ".join(daily_logs)
+    prompt = (f"Player level: {outcome.level_after}.\nToday's log: {log_text}\n"
+              "Results already applied by the System:\n- " + "\n- ".join(outcome.summary())
+              + unlocks.replace(" \n", "\n- "))
+    response, model = router.generate(prompt, config=types.GenerateContentConfig(system_instruction=VERDICT_INSTRUCTION),
+                                      site="audit_verdict")
+    return response.text
+
+def _verify_proof(daily_logs, image_path):
+    """Vision check of a proof image against the day's log. True only if Gemini accepts it."""
+    print(f"--- 👁️ VISION: ANALYZING PROOF ({image_path}) ---")
+    try:
+        import PIL.Image
+        image = PIL.Image.open(image_path)
+    except ImportError:
+        print("Warning: Pillow not installed. Proof not verified.")
+        return False
+    except Exception as e:
+        print(f"Error loading image: {e}")
+        return False
+    log_text = daily_logs if isinstance(daily_logs, str) else "; ".join(daily_logs)
+    prompt = (f"Today's log: {log_text}\nThe user submitted the image above as proof of quest completion. "
+              'Does it plausibly show the completed activity? Reply in JSON: {"valid": true|false, "reason": "..."}')
+    try:
+        response, model = router.generate(
+            [image, prompt], config=types.GenerateContentConfig(response_mime_type="application/json"),
+            site="audit_proof", cache=False)
+        verdict = response.parsed or json.loads(response.text)
+    except Exception as e:
+        print(f"Proof check unavailable ({e}); proof not counted.")
+        return False
+    if not isinstance(verdict, dict):
+        verdict = {}
+    valid = verdict.get("valid") is True
+    print(f"--- PROOF {'ACCEPTED' if valid else 'REJECTED'}: {verdict.get('reason', '')} ---")
+    return valid
+
+def _fast_verdict(outcome, unlocks):
+    lines = outcome.summary()
+    return f"**RANK {outcome.rank}**\n\n" + "\n".join(f"- {line}" for line in lines[1:]) + unlocks
+
+def _run_rules_audit(daily_logs, image_path, player_id, narrate=True):
+    print(f"--- SYSTEM: INITIATING NIGHTLY AUDIT ({player_id}, rules engine) ---")
+    # Proof only counts once the vision check accepts the image ("PROOF SUBMITTED" lines alone don't)
+    entries = [(kind, text) for kind, text in rules.parse_log(daily_logs) if kind != "PROOF"]
+    if image_path:
+        if not narrate:
+            print("Proof not verified in fast mode (no Gemini call); no proof bonus.")
+        elif _verify_proof(daily_logs, image_path):
+            entries.append(("PROOF", image_path))
+
+    tx = AuditTransaction(player_id, audit_id=uuid.uuid4().hex)
+    token = _audit_tx.set(tx)
+    try:
+        try:
+            with _tool_transaction() as (conn, audit_id):
+                outcome = rules.score(entries, rules.load_state(conn))
+                unlocks = _apply_outcome(conn, audit_id, outcome)
+        finally:
+            _audit_tx.reset(token)
+        tx.commit()  # Before the (slow) prose call: the write lock isn't held over the network
+
+        verdict_text = None
+        if narrate:
+            try:
+                verdict_text = _narrate(daily_logs, outcome, unlocks)
+            except Exception as e:
+                print(f"Verdict prose unavailable ({e}); using the System summary.")
+        prose = bool(verdict_text)
+        if not prose:
+            verdict_text = _fast_verdict(outcome, unlocks)
+
+        _save_verdict(verdict_text, player_id, "System generated via the rules engine" + (" + Gemini" if prose else ""))
+        return verdict_text
+
+    except Exception as e:
+        return f"SYSTEM ERROR: Audit failed. Reason: {e}"
+    finally:
+        tx.close()  # Rolls back anything not committed
+
+def _run_audit(daily_logs, image_path, player_id):
+    print(f"--- SYSTEM: INITIATING NIGHTLY AUDIT ({player_id}) ---")
     
     audit_contents = [f"Analyze today's performance log and update stats/XP/Skills accordingly: {daily_logs}"]
     
@@ -209,61 +420,40 @@ def nightly_audit(daily_logs: str, image_path: str = None) -> str:
         except Exception as e:
             print(f"Error loading image: {e}")
 
-    import time
-    
+    def audit_config(model):
+        # Thinking is a 2.5-series feature; older fallbacks get the same tools without it.
+        thinking = types.ThinkingConfig(include_thoughts=True) if model.startswith("gemini-2.5") else None
+        return types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION,
+            thinking_config=thinking,
+            tools=[update_player_stats, grant_xp, unlock_skill, arise]
+        )
+
+    tx = AuditTransaction(player_id, audit_id=uuid.uuid4().hex)
+    token = _audit_tx.set(tx)
     try:
         # 1. Generate Content (The Audit)
-        retries = 3
-        response = None
-        
-        for attempt in range(retries):
-            try:
-                print(f"--- SYSTEM: Connecting to Gemini (Attempt {attempt+1}/{retries}) ---")
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash", 
-                    contents=audit_contents,
-                    config=types.GenerateContentConfig(
-                        system_instruction=SYSTEM_INSTRUCTION,
-                        thinking_config=types.ThinkingConfig(include_thoughts=True),
-                        tools=[update_player_stats, grant_xp, unlock_skill, arise]
-                    )
-                )
-                break # Success
-            except Exception as e:
-                print(f"Gemini Error (Attempt {attempt+1}): {e}")
-                if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                    if attempt < retries - 1:
-                        print("Rate limit hit. Sleeping 10s...")
-                        time.sleep(10)
-                        continue
-                raise e # Re-raise if not 429 or max retries reached
-        
-        if not response:
-            raise Exception("Failed to get response after retries.")
-
-        verdict_text = response.text
+        # Never cached: the tools write to the DB, and the same log on another day is a new audit.
+        # A model that fails mid-audit has its tool writes rolled back before the next one starts over.
+        try:
+            response, model = router.generate(audit_contents, config=audit_config, site="nightly_audit",
+                                              cache=False, on_failure=lambda model, error: tx.rollback())
+            verdict_text = response.text
+        finally:
+            _audit_tx.reset(token)
+        tx.commit()  # One commit for every tool call of this audit
         
         # 2. Save Verdict Artifact
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        artifact_content = f"""# 🌑 Shadow Sovereign Verdict
-**Date**: {timestamp}
-
-## Daily Analysis
-{verdict_text}
-
----
-*System generated via Gemini 3 Pro*
-"""
-        with open(VERDICT_PATH, "w", encoding="utf-8") as f:
-            f.write(artifact_content)
-        
-        print(f"--- VERDICT SAVED TO {VERDICT_PATH} ---")
+        _save_verdict(verdict_text, player_id, "System generated via Gemini 3 Pro")
         return verdict_text
 
     except Exception as e:
         return f"SYSTEM ERROR: Audit failed. Reason: {e}"
+    finally:
+        tx.close()  # Rolls back anything not committed
 
 if __name__ == "__main__":
     # Test run
+    import sys
     test_log = "Completed 2 hours of coding. Skipped Sambo due to fatigue. Slept 5 hours."
-    print(nightly_audit(test_log))
+    print(nightly_audit(test_log, player_id=sys.argv[1] if len(sys.argv) > 1 else tenants.DEFAULT_PLAYER))
@@ -0,0 +1,291 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from agents import metrics
+
+# Shared SQLite access layer.
+# One pool per (process, db file). Connections are opened once, tuned once, and
+# reused, so hot endpoints (GET /status) don't pay connect + pragma + statement
+# parse cost on every request.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(PROJECT_ROOT, 'db', 'player_stats.db')
+
+POOL_SIZE = int(os.getenv("SHADOW_DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
+
+# WAL lets readers (dashboard polling) run while the audit writer commits.
+# synchronous=NORMAL is durable across app crashes in WAL mode; only an OS crash
+# can lose the last transaction.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",      # ~8MB page cache per connection
+    "PRAGMA mmap_size=67108864",    # 64MB memory-mapped reads
+    "PRAGMA foreign_keys=ON",
+)
+
+# Statement timing (agents/metrics.py). SHADOW_SQL_METRICS=0 opens plain connections.
+TIME_QUERIES = os.getenv("SHADOW_SQL_METRICS", "1") != "0"
+
+class TimedCursor(sqlite3.Cursor):
+    """Reports each execute() to metrics.sqlite_query (rows fetched later aren't included)."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.sqlite_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.sqlite_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            metrics.sqlite_query(sql_script, time.perf_counter() - start)
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts would bypass TimedCursor: route them through it
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+def connect(path, **kwargs):
+    """sqlite3.connect with statement timing (for callers that manage their own connection)."""
+    if TIME_QUERIES:
+        kwargs.setdefault("factory", TimedConnection)
+    return sqlite3.connect(path, **kwargs)
+
+def open_connection(path=DB_PATH):
+    """Opens a tuned connection (WAL, busy_timeout, statement cache)."""
+    conn = connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # Pooled: used by one thread at a time, but not always the same one.
+        cached_statements=CACHED_STATEMENTS,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionPool:
+    """A bounded pool of tuned connections to a single SQLite file."""
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)  # LIFO keeps the warmest connection in use
+        self._lock = threading.Lock()
+        self._created = 0
+        self.evicted = False  # Dropped from the registry: close connections as they come back
+
+    @property
+    def open_connections(self):
+        return self._created
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+
+        if can_open:
+            try:
+                _reserve_connection(self)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            try:
+                return open_connection(self.path)
+            except Exception:
+                self._forget(1)
+                raise
+
+        # Pool exhausted: wait for a connection to come back.
+        return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.evicted:
+            conn.close()
+            self._forget(1)
+            return
+        self._idle.put_nowait(conn)
+
+    def _forget(self, count):
+        with self._lock:
+            self._created -= count
+        _release_connections(count)
+
+    @contextmanager
+    def connection(self):
+        """Checks a connection out of the pool for the duration of the block.
+
+        Uncommitted work is rolled back when the connection is returned.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close_idle(self):
+        """Closes idle connections; returns how many were closed."""
+        closed = 0
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            closed += 1
+        if closed:
+            with self._lock:
+                self._created -= closed
+        return closed
+
+    def close(self):
+        """Closes all idle connections."""
+        _release_connections(self.close_idle())
+
+# Pool registry
+# With one DB file per player (agents/tenants.py) a process can touch
+# thousands of files. Pools are kept in LRU order and the total number of
+# open connections is capped by a file-descriptor budget: opening a new
+# connection over budget first closes idle connections of the least
+# recently used pools. The cap is soft: if every connection is checked out,
+# the new one is opened anyway rather than deadlocking.
+FDS_PER_CONNECTION = 3  # db + -wal + -shm
+
+def _default_fd_budget():
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            return soft // 2  # Leave half for sockets, logs, HTTP clients
+    except (ImportError, ValueError, OSError):
+        pass
+    return 512
+
+FD_BUDGET = int(os.getenv("SHADOW_DB_FD_BUDGET", "0")) or _default_fd_budget()
+MAX_OPEN_CONNECTIONS = max(1, FD_BUDGET // FDS_PER_CONNECTION)
+
+_pools = OrderedDict()
+_pools_lock = threading.RLock()
+_open_connections = 0
+_evicted_pools = 0
+
+def _reserve_connection(requester):
+    global _open_connections, _evicted_pools
+    with _pools_lock:
+        for key, pool in list(_pools.items()):  # Oldest first
+            if _open_connections < MAX_OPEN_CONNECTIONS:
+                break
+            if pool is requester:
+                continue
+            _open_connections -= pool.close_idle()
+            if pool.open_connections == 0:
+                pool.evicted = True
+                del _pools[key]
+                _evicted_pools += 1
+        _open_connections += 1
+
+def _release_connections(count):
+    global _open_connections
+    if count:
+        with _pools_lock:
+            _open_connections -= count
+
+def get_pool(path=DB_PATH):
+    """Returns the pool for `path` in this worker process, creating it on first use."""
+    key = (os.getpid(), os.path.abspath(path))  # Never share connections across a fork
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(path)
+            _pools[key] = pool
+        else:
+            _pools.move_to_end(key)
+        return pool
+
+def connection(path=DB_PATH):
+    """Context manager yielding a pooled connection to `path`."""
+    return get_pool(path).connection()
+
+def pool_stats():
+    """Registry counters (for benchmarks and diagnostics)."""
+    with _pools_lock:
+        return {
+            "pools": len(_pools),
+            "open_connections": _open_connections,
+            "max_open_connections": MAX_OPEN_CONNECTIONS,
+            "evicted_pools": _evicted_pools,
+        }
+
+def close_all():
+    """Closes every pool owned by this process (FastAPI shutdown hook)."""
+    with _pools_lock:
+        for (pid, _), pool in list(_pools.items()):
+            if pid == os.getpid():
+                pool.close()
+            pool.evicted = True
+        _pools.clear()
+
+# Data versioning
+# Every writer path calls bump_data_version(path) after it commits. Readers
+# that cache derived payloads (the /status snapshot) compare data_version()
+# before touching the DB. The file stamps catch commits made by other
+# processes (CLI audit, Chronos jobs) that never bump this process's counter.
+_data_versions = {}
+_data_version_lock = threading.Lock()
+
+def bump_data_version(path=DB_PATH):
+    """Marks in-process cached views of `path` as stale."""
+    key = os.path.abspath(path)
+    with _data_version_lock:
+        version = _data_versions.get(key, 0) + 1
+        _data_versions[key] = version
+        return version
+
+def data_version(path=DB_PATH):
+    """Cheap version key for `path`: in-process counter + db/WAL file stamps. No query."""
+    stamps = []
+    for suffix in ("", "-wal"):
+        try:
+            st = os.stat(path + suffix)
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return (_data_versions.get(os.path.abspath(path), 0), *stamps)
@@ -0,0 +1,149 @@
+import datetime
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from contextvars import ContextVar
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from agents import migrations, storage
+
+# Tenant layer: one SQLite shard per player.
+# Each player gets their own player_stats.db (skills table included) under
+# db/players/<xx>/<player_id>/ (xx = hash prefix, keeps directories small).
+# The schema is unchanged: player_profile still holds exactly one row
+# (id = 1) per file, so queries keep their `WHERE id=1`.
+# DEFAULT_PLAYER maps to the original single-player file in db/ so existing
+# installs keep working. Shards from before migration 0012 also have a
+# skills.db; the migration copies it into player_stats.db and it is no longer read.
+
+DEFAULT_PLAYER = "default"
+PLAYERS_DIR = os.getenv("SHADOW_PLAYERS_DIR", os.path.join(storage.PROJECT_ROOT, 'db', 'players'))
+
+SCHEMA_PATH = os.path.join(storage.PROJECT_ROOT, 'db', 'quests.sql')
+
+_PLAYER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_provisioned = set()
+_migrated = set()  # Default-player DB paths already migrated in this process
+_provision_lock = threading.Lock()
+
+# Player the current call chain acts for. Set by entry points (nightly_audit)
+# so Gemini tool functions, whose signatures the model sees, stay player-agnostic.
+current_player = ContextVar("current_player", default=DEFAULT_PLAYER)
+
+def validate_player_id(player_id):
+    """Returns `player_id` or raises ValueError (ids become directory names)."""
+    if not isinstance(player_id, str) or not _PLAYER_ID_RE.match(player_id):
+        raise ValueError(f"Invalid player id: {player_id!r}")
+    return player_id
+
+def player_dir(player_id):
+    """Directory holding a player's shard and artifacts."""
+    if validate_player_id(player_id) == DEFAULT_PLAYER:
+        return storage.PROJECT_ROOT
+    prefix = hashlib.sha1(player_id.encode("utf-8")).hexdigest()[:2]
+    return os.path.join(PLAYERS_DIR, prefix, player_id)
+
+def player_file(player_id, name):
+    """Path of a per-player artifact (DAILY_QUEST.md, VERDICT.md, token.json...)."""
+    return os.path.join(player_dir(player_id), name)
+
+def player_db_path(player_id=None):
+    """Resolves (and provisions on first use) the player's stats DB."""
+    player_id = player_id or current_player.get()
+    if validate_player_id(player_id) == DEFAULT_PLAYER:
+        if storage.DB_PATH not in _migrated:
+            migrations.migrate(storage.DB_PATH)  # Once per process, like shards in ensure_player
+            _migrated.add(storage.DB_PATH)
+        return storage.DB_PATH
+    ensure_player(player_id)
+    return os.path.join(player_dir(player_id), 'player_stats.db')
+
+def _run_schema(db_path, schema_path=None, extra=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        if schema_path:
+            with open(schema_path, 'r') as f:
+                conn.executescript(f.read())
+        for statement in extra:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _template():
+    """Builds (once) the empty stats DB that new shards are copied from.
+
+    Copying a file is much cheaper than replaying the schema per player.
+    The directory is keyed by the schema contents, so editing quests.sql or
+    db/migrations yields a fresh template instead of copying a stale one.
+    """
+    digest = hashlib.sha1()
+    schema_files = [SCHEMA_PATH] + [path for _, _, path in migrations.discover()]
+    for path in schema_files:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    template_dir = os.path.join(PLAYERS_DIR, f'_template-{digest.hexdigest()[:10]}')
+    stats_path = os.path.join(template_dir, 'player_stats.db')
+    if not os.path.exists(stats_path):
+        os.makedirs(template_dir, exist_ok=True)
+        migrations.migrate(stats_path)
+        _run_schema(stats_path, extra=["INSERT OR IGNORE INTO player_stats (stat_name, value) VALUES ('Fatigue', 0)"])
+    return stats_path
+
+def ensure_player(player_id):
+    """Creates the player's shard from the schema template if missing."""
+    if player_id in _provisioned:
+        return
+    with _provision_lock:
+        if player_id in _provisioned:
+            return
+        directory = player_dir(player_id)
+        target = os.path.join(directory, 'player_stats.db')
+        if not os.path.exists(target):
+            os.makedirs(directory, exist_ok=True)
+            shutil.copyfile(_template(), target)
+        else:
+            migrations.migrate(target)  # Shard from an older schema: catch up once per process
+        _provisioned.add(player_id)
+
+def list_players():
+    """Ids of every provisioned player (the default player first, if its DB exists)."""
+    players = [DEFAULT_PLAYER] if os.path.exists(storage.DB_PATH) else []
+    if os.path.isdir(PLAYERS_DIR):
+        for prefix in sorted(os.listdir(PLAYERS_DIR)):
+            prefix_dir = os.path.join(PLAYERS_DIR, prefix)
+            if prefix.startswith("_template") or not os.path.isdir(prefix_dir):
+                continue
+            for player_id in sorted(os.listdir(prefix_dir)):
+                if _PLAYER_ID_RE.match(player_id) and os.path.exists(
+                        os.path.join(prefix_dir, player_id, 'player_stats.db')):
+                    players.append(player_id)
+    return players
+
+def connection(player_id=None):
+    """Pooled connection to the player's stats shard."""
+    return storage.connection(player_db_path(player_id))
+
+def player_timezone(player_id=None):
+    """The player's ZoneInfo (player_profile.timezone), or None for this machine's local time."""
+    try:
+        with connection(player_id) as conn:
+            row = conn.execute("SELECT timezone FROM player_profile WHERE id=1").fetchone()
+    except Exception as e:
+        print(f"Time zone lookup failed for {player_id}: {e}")
+        return None
+    if not row or not row[0]:
+        return None
+    try:
+        return ZoneInfo(row[0])
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"Unknown time zone {row[0]!r} for {player_id}, using local time.")
+        return None
+
+def player_today(player_id=None):
+    """Today's date in the player's time zone."""
+    return datetime.datetime.now(player_timezone(player_id)).date()
@@ -1,8 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import sqlite3
-import os
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
+import hashlib
+import threading
+from collections import OrderedDict
 from pydantic import BaseModel
+from typing import Optional
+from agents import migrations, storage, tenants
 
 app = FastAPI(title="Shadow System API", version="1.0.0")
 
@@ -13,11 +20,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-# Paths
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db/player_stats.db')
-
 # Models
 class Stat(BaseModel):
     name: str
@@ -30,22 +35,41 @@ class Profile(BaseModel):
     is_in_dungeon: bool
 
 # Helpers
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def player_id_param(player_id: str = tenants.DEFAULT_PLAYER):
+    """`?player_id=` on every endpoint; selects the player's DB shard."""
+    try:
+        return tenants.validate_player_id(player_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_db_connection(player_id=tenants.DEFAULT_PLAYER):
+    """Checks out a pooled WAL connection to the player's shard. Use as a context manager."""
+    return storage.connection(tenants.player_db_path(player_id))
+
+@app.on_event("startup")
+def migrate_db():
+    """Applies pending db/migrations to the default player's DB (shards migrate on first use)."""
+    migrations.migrate(storage.DB_PATH)
+
+@app.on_event("startup")
+async def warm_gemini():
+    """Creates the shared Gemini client and opens its connection in the background."""
+    from agents import gemini
+    app.state.gemini_warmup = asyncio.create_task(gemini.warm_up_async())
+
+@app.on_event("shutdown")
+def close_db_pool():
+    storage.close_all()
 
 @app.get("/")
 def read_root():
     return {"system": "Shadow Sovereign", "status": "ONLINE"}
 
-@app.get("/status")
-def get_status():
-    """Returns the full player status (Stats + Profile)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+def build_status(player_id=tenants.DEFAULT_PLAYER):
+    """Reads the full player status (Stats + Profile) from the DB."""
+    with get_db_connection(player_id) as conn:
+        cursor = conn.cursor()
+        
         # Profile
         cursor.execute("SELECT level, xp, job_class, is_in_dungeon FROM player_profile WHERE id=1")
         row = cursor.fetchone()
@@ -81,7 +105,6 @@ def get_status():
         context_row = cursor.fetchone()
         context = None
         if context_row:
-            import json
             roadmap = {}
             try:
                 roadmap = json.loads(context_row["roadmap_json"])
@@ -95,28 +118,108 @@ def get_status():
             }
         
         return {"profile": profile, "stats": stats, "quest": quest, "context": context}
-        
-    finally:
-        conn.close()
+
+# Status Snapshot
+# /status is polled by the dashboard but only changes when a writer commits.
+# The payload is built once per data version and served from memory;
+# clients holding the current ETag get a bodiless 304.
+STATUS_SNAPSHOT_CAPACITY = 4096  # players kept in memory
+_status_snapshots = OrderedDict()  # player_id -> (version, etag, body)
+_status_lock = threading.Lock()
+
+def load_status_snapshot(player_id=tenants.DEFAULT_PLAYER):
+    """Returns (etag, body) for the current data version, rebuilding only after a write."""
+    version = storage.data_version(tenants.player_db_path(player_id))
+    cached = _status_snapshots.get(player_id)
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+
+    with _status_lock:
+        cached = _status_snapshots.get(player_id)
+        if cached and cached[0] == version:
+            return cached[1], cached[2]
+
+        body = json.dumps(build_status(player_id), separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        _status_snapshots[player_id] = (version, etag, body)
+        _status_snapshots.move_to_end(player_id)
+        while len(_status_snapshots) > STATUS_SNAPSHOT_CAPACITY:
+            _status_snapshots.popitem(last=False)
+        return etag, body
+
+@app.get("/status")
+def get_status(request: Request, player_id: str = Depends(player_id_param)):
+    """Returns the full player status (Stats + Profile)."""
+    etag, body = load_status_snapshot(player_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/hud")
+def get_hud(request: Request, player_id: str = Depends(player_id_param)):
+    """The HUD page (same as `main.py stats` writes), revalidated by ETag."""
+    from agents import hud
+    status = json.loads(load_status_snapshot(player_id)[1])
+    profile = status["profile"]
+    profile = (profile["level"], profile["xp"], profile["job_class"], profile["is_in_dungeon"])
+    stats = list(status["stats"].items())
+    digest = hud.fingerprint(stats, profile)
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "no-cache"}
+
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=hud.render(stats, profile, digest), media_type="text/html", headers=headers)
+
+@app.get("/skill-tree")
+def get_skill_tree(request: Request, format: str = "svg", player_id: str = Depends(player_id_param)):
+    """The evolution tree as SVG (default) or PNG, re-rendered only after an unlock."""
+    from agents import skill_tree
+    if format not in skill_tree.RENDERERS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(skill_tree.RENDERERS)}")
+    skills = skill_tree.load_skills(player_id)
+    etag = f'"{skill_tree.fingerprint(skills)}-{format}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    _, image = skill_tree.get_tree(player_id, format, skills)
+    return Response(content=image, media_type=skill_tree.MEDIA_TYPES[format], headers=headers)
+
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):
+    """Gemini and SQLite metrics of this worker: Prometheus text, or `?format=summary` for people."""
+    from agents import metrics
+    if format == "summary":
+        return Response(content=metrics.summary(), media_type="text/plain")
+    if format != "prometheus":
+        raise HTTPException(status_code=400, detail="format must be 'prometheus' or 'summary'")
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/llm-cache/stats")
+def llm_cache_stats():
+    """Hit/miss counters (this worker) and size of the Gemini response cache."""
+    from agents.llm_cache import cache
+    return cache.stats()
 
 # Awakening Protocol
 class AwakenRequest(BaseModel):
     goals: str
 
+def set_job_class(new_class, player_id=tenants.DEFAULT_PLAYER):
+    with get_db_connection(player_id) as conn:
+        conn.execute("UPDATE player_profile SET job_class = ? WHERE id=1", (new_class,))
+        conn.commit()
+    storage.bump_data_version(tenants.player_db_path(player_id))
+
 @app.post("/awaken")
-def awaken_system(request: AwakenRequest):
+async def awaken_system(request: AwakenRequest, player_id: str = Depends(player_id_param)):
     """Initializes the System with a custom User Class based on goals."""
-    from google import genai
     from google.genai import types
-    from dotenv import load_dotenv
-    
-    load_dotenv()
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    from agents.model_router import router
     
     print(f"Awakening requested: {request.goals}")
-    
-    import time
-    import json
 
     # 1. Gemini Analysis
     prompt = f"""
@@ -130,65 +233,88 @@ def awaken_system(request: AwakenRequest):
     Output JSON: {{ "job_class": "Class Name" }}
     """
     
-    retries = 3
-    for attempt in range(retries):
-        try:
-            print(f"Attempt {attempt+1}/{retries} connecting to Gemini...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash", 
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            
-            print(f"DEBUG: Raw Gemini Response: {response.text}")
+    try:
+        response, model = await router.generate_async(
+            prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json"
+            ),
+            site="awaken"
+        )
+        
+        print(f"DEBUG: Raw Gemini Response: {response.text}")
+        
+        if response.parsed:
+            result = response.parsed
+        else:
+            # Fallback manual parse
+            result = json.loads(response.text)
             
-            if response.parsed:
-                result = response.parsed
-            else:
-                # Fallback manual parse
-                result = json.loads(response.text)
-                
-            new_class = result.get('job_class', 'Shadow Candidate')
-            break # Success
-        except Exception as e:
-            print(f"Gemini Error (Attempt {attempt+1}): {e}")
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                if attempt < retries - 1:
-                    print("Rate limit hit. Sleeping 5s...")
-                    time.sleep(5)
-                    continue
-            new_class = "Shadow Candidate" # Fallback on final failure or non-retryable error
+        new_class = result.get('job_class', 'Shadow Candidate')
+    except Exception as e:
+        print(f"Gemini Error: {e}")
+        new_class = "Shadow Candidate" # Fallback when every model is exhausted or the reply is unusable
 
     # 2. Update DB
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE player_profile SET job_class = ? WHERE id=1", (new_class,))
-    conn.commit()
-    conn.close()
+    await run_in_threadpool(set_job_class, new_class, player_id)
     
     return {"status": "AWAKENED", "new_class": new_class}
 
 # Onboarding Chat Protocol
 class ChatRequest(BaseModel):
-    history: list # List of {role: user/model, content: str}
     message: str
+    session_id: Optional[str] = None # Omit on the first turn; echo the returned id afterwards
+    history: list = [] # List of {role: user/model, content: str}. Only read when starting a session.
+
+async def resolve_session(request: ChatRequest, player_id: str):
+    from agents.onboarding import open_session
+    try:
+        return await open_session(request.session_id, request.history, player_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Onboarding session not found or expired")
 
 @app.post("/onboarding/chat")
-def onboarding_chat(request: ChatRequest):
+async def onboarding_chat(request: ChatRequest, player_id: str = Depends(player_id_param)):
     """Handles the multi-turn onboarding interview."""
     from agents.onboarding import process_chat, seed_database
     
-    response = process_chat(request.history, request.message)
+    session = await resolve_session(request, player_id)
+    response = await process_chat(session.history, request.message, session)
+    response["session_id"] = session.session_id
     
-    # If Genesis triggered, seed DB
+    # If Genesis triggered, seed DB (SQLite is blocking: keep it off the event loop)
     if "genesis" in response:
-        success = seed_database(response["genesis"])
+        success = await run_in_threadpool(seed_database, response["genesis"], player_id)
         response["genesis_status"] = "SUCCESS" if success else "FAILURE"
         
     return response
 
+def sse_event(event, data):
+    """Formats one Server-Sent Event frame."""
+    payload = json.dumps(data) if not isinstance(data, str) else json.dumps({"text": data})
+    return f"event: {event}\ndata: {payload}\n\n"
+
+@app.post("/onboarding/chat/stream")
+async def onboarding_chat_stream(request: ChatRequest, player_id: str = Depends(player_id_param)):
+    """Streams the interview reply as SSE: `chunk` events, then a terminal `done` (or `error`)."""
+    from agents.onboarding import stream_chat, seed_database
+
+    session = await resolve_session(request, player_id)
+
+    async def events():
+        yield sse_event("session", {"session_id": session.session_id})
+        async for event, data in stream_chat(session.history, request.message, session):
+            if event == "done" and "genesis" in data:
+                success = await run_in_threadpool(seed_database, data["genesis"], player_id)
+                data["genesis_status"] = "SUCCESS" if success else "FAILURE"
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,18 +1,16 @@
-import sqlite3
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import migrations  # noqa: E402
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'player_stats.db')
-SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'quests.sql')
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    with open(SCHEMA_PATH, 'r') as f:
-        schema = f.read()
-    
-    conn.executescript(schema)
-    conn.commit()
-    conn.close()
-    print(f"Database initialized at {DB_PATH}")
+    # Baseline schema (quests.sql) + any pending db/migrations.
+    applied = migrations.migrate(DB_PATH)
+    print(f"Database initialized at {DB_PATH} (migrations applied: {applied or 'none'})")
 
 if __name__ == "__main__":
     init_db()
@@ -1,23 +1,18 @@
 import sqlite3
 import os
+import sys
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'player_stats.db') # Merging into main DB for simplicity or separate? Prompt said `db/skills.db`.
-# "Create a separate table... for 'Unlocked Skills'. These are specialized buffs..."
-# Prompt: "Step 2: The Skill Tree (db/skills.db) Create a separate table..." -> It explicitly says db/skills.db.
-# I will create a new DB file for skills.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-SKILLS_DB_PATH = os.path.join(os.path.dirname(__file__), 'skills.db')
-SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'skills.sql')
+from agents import migrations  # noqa: E402
+
+# The skills table lives in player_stats.db (db/migrations/0012_skills_table.py);
+# a db/skills.db from before that migration is copied in by it.
 MAIN_DB_PATH = os.path.join(os.path.dirname(__file__), 'player_stats.db')
 
 def init_skills_db():
-    conn = sqlite3.connect(SKILLS_DB_PATH)
-    with open(SCHEMA_PATH, 'r') as f:
-        schema = f.read()
-    conn.executescript(schema)
-    conn.commit()
-    conn.close()
-    print(f"Skills Database initialized at {SKILLS_DB_PATH}")
+    migrations.migrate(MAIN_DB_PATH)
+    print(f"Skills table initialized in {MAIN_DB_PATH}")
 
     # Ensure Fatigue in Main DB
     conn_main = sqlite3.connect(MAIN_DB_PATH)
@@ -0,0 +1,7 @@
+# Formerly db/migrate_v4.py: player_profile.is_in_dungeon for databases
+# created before the column was part of quests.sql.
+
+def upgrade(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(player_profile)")]
+    if "is_in_dungeon" not in columns:
+        conn.execute("ALTER TABLE player_profile ADD COLUMN is_in_dungeon BOOLEAN DEFAULT 0")
@@ -0,0 +1,15 @@
+-- Indexes for the hot queries (checked by util/check_query_plans.py).
+
+-- /status active quest, quest_master, arise: WHERE status = ? ORDER BY id DESC LIMIT n.
+-- (status, id) serves both the filter and the order; the LIMIT keeps the
+-- row lookups to 1-5, so title/description aren't duplicated into the index.
+CREATE INDEX IF NOT EXISTS idx_quests_status_id ON quests (status, id);
+
+-- Daily audit history by date (newest first within a day via id).
+CREATE INDEX IF NOT EXISTS idx_audit_logs_log_date ON audit_logs (log_date, id);
+
+-- quest_master's weakest stat: ORDER BY value LIMIT 1 without a sort.
+CREATE INDEX IF NOT EXISTS idx_player_stats_value ON player_stats (value, stat_name);
+
+-- user_context is read newest-first by its INTEGER PRIMARY KEY (rowid), which
+-- needs no extra index.
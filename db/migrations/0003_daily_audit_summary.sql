@@ -0,0 +1,9 @@
+-- Daily rollup of compacted audit_logs rows (see agents/retention.py).
+-- stat_name is a player stat, 'XP', or '*' for entries without a numeric delta.
+CREATE TABLE IF NOT EXISTS daily_audit_summary (
+    log_date DATE NOT NULL,
+    stat_name TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    net_delta INTEGER NOT NULL,
+    PRIMARY KEY (log_date, stat_name)
+) WITHOUT ROWID;
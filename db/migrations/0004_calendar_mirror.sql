@@ -0,0 +1,17 @@
+-- Local mirror of the player's primary Google Calendar (see agents/calendar_sync.py),
+-- kept current with events.list syncToken incremental sync.
+CREATE TABLE IF NOT EXISTS calendar_events (
+    event_id TEXT PRIMARY KEY,
+    summary TEXT,
+    start_time TEXT NOT NULL, -- dateTime, or date for all-day events, as returned by the API
+    start_date TEXT NOT NULL, -- YYYY-MM-DD part of start_time, for day lookups
+    end_time TEXT,
+    updated TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calendar_events_start ON calendar_events (start_date, start_time);
+
+CREATE TABLE IF NOT EXISTS calendar_sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL NOT NULL
+);
@@ -0,0 +1,19 @@
+-- Pre-generated daily quests (see agents/quest_master.py: refill_quest_queue).
+-- One batch holds QUEUE_DAYS days x every stat x NORMAL/RECOVERY variants.
+CREATE TABLE IF NOT EXISTS quest_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id TEXT NOT NULL,
+    day INTEGER NOT NULL, -- 1..QUEUE_DAYS within the batch
+    stat_name TEXT NOT NULL, -- stat the quest trains
+    variant TEXT NOT NULL, -- NORMAL or RECOVERY
+    title TEXT NOT NULL,
+    description TEXT,
+    difficulty TEXT,
+    stat_reward_type TEXT,
+    stat_reward_value INTEGER,
+    calendar_event_name TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    used_at DATETIME
+);
+-- Next unused quest for (variant, stat).
+CREATE INDEX IF NOT EXISTS idx_quest_queue_next ON quest_queue (variant, stat_name, used_at, day, id);
@@ -0,0 +1,2 @@
+-- IANA time zone for the player's schedule (Chronos). NULL = the daemon's local time.
+ALTER TABLE player_profile ADD COLUMN timezone TEXT;
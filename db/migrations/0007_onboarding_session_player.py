@@ -0,0 +1,26 @@
+# Server-side onboarding sessions (agents/session_store.py), owned by the
+# player who started them. Sessions from before player_id have it NULL and
+# can't be resumed. Checked rather than plain CREATE/ALTER: databases
+# provisioned before this migration may already have the tables (from the
+# old quests.sql, or created by SessionStore itself) with or without the column.
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS onboarding_sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            player_id TEXT
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS onboarding_messages (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID""")
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(onboarding_sessions)")]
+    if "player_id" not in columns:
+        conn.execute("ALTER TABLE onboarding_sessions ADD COLUMN player_id TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_onboarding_sessions_updated ON onboarding_sessions(updated_at)")
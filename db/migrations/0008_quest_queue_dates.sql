@@ -0,0 +1,3 @@
+-- Date each queued quest was planned for (its day's calendar went into the plan).
+-- Rows from before this column have no date and are never drawn: the next draw re-plans.
+ALTER TABLE quest_queue ADD COLUMN plan_date TEXT; -- YYYY-MM-DD
@@ -0,0 +1,4 @@
+-- calendar_events.start_date is now the event's day in the player's time zone
+-- (it was the date in the event's own UTC offset). Dropping the sync state
+-- makes the next fetch re-list the calendar and rebuild the mirror.
+DELETE FROM calendar_sync_state;
@@ -0,0 +1,58 @@
+-- Stat Ledger (see agents/ledger.py)
+-- Append-only history of every stat/XP change. player_stats.value and
+-- player_profile.xp are snapshots maintained by the trigger below; every
+-- checkpoint_interval-th event also checkpoints the full state for
+-- point-in-time reads. Databases that got these tables from the old
+-- quests.sql keep their rows; the trigger is recreated to read the interval.
+CREATE TABLE IF NOT EXISTS stat_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stat_name TEXT NOT NULL, -- a player_stats name, or 'XP'
+    delta INTEGER NOT NULL,
+    source TEXT NOT NULL, -- tool or job that made the change
+    audit_id TEXT, -- nightly audit run, NULL outside audits
+    reason TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS stat_checkpoints (
+    event_id INTEGER NOT NULL, -- last event folded in (0 = baseline)
+    stat_name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, stat_name)
+);
+
+-- Events between checkpoints. Set once here: stats_at replays at most this
+-- many events past a checkpoint, so lowering it on a live ledger needs new
+-- checkpoints first.
+CREATE TABLE IF NOT EXISTS stat_ledger_config (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    checkpoint_interval INTEGER NOT NULL CHECK (checkpoint_interval > 0)
+);
+INSERT OR IGNORE INTO stat_ledger_config (id, checkpoint_interval) VALUES (1, 500);
+
+CREATE INDEX IF NOT EXISTS idx_stat_checkpoints_created_at ON stat_checkpoints (created_at, event_id);
+
+-- Ledger history per stat, newest first.
+CREATE INDEX IF NOT EXISTS idx_stat_events_stat_id ON stat_events (stat_name, id);
+
+DROP TRIGGER IF EXISTS stat_events_apply;
+CREATE TRIGGER stat_events_apply AFTER INSERT ON stat_events
+BEGIN
+    INSERT OR IGNORE INTO player_stats (stat_name, value)
+        SELECT NEW.stat_name, 0 WHERE NEW.stat_name <> 'XP';
+    UPDATE player_stats SET value = value + NEW.delta
+        WHERE stat_name = NEW.stat_name AND NEW.stat_name <> 'XP';
+    UPDATE player_profile SET xp = xp + NEW.delta
+        WHERE id = 1 AND NEW.stat_name = 'XP';
+    INSERT INTO stat_checkpoints (event_id, stat_name, value, created_at)
+        SELECT NEW.id, stat_name, value, NEW.created_at FROM player_stats
+            WHERE NEW.id % (SELECT checkpoint_interval FROM stat_ledger_config WHERE id = 1) = 0
+        UNION ALL
+        SELECT NEW.id, 'XP', xp, NEW.created_at FROM player_profile
+            WHERE id = 1 AND NEW.id % (SELECT checkpoint_interval FROM stat_ledger_config WHERE id = 1) = 0;
+END;
+
+-- Ledger baseline: the state before the first stat_event
+INSERT OR IGNORE INTO stat_checkpoints (event_id, stat_name, value) SELECT 0, stat_name, value FROM player_stats;
+INSERT OR IGNORE INTO stat_checkpoints (event_id, stat_name, value) SELECT 0, 'XP', xp FROM player_profile WHERE id = 1;
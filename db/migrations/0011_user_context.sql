@@ -0,0 +1,9 @@
+-- Genesis data (onboarding output, read newest-first by /status). Onboarding
+-- wrote to this table before any schema declared it.
+CREATE TABLE IF NOT EXISTS user_context (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    grand_goal TEXT,
+    shadow_weakness TEXT,
+    roadmap_json TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+
+# Skills move from the separate skills.db into the player's stats DB, so a
+# stat write and the unlocks it triggers commit as one single-file
+# transaction (an ATTACHed file in WAL mode commits on its own).
+# An existing skills.db next to this database (db/skills.db for the default
+# player, <shard>/skills.db for the others) is copied over, unlock state
+# included, then left in place unread.
+
+SKILLS_FILE = 'skills.db'
+
+DEFAULT_SKILLS = [
+    ('Iron Body', 'Reduces XP loss from physical fatigue by 50%.', 'Strength >= 20', 'XP_PENALTY_REDUCTION_50'),
+    ('Deep Focus', 'Grants 1.5x XP for Intelligence quests completed before noon.', 'Intelligence >= 20', 'INT_XP_BOOST_1.5'),
+    ('Shadow Step', 'Allows skipping one daily quest per week without penalty.', 'Agility >= 20', 'SKIP_PENALTY_WAIVER'),
+]
+
+def _legacy_rows(conn):
+    main_file = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+    legacy_path = os.path.join(os.path.dirname(main_file), SKILLS_FILE) if main_file else ""
+    if not legacy_path or not os.path.exists(legacy_path):
+        return []
+    # A separate read-only connection: ATTACH isn't allowed inside the migration's transaction.
+    legacy = sqlite3.connect(f"file:{legacy_path}?mode=ro", uri=True)
+    try:
+        if not legacy.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'skills'").fetchone():
+            return []
+        return legacy.execute(
+            "SELECT id, name, description, unlock_condition, effect, is_unlocked FROM skills ORDER BY id").fetchall()
+    finally:
+        legacy.close()
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS skills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            unlock_condition TEXT, -- e.g., "Strength >= 20"
+            effect TEXT,
+            is_unlocked BOOLEAN DEFAULT 0
+        )""")
+    conn.executemany(
+        "INSERT OR IGNORE INTO skills (id, name, description, unlock_condition, effect, is_unlocked) "
+        "VALUES (?, ?, ?, ?, ?, ?)", _legacy_rows(conn))
+    conn.executemany(
+        "INSERT OR IGNORE INTO skills (name, description, unlock_condition, effect) VALUES (?, ?, ?, ?)",
+        DEFAULT_SKILLS)
@@ -1,63 +1,25 @@
 import argparse
 import sys
-import sqlite3
 import os
+from agents import hud, metrics, quest_master, storage, tenants
 from agents.auditor import run_audit
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'db/player_stats.db')
-
-def generate_hud(stats_for_hud, profile_for_hud):
-    """Generates the HUD.html file."""
-    level, xp, job_class, is_in_dungeon = profile_for_hud
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Shadow System HUD</title>
-        <style>
-            body {{ background-color: #0d0d0d; color: #4285F4; font-family: 'Courier New', monospace; padding: 20px; }}
-            .container {{ border: 2px solid #4285F4; padding: 20px; max-width: 600px; margin: auto; box-shadow: 0 0 20px #4285F4; }}
-            h1 {{ text-align: center; text-transform: uppercase; letter-spacing: 5px; }}
-            .stat-row {{ display: flex; justify-content: space-between; border-bottom: 1px solid #333; padding: 5px 0; }}
-            .value {{ color: white; }}
-            .alert {{ color: red; font-weight: bold; text-align: center; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Shadow System</h1>
-            <div class="stat-row"><span>Class</span><span class="value">{job_class}</span></div>
-            <div class="stat-row"><span>Level</span><span class="value">{level}</span></div>
-            <div class="stat-row"><span>XP</span><span class="value">{xp} / {level * 1000}</span></div>
-            <br>
-            <h3>Attributes</h3>
-    """
-    for stat_name, value in stats_for_hud:
-        html += f'<div class="stat-row"><span>{stat_name}</span><span class="value">{value}</span></div>'
-    
-    if is_in_dungeon:
-        html += '<p class="alert">⚠️ INSIDE DUNGEON</p>'
-        
-    html += """
-        </div>
-    </body>
-    </html>
-    """
-    
-    hud_path = os.path.join(os.path.dirname(__file__), 'assets/HUD.html')
-    os.makedirs(os.path.dirname(hud_path), exist_ok=True)
-    with open(hud_path, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"HUD Generated at {hud_path}")
+def generate_hud(stats_for_hud, profile_for_hud, player_id=tenants.DEFAULT_PLAYER):
+    """Generates the HUD.html file (skipped when nothing changed)."""
+    hud_path = hud.hud_path(player_id)
+    if hud.write_hud(stats_for_hud, profile_for_hud, hud_path):
+        print(f"HUD Generated at {hud_path}")
+    else:
+        print(f"HUD up to date at {hud_path}")
 
-def check_stats():
+def check_stats(player_id=tenants.DEFAULT_PLAYER):
     """Displays current player stats and generates HUD."""
-    if not os.path.exists(DB_PATH):
+    db_path = tenants.player_db_path(player_id)
+    if not os.path.exists(db_path):
         print("Error: Database not found. Please run initialization first.")
         return
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = storage.connect(db_path)
     cursor = conn.cursor()
     
     # Get Profile
@@ -70,7 +32,7 @@ def check_stats():
 
     print("\n--- 📊 PLAYER STATUS ---")
     if profile:
-        print(f"Name: Ayoub")
+        print(f"Name: {'Ayoub' if player_id == tenants.DEFAULT_PLAYER else player_id}")
         print(f"Class: {profile[2]}")
         print(f"Level: {profile[0]} (XP: {profile[1]})")
         if profile[3]: # is_in_dungeon
@@ -80,9 +42,16 @@ def check_stats():
     for stat_name, value in stats:
         print(f"{stat_name}: {value}")
     print("-" * 20)
+    queued = quest_master.queued_quest_counts(player_id)
+    if queued:
+        print("Quest Queue: " + ", ".join(
+            f"{sum(n for (v, _), n in queued.items() if v == variant)} {variant.lower()}"
+            for variant in (quest_master.NORMAL, quest_master.RECOVERY)) + " quests planned ahead")
+    else:
+        print("Quest Queue: empty (the next quest re-plans the week)")
     
     if profile:
-        generate_hud(stats, profile)
+        generate_hud(stats, profile, player_id)
     else:
         print("Warning: Player profile not found, HUD not generated.")
         
@@ -90,23 +59,39 @@ def check_stats():
 
 def main():
     parser = argparse.ArgumentParser(description="Shadow System: The Sovereign Engine")
+    parser.add_argument("--metrics", action="store_true", help="Print Gemini/SQLite metrics for this run when done")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     
+    # Shared: which player's shard to act on
+    player_parser = argparse.ArgumentParser(add_help=False)
+    player_parser.add_argument("--player", default=tenants.DEFAULT_PLAYER, help="Player ID (default: the original single-player DB)")
+    
     # Audit Command
-    subparsers.add_parser("audit", help="Run the nightly audit sequence")
+    audit_parser = subparsers.add_parser("audit", help="Run the nightly audit sequence", parents=[player_parser])
+    audit_parser.add_argument("--mode", choices=["local", "fast", "gemini"], default=None,
+                              help="local: rules engine + Gemini verdict (default), fast: rules engine only (proof not verified), gemini: model-scored audit")
     
     # Stats Command
-    subparsers.add_parser("stats", help="View current player stats")
-    subparsers.add_parser("status", help="View current player stats")
+    subparsers.add_parser("stats", help="View current player stats", parents=[player_parser])
+    subparsers.add_parser("status", help="View current player stats", parents=[player_parser])
+    
+    # Metrics Command
+    metrics_parser = subparsers.add_parser("metrics", help="Show a running backend's metrics summary")
+    metrics_parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
     
     args = parser.parse_args()
     
     if args.command == "audit":
-        run_audit()
+        run_audit(args.player, mode=args.mode)
     elif args.command == "stats" or args.command == "status":
-        check_stats()
+        check_stats(args.player)
+    elif args.command == "metrics":
+        print(metrics.fetch_summary(args.url))
     else:
         parser.print_help()
 
+    if args.metrics and args.command != "metrics":
+        print("\n" + metrics.summary())
+
 if __name__ == "__main__":
     main()
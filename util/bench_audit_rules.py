@@ -0,0 +1,117 @@
+"""Benchmark: nightly audit latency with and without the local rules engine.
+
+Runs the same audit log through each sovereign.nightly_audit mode against a
+throwaway player shard, with a stand-in Gemini client that sleeps --latency
+seconds per request:
+
+  gemini  the model scores the day through tool calls: one request per tool
+          round trip (--round-trips) plus the final verdict. The stand-in
+          only pays the latency; the tool writes themselves are cheap.
+  local   rules engine scores and writes the day, one prose request.
+  fast    rules engine only, templated verdict.
+
+Also reports the engine alone (parse_log + score, no DB writes).
+
+Usage:
+    python util/bench_audit_rules.py --runs 5 --latency 2.0 --round-trips 3
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TMP = tempfile.mkdtemp(prefix="shadow_audit_")
+os.environ["SHADOW_PLAYERS_DIR"] = TMP
+
+from google.genai import types  # noqa: E402
+from bench_shards import percentile  # noqa: E402
+
+LOGS = [
+    "GITHUB AUTO-VERIFICATION: 3 commits pushed to shadow-system (Verify +Intelligence)",
+    "COMPLETED: Deep work: thesis chapter 2",
+    "FAILED: Sambo training - too tired",
+    "EXTRA ACTIVITY: Slept 5 hours, 20 min walk",
+]
+
+class SlowGemini:
+    """Stand-in client: every request costs `latency` seconds (`rounds` of them in gemini mode)."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.rounds = 1
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            self.calls += self.rounds
+        time.sleep(self.latency * self.rounds)
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(text="Player stats updated. RANK C.")]))])
+
+def timed_runs(label, runs, audit):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        audit()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<34} p50: {statistics.median(samples):9.1f} ms   p99: {percentile(samples, 99):9.1f} ms")
+    return statistics.median(samples)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=2.0, help="Seconds per Gemini request")
+    parser.add_argument("--round-trips", type=int, default=3, help="Tool round trips in a model-scored audit")
+    args = parser.parse_args()
+
+    try:
+        from agents import gemini, rules, sovereign, storage, tenants
+        from agents.llm_cache import cache as response_cache
+        response_cache.db_path = os.path.join(TMP, "llm_cache.db")  # Keep the real cache untouched
+        tenants.ensure_player("bench")
+        fake = SlowGemini(args.latency)
+        gemini.set_client(fake)
+        quiet = open(os.devnull, "w")
+
+        def audit(mode, rounds=1):
+            fake.rounds = rounds
+            response_cache.clear()  # Every verdict is a fresh request
+            stdout, sys.stdout = sys.stdout, quiet
+            try:
+                return sovereign.nightly_audit(LOGS, player_id="bench", mode=mode)
+            finally:
+                sys.stdout = stdout
+
+        results = {}
+        for mode, rounds in (("gemini", 1 + args.round_trips), ("local", 1), ("fast", 1)):
+            fake.calls = 0
+            results[mode] = timed_runs(f"{mode} ({'rules engine' if mode != 'gemini' else 'tool calls'})",
+                                       args.runs, lambda: audit(mode, rounds))
+            print(f"{'':<34} Gemini requests/audit: {fake.calls / args.runs:.0f}")
+
+        state = None
+        with storage.connection(tenants.player_db_path("bench")) as conn:
+            state = rules.load_state(conn)
+        samples = []
+        for _ in range(1000):
+            start = time.perf_counter()
+            rules.score(rules.parse_log(LOGS), state)
+            samples.append((time.perf_counter() - start) * 1e6)
+        print(f"{'engine only (parse + score)':<34} p50: {statistics.median(samples):9.1f} us   "
+              f"p99: {percentile(samples, 99):9.1f} us")
+        print(f"--- local vs gemini: {results['gemini'] / results['local']:.1f}x faster, "
+              f"fast vs gemini: {results['gemini'] / results['fast']:.0f}x ---")
+        storage.close_all()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
@@ -0,0 +1,71 @@
+"""Benchmark: per-job overhead of Chronos jobs, in-process vs. subprocess.
+
+Fires the scheduled compaction job (no network, near-empty shard, so almost
+all of the time is overhead) --runs times in each mode against throwaway
+player shards, through a Scheduler whose clock jumps to each deadline.
+In-process jobs run on the Scheduler's worker pool; subprocess jobs pay a
+fresh interpreter plus the google.genai / googleapiclient imports every
+time.
+
+Usage:
+    python util/bench_chronos_jobs.py --runs 10
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TMP = tempfile.mkdtemp(prefix="shadow_chronos_")
+os.environ["SHADOW_PLAYERS_DIR"] = TMP  # Children inherit it
+
+from bench_shards import percentile  # noqa: E402
+
+def scheduled_compaction(chronos, isolate):
+    """A job() that fires the next compaction slot and waits for it."""
+    clock = [time.time()]
+    scheduler = chronos.Scheduler(["bench"], isolate=isolate, state_path=os.path.join(TMP, f"chronos_{isolate}.db"),
+                                  schedule=(("compact", 3, 0, chronos.run_compaction),), clock=lambda: clock[0])
+    quiet = open(os.devnull, "w")
+
+    def job():
+        clock[0] = scheduler.next_deadline()
+        stdout, sys.stdout = sys.stdout, quiet
+        try:
+            assert all(future.result() for future in scheduler.run_due())
+        finally:
+            sys.stdout = stdout
+    return job
+
+def timed_runs(label, runs, job):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        job()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<34} p50: {statistics.median(samples):9.1f} ms   p99: {percentile(samples, 99):9.1f} ms")
+    return statistics.median(samples)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        start = time.perf_counter()
+        from agents import chronos, storage, tenants
+        print(f"daemon start-up imports (paid once): {(time.perf_counter() - start) * 1000:.1f} ms")
+        tenants.ensure_player("bench")
+
+        in_process = timed_runs("in-process (worker pool)", args.runs, scheduled_compaction(chronos, False))
+        isolated = timed_runs("subprocess (--isolate)", args.runs, scheduled_compaction(chronos, True))
+        print(f"--- per-job overhead saved: {isolated - in_process:.1f} ms ({isolated / in_process:.0f}x) ---")
+        storage.close_all()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
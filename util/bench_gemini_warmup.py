@@ -0,0 +1,58 @@
+"""Benchmark: first-call Gemini latency, per-call client vs. the shared warm registry.
+
+Needs GEMINI_API_KEY (real network round trips, 1-token replies).
+
+Usage:
+    python util/bench_gemini_warmup.py --calls 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv  # noqa: E402
+from google import genai  # noqa: E402
+from google.genai import types  # noqa: E402
+from agents import gemini  # noqa: E402
+
+MODEL = "gemini-2.5-flash"
+CONFIG = types.GenerateContentConfig(max_output_tokens=1)
+
+def ping(client):
+    start = time.perf_counter()
+    client.models.generate_content(model=MODEL, contents="ping", config=CONFIG)
+    return (time.perf_counter() - start) * 1000
+
+def legacy(calls):
+    """Old behaviour: a fresh genai.Client per request (as /awaken did)."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        client.models.generate_content(model=MODEL, contents="ping", config=CONFIG)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def registry(calls):
+    """Shared client, pre-warmed like the backend startup hook does."""
+    start = time.perf_counter()
+    gemini.warm_up(MODEL)
+    warmup_ms = (time.perf_counter() - start) * 1000
+    return warmup_ms, [ping(gemini.get_client()) for _ in range(calls)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5)
+    args = parser.parse_args()
+    load_dotenv()
+
+    cold = legacy(args.calls)
+    warmup_ms, warm = registry(args.calls)
+
+    print(f"--- Gemini first-call latency ({MODEL}, {args.calls} calls) ---")
+    print(f"per-call client:   first {cold[0]:8.1f} ms   median {statistics.median(cold):8.1f} ms")
+    print(f"shared registry:   first {warm[0]:8.1f} ms   median {statistics.median(warm):8.1f} ms   (warm-up at startup: {warmup_ms:.1f} ms)")
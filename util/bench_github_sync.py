@@ -0,0 +1,122 @@
+"""Benchmark: incremental GitHub sync against a local stub of the events API.
+
+The stub serves /users/<name>/events/public with ETags, If-None-Match (304)
+and `Link: rel="next"` pagination, like api.github.com. The script syncs
+--users feeds three times: a cold sync, an unchanged re-sync (all 304s),
+and a sync after --new events were added to every feed.
+
+Usage:
+    python util/bench_github_sync.py --users 200 --events 250 --new 5
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agents import storage  # noqa: E402
+from agents.github_proxy import GitHubSync  # noqa: E402
+
+class StubFeeds:
+    def __init__(self):
+        self.events = {}  # username -> newest-first event list
+        self.next_id = 1_000_000
+        self.lock = threading.Lock()
+
+    def add(self, username, count):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self.lock:
+            feed = self.events.setdefault(username, [])
+            for _ in range(count):
+                self.next_id += 1
+                feed.insert(0, {
+                    "id": str(self.next_id),
+                    "type": "PushEvent" if self.next_id % 3 else "WatchEvent",
+                    "repo": {"name": f"{username}/project"},
+                    "payload": {"commits": [{}] * (self.next_id % 4)},
+                    "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                })
+
+def make_handler(feeds):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            if len(parts) != 4 or parts[0] != "users" or parts[2:] != ["events", "public"]:
+                self.send_error(404)
+                return
+            query = parse_qs(url.query)
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["30"])[0])
+            with feeds.lock:
+                feed = list(feeds.events.get(parts[1], []))
+            body = json.dumps(feed[(page - 1) * per_page:page * per_page]).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if page == 1 and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            if page * per_page < len(feed):
+                host = self.headers.get("Host")
+                self.send_header("Link", f'<http://{host}{url.path}?per_page={per_page}&page={page + 1}>; rel="next"')
+            self.end_headers()
+            self.wfile.write(body)
+    return Handler
+
+def timed_round(client, usernames, label):
+    before = client.requests_made
+    before_304 = client.not_modified
+    started = time.perf_counter()
+    results = client.sync_many(usernames)
+    elapsed = time.perf_counter() - started
+    errors = [outcome for outcome in results.values() if isinstance(outcome, Exception)]
+    new = sum(outcome for outcome in results.values() if not isinstance(outcome, Exception))
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms   requests: {client.requests_made - before:5d}   "
+          f"304s: {client.not_modified - before_304:5d}   new events: {new:6d}   errors: {len(errors)}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--events", type=int, default=250)
+    parser.add_argument("--new", type=int, default=5)
+    args = parser.parse_args()
+
+    feeds = StubFeeds()
+    usernames = [f"user{i}" for i in range(args.users)]
+    for username in usernames:
+        feeds.add(username, args.events)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(feeds))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory(prefix="shadow_github_") as tmp:
+        client = GitHubSync(db_path=os.path.join(tmp, "github_cache.db"),
+                            api_url=f"http://127.0.0.1:{server.server_port}", token="")
+        print(f"--- {args.users} feeds x {args.events} events ---")
+        timed_round(client, usernames, "cold sync")
+        timed_round(client, usernames, "unchanged (304)")
+        for username in usernames:
+            feeds.add(username, args.new)
+        timed_round(client, usernames, f"+{args.new} events/feed")
+        has_code, summary = client.recent_activity(usernames[0])
+        print(f"{usernames[0]}: {has_code} - {summary[:80]}...")
+        storage.close_all()
+    server.shutdown()
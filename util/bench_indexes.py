@@ -0,0 +1,98 @@
+"""Benchmark: hot queries on a million-row player DB, before and after the index migration.
+
+Builds a DB at migration 0001 (no secondary indexes) with --rows quests and
+--rows audit_logs, times the hot queries, applies the remaining migrations
+(timing the index build), and times them again.
+
+Usage:
+    python util/bench_indexes.py --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents import migrations  # noqa: E402
+from bench_shards import percentile  # noqa: E402
+
+QUERIES = {
+    "active quest (/status)": (
+        "SELECT title, description, difficulty, stat_reward_type, stat_reward_value, deadline "
+        "FROM quests WHERE status='ACTIVE' ORDER BY id DESC LIMIT 1", ()),
+    "completed quests (arise)": (
+        "SELECT title, description FROM quests WHERE status='COMPLETED' ORDER BY id DESC LIMIT 5", ()),
+    "audit logs for a day": (
+        "SELECT content, audit_result FROM audit_logs WHERE log_date = ? ORDER BY id DESC", None),
+    "weakest stat (quest_master)": (
+        "SELECT stat_name, value FROM player_stats ORDER BY value ASC LIMIT 1", ()),
+    "latest user_context": (
+        "SELECT grand_goal, shadow_weakness, roadmap_json FROM user_context ORDER BY id DESC LIMIT 1", ()),
+}
+
+def populate(path, rows, seed):
+    migrations.migrate(path, target=1)
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    # Mostly finished quests; the few ACTIVE ones sit early in the table (worst case for a scan).
+    conn.executemany(
+        "INSERT INTO quests (title, description, difficulty, status, stat_reward_type, stat_reward_value) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"Quest {i}", "Bench quest " * 4, rng.choice("EDCBAS"),
+          "ACTIVE" if i < 3 else rng.choice(("COMPLETED", "COMPLETED", "FAILED")), "Strength", 2)
+         for i in range(rows)))
+    conn.executemany(
+        "INSERT INTO audit_logs (log_date, content, audit_result) VALUES (?, ?, ?)",
+        # ~1000 days of history, oldest first
+        (((today - datetime.timedelta(days=(rows - 1 - i) * 1000 // rows)).isoformat(),
+          f"Stat Change: Strength +{i % 5}", "bench") for i in range(rows)))
+    conn.executemany(
+        "INSERT INTO user_context (grand_goal, shadow_weakness, roadmap_json) VALUES (?, ?, ?)",
+        ((f"Goal {i}", "Procrastination", "[]") for i in range(1000)))
+    conn.commit()
+    conn.close()
+
+def time_queries(path, iterations, label):
+    day = (datetime.date.today() - datetime.timedelta(days=500)).isoformat()
+    conn = sqlite3.connect(path)
+    print(f"--- {label} (schema version {migrations.current_version(conn)}) ---")
+    for name, (sql, params) in QUERIES.items():
+        params = params if params is not None else (day,)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        plan = "; ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        print(f"{name:<28} p50: {statistics.median(samples):9.3f} ms   p99: {percentile(samples, 99):9.3f} ms   [{plan}]")
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="shadow_indexes_") as tmp:
+        path = os.path.join(tmp, "player_stats.db")
+        started = time.perf_counter()
+        populate(path, args.rows, args.seed)
+        print(f"populated {args.rows} quests + {args.rows} audit_logs in {time.perf_counter() - started:.1f} s")
+
+        time_queries(path, args.iterations, "before")
+        started = time.perf_counter()
+        applied = migrations.migrate(path)
+        print(f"migrations {applied} applied in {time.perf_counter() - started:.2f} s")
+        time_queries(path, args.iterations, "after")
@@ -0,0 +1,87 @@
+"""Load test: GET /status latency while many onboarding chats wait on Gemini.
+
+Gemini is replaced by an in-process stand-in that takes --gemini-latency
+seconds per call, so the test measures the server, not the network.
+
+Usage:
+    python util/bench_onboarding_load.py --chats 64 --gemini-latency 2.0
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import httpx  # noqa: E402
+import backend.main as backend  # noqa: E402
+from agents import gemini, onboarding  # noqa: E402
+from agents.llm_cache import cache as response_cache  # noqa: E402
+from google.genai import types  # noqa: E402
+from bench_status import make_db, percentile  # noqa: E402
+
+class SlowGemini:
+    """Async stand-in for genai.Client: every call takes `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.aio = SimpleNamespace(models=self)
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.latency)
+        return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(
+            role="model", parts=[types.Part(text="Rank recorded. [Q2] What is your Great Quest?")]))])
+
+async def poll_status(http, count, interval):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await http.get("/status")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+async def chat(http):
+    response = await http.post("/onboarding/chat", json={"history": [], "message": "Junior engineer."})
+    response.raise_for_status()
+
+def report(label, samples):
+    print(f"{label:<28} p50: {statistics.median(samples):7.3f} ms   p99: {percentile(samples, 99):7.3f} ms")
+
+async def run(chats, latency, polls):
+    gemini.set_client(SlowGemini(latency))
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        idle = await poll_status(http, polls, 0.005)
+
+        in_flight = [asyncio.create_task(chat(http)) for _ in range(chats)]
+        await asyncio.sleep(0.05)  # Let every chat reach its Gemini await
+        loaded = await poll_status(http, polls, 0.005)
+        await asyncio.gather(*in_flight)
+
+    print(f"--- /status with {chats} onboarding chats in flight (Gemini stand-in: {latency}s/call) ---")
+    report("idle", idle)
+    report(f"{chats} chats in flight", loaded)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=64)
+    parser.add_argument("--gemini-latency", type=float, default=2.0)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="shadow_bench_")
+    try:
+        backend.storage.DB_PATH = onboarding.SESSIONS.db_path = make_db(tmp, baseline=False)
+        response_cache.db_path = os.path.join(tmp, "llm_cache.db")  # Keep the real cache untouched
+        asyncio.run(run(args.chats, args.gemini_latency, args.polls))
+    finally:
+        backend.storage.close_all()
+        shutil.rmtree(tmp, ignore_errors=True)
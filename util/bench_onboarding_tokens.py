@@ -0,0 +1,117 @@
+"""Benchmark: input tokens per onboarding turn, before and after compaction.
+
+Replays one scripted interview (three answers, one rejected as gibberish,
+then Genesis) through onboarding.process_chat against a stand-in Gemini
+client that bills input tokens the way the API does (system instruction +
+contents), in two configurations:
+
+  full      whole history every turn (the old behaviour)
+  compact   captured answers sent as one JSON summary, Genesis from it alone
+
+The interview instruction is sent inline in both: it is below Gemini's
+minimum size for a context cache, so there are no cached tokens to save.
+
+Usage:
+    python util/bench_onboarding_tokens.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from google.genai import types  # noqa: E402
+from agents import gemini, onboarding  # noqa: E402
+from agents.llm_cache import cache as response_cache  # noqa: E402
+from agents.model_router import HYDRA, estimate_tokens, router  # noqa: E402
+
+GREETING = "SYSTEM ONLINE. Player detected. What is your current rank/skill level in your primary domain?"
+SCRIPT = [
+    ("Second-year master's student in distributed systems. I ship Python and Go daily, I am solid on "
+     "networking and databases, weaker on formal proofs. Competitive programming: around 1700 on Codeforces. "
+     "Physically: Sambo twice a week, blue belt level, decent cardio but my strength has stalled.",
+     "Rank recorded: C-Rank Engineer. [Q2] What is the singular 'Great Quest' you must clear in the next 12 weeks?"),
+    ("idk",
+     "Unacceptable. The System does not accept evasions. [Q2] Name your Great Quest."),
+    ("Finish and defend my thesis on consensus under partial synchrony: the implementation is half done, "
+     "the evaluation chapter is empty, and my advisor wants a full draft by week 10. In parallel I want an "
+     "internship offer for the summer, which means interview prep on top of it.",
+     "Objective logged. [Q3] What is your primary 'Shadow' (weakness)? (e.g., Burnout, Procrastination, Math)."),
+    ("Procrastination that turns into burnout: I avoid the hard chapter for days, then pull all-nighters, "
+     "skip training and sleep four hours until I crash for a weekend.",
+     "ANALYSIS COMPLETE. INITIATING GENESIS..."),
+]
+GENESIS = {
+    "grand_goal": "Defend the thesis", "shadow_weakness": "Procrastination -> burnout",
+    "roadmap": {"Week 1": "Evaluation plan"},
+    "initial_quests": [{"title": "Write 500 words of chapter 4", "difficulty": "D", "reward_stat": "Intelligence"}],
+}
+
+class TokenMeter:
+    """Stand-in genai.Client: scripted replies, usage_metadata counted like the API bills it."""
+
+    def __init__(self):
+        self.replies = []
+        self.models = self
+        self.aio = SimpleNamespace(models=self)
+
+    async def generate_content(self, model, contents, config=None):
+        prompt = estimate_tokens(config.system_instruction) + estimate_tokens(contents)
+        usage = types.GenerateContentResponseUsageMetadata(prompt_token_count=prompt)
+        if config.response_mime_type == "application/json":
+            return types.GenerateContentResponse(parsed=GENESIS, usage_metadata=usage, candidates=[
+                types.Candidate(content=types.Content(role="model", parts=[types.Part(text="{}")]))])
+        return types.GenerateContentResponse(usage_metadata=usage, candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text=self.replies.pop(0))]))])
+
+def input_tokens():
+    usage = router.usage()
+    return sum(usage.get(site, {}).get("input_tokens", 0) for site in ("process_chat", "generate_genesis_data"))
+
+async def interview(meter):
+    """Input tokens per turn (the last turn includes Genesis)."""
+    history = [{"role": "model", "content": GREETING}]
+    meter.replies = [reply for _, reply in SCRIPT]
+    turns = []
+    for answer, _ in SCRIPT:
+        before = input_tokens()
+        result = await onboarding.process_chat(history, answer)
+        after = input_tokens()
+        turns.append(after - before)
+        history += [{"role": "user", "content": answer}, {"role": "model", "content": result["reply"]}]
+    return turns
+
+async def run(tmp):
+    meter = TokenMeter()
+    gemini.set_client(meter)
+    response_cache.db_path = os.path.join(tmp, "llm_cache.db")  # Keep the real cache untouched
+    for model in HYDRA:
+        router.configure(model, 10_000, 10**9)  # Every turn on the first model, no free-tier limits
+    columns = {}
+    for label, compact in (("full", False), ("compact", True)):
+        onboarding.COMPACT_HISTORY = compact
+        response_cache.clear()  # No hits across configurations
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            columns[label] = await interview(meter)
+        finally:
+            sys.stdout = stdout
+
+    print(f"{'turn':<10}" + "".join(f"{label:>18}" for label in columns))
+    for turn in range(len(SCRIPT)):
+        name = f"{turn + 1}" + (" +genesis" if turn == len(SCRIPT) - 1 else "")
+        print(f"{name:<10}" + "".join(f"{turns[turn]:>18}" for turns in columns.values()))
+    totals = {label: sum(turns) for label, turns in columns.items()}
+    print(f"{'total':<10}" + "".join(f"{total:>18}" for total in totals.values()))
+    print(f"--- compact: {totals['compact'] / totals['full']:.0%} of full input ---")
+
+if __name__ == "__main__":
+    tmp = tempfile.mkdtemp(prefix="shadow_tokens_")
+    try:
+        asyncio.run(run(tmp))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
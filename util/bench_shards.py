@@ -0,0 +1,91 @@
+"""Benchmark: per-player SQLite shards under a file-descriptor budget.
+
+Provisions --players shards, then runs a mixed workload (status reads +
+stat writes) against random players from several threads. The connection
+LRU in agents/storage.py keeps open files within SHADOW_DB_FD_BUDGET.
+
+Usage:
+    SHADOW_DB_FD_BUDGET=384 python util/bench_shards.py --players 10000 --ops 50000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agents import storage, tenants  # noqa: E402
+
+def read_status(player_id):
+    with tenants.connection(player_id) as conn:
+        conn.execute("SELECT level, xp, job_class, is_in_dungeon FROM player_profile WHERE id=1").fetchone()
+        conn.execute("SELECT stat_name, value FROM player_stats").fetchall()
+        conn.execute("SELECT title FROM quests WHERE status='ACTIVE' ORDER BY id DESC LIMIT 1").fetchone()
+
+def write_stat(player_id):
+    with tenants.connection(player_id) as conn:
+        conn.execute("UPDATE player_stats SET value = value + 1 WHERE stat_name = 'Strength'")
+        conn.execute("INSERT INTO audit_logs (content, audit_result) VALUES (?, ?)", ("Stat Change: Strength +1", "bench"))
+        conn.commit()
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(players, ops, threads, write_ratio, seed):
+    player_ids = [f"player-{i:05d}" for i in range(players)]
+
+    started = time.perf_counter()
+    for player_id in player_ids:
+        tenants.ensure_player(player_id)
+    provision_s = time.perf_counter() - started
+
+    rng = random.Random(seed)
+    plan = [(rng.choice(player_ids), rng.random() < write_ratio) for _ in range(ops)]
+
+    def op(item):
+        player_id, is_write = item
+        start = time.perf_counter()
+        (write_stat if is_write else read_status)(player_id)
+        return is_write, (time.perf_counter() - start) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(op, plan))
+    elapsed = time.perf_counter() - started
+
+    reads = [ms for is_write, ms in results if not is_write]
+    writes = [ms for is_write, ms in results if is_write]
+    stats = storage.pool_stats()
+
+    print(f"--- {players} player shards, {ops} ops, {threads} threads, {write_ratio:.0%} writes ---")
+    print(f"provisioning: {provision_s:.2f} s ({provision_s / players * 1000:.3f} ms/player)")
+    print(f"throughput: {ops / elapsed:.0f} ops/s")
+    for label, samples in (("reads", reads), ("writes", writes)):
+        if samples:
+            print(f"{label:<7} p50: {statistics.median(samples):.3f} ms   p99: {percentile(samples, 99):.3f} ms")
+    print(f"fd budget: {storage.FD_BUDGET} ({stats['max_open_connections']} connections)  "
+          f"open: {stats['open_connections']}  pools: {stats['pools']}  evicted pools: {stats['evicted_pools']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="shadow_shards_")
+    tenants.PLAYERS_DIR = tmp
+    try:
+        run(args.players, args.ops, args.threads, args.write_ratio, args.seed)
+    finally:
+        storage.close_all()
+        shutil.rmtree(tmp, ignore_errors=True)
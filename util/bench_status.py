@@ -0,0 +1,103 @@
+"""Benchmark: GET /status latency while a grant_xp writer hammers the DB.
+
+Usage:
+    python util/bench_status.py               # pooled WAL access layer + status snapshot
+    python util/bench_status.py --baseline    # legacy connect-per-request, rollback journal, no snapshot
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import backend.main as backend  # noqa: E402
+from agents import migrations, sovereign  # noqa: E402
+
+def make_db(directory, baseline):
+    path = os.path.join(directory, 'player_stats.db')
+    migrations.migrate(path)
+    conn = sqlite3.connect(path)
+    if baseline:
+        conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("INSERT INTO quests (title, description, difficulty, stat_reward_type, stat_reward_value) VALUES ('Leg Day', 'Squat.', 'D', 'Strength', 2)")
+    conn.execute("INSERT INTO user_context (grand_goal, shadow_weakness, roadmap_json) VALUES ('Thesis', 'Burnout', '{\"Week 1\": \"Calibration\"}')")
+    conn.commit()
+    conn.close()
+    return path
+
+def legacy_connection(path):
+    @contextmanager
+    def _connect(player_id=None):
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    return _connect
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(requests, readers, baseline):
+    tmp = tempfile.mkdtemp(prefix="shadow_bench_")
+    try:
+        path = make_db(tmp, baseline)
+        backend.storage.DB_PATH = path  # Default player resolves here (agents/tenants.py)
+        if baseline:
+            backend.get_db_connection = legacy_connection(path)
+
+        # Baseline has no snapshot cache: every poll runs the queries.
+        load = backend.build_status if baseline else backend.load_status_snapshot
+
+        stop = threading.Event()
+        writes = 0
+
+        def writer():
+            nonlocal writes
+            while not stop.is_set():
+                sovereign.grant_xp(1, "bench")
+                writes += 1
+
+        def poll(_):
+            start = time.perf_counter()
+            load()
+            return (time.perf_counter() - start) * 1000
+
+        writer_thread = threading.Thread(target=writer, daemon=True)
+        writer_thread.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=readers) as pool:
+            samples = list(pool.map(poll, range(requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        writer_thread.join()
+
+        mode = "baseline (connect-per-request, rollback journal)" if baseline else "pooled WAL + snapshot"
+        print(f"--- /status under concurrent grant_xp: {mode} ---")
+        print(f"requests: {requests}  readers: {readers}  writer commits: {writes}")
+        print(f"p50: {statistics.median(samples):.3f} ms")
+        print(f"p99: {percentile(samples, 99):.3f} ms")
+        print(f"max: {max(samples):.3f} ms")
+        print(f"throughput: {requests / elapsed:.0f} req/s")
+    finally:
+        backend.storage.close_all()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+    run(args.requests, args.readers, args.baseline)
@@ -1,10 +1,11 @@
 import os
-import google.genai as genai
-from dotenv import load_dotenv
+import sys
 
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from agents import gemini
+
+client = gemini.get_client()
 
 try:
     print("Listing available models...")
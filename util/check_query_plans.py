@@ -0,0 +1,133 @@
+"""Query-plan regression check.
+
+Collects every SELECT/UPDATE/DELETE string literal from the hot modules,
+runs EXPLAIN QUERY PLAN against a freshly migrated database, and fails if a
+query sorts through a temp B-tree or scans a table without an index.
+Run it after touching db/migrations or the SQL in those modules:
+
+    python util/check_query_plans.py        # exit 1 on regressions
+"""
+import ast
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agents import migrations  # noqa: E402
+
+MODULES = [
+    os.path.join(PROJECT_ROOT, 'backend', 'main.py'),
+    os.path.join(PROJECT_ROOT, 'agents', 'quest_master.py'),
+    os.path.join(PROJECT_ROOT, 'agents', 'sovereign.py'),
+    os.path.join(PROJECT_ROOT, 'agents', 'skills.py'),
+    os.path.join(PROJECT_ROOT, 'agents', 'rules.py'),
+]
+
+# Full scans that are fine: single-row tables, queries that read the whole
+# table on purpose (no WHERE/ORDER BY), and newest-first reads that walk the
+# rowid B-tree backwards and stop at LIMIT.
+SCAN_OK = {"player_profile"}
+ROWID_ORDER_OK = {"user_context"}
+
+SQL_VERBS = ("SELECT ", "UPDATE ", "DELETE ", "WITH ")  # Upper case, as the repo writes SQL
+
+def _constants(tree):
+    """Module-level NAME = 'string' assignments (to render f-string SQL)."""
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    found[target.id] = node.value.value
+    return found
+
+def _render(node, constants):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and value.value.id in constants:
+                parts.append(constants[value.value.id])
+            else:
+                return None  # Dynamic SQL we can't render statically
+        return "".join(parts)
+    return None
+
+def collect_queries(path):
+    """[(lineno, sql)] for SQL string literals in `path`."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    constants = _constants(tree)
+    queries = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            for value in node.values:
+                value._in_fstring = True
+        if getattr(node, "_in_fstring", False):
+            continue
+        sql = _render(node, constants)
+        if sql:
+            sql = " ".join(sql.split())
+            if sql.startswith(SQL_VERBS):
+                queries.append((node.lineno, sql))
+    return sorted(set(queries))
+
+def build_database(directory):
+    db_path = os.path.join(directory, 'player_stats.db')
+    migrations.migrate(db_path)
+    return sqlite3.connect(db_path)
+
+def problems(plan, sql):
+    """Plan rows that mean a sort or an unindexed table scan."""
+    found = []
+    upper = sql.upper()
+    for detail in plan:
+        if "USE TEMP B-TREE" in detail:
+            found.append(detail)
+        elif detail.startswith("SCAN ") and "INDEX" not in detail and "PRIMARY KEY" not in detail:
+            table = detail.split()[1]
+            if table in SCAN_OK or ("WHERE" not in upper and "ORDER BY" not in upper):
+                continue
+            if (table in ROWID_ORDER_OK and "WHERE" not in upper
+                    and "ORDER BY ID DESC" in upper and "LIMIT" in upper):
+                continue
+            found.append(detail)
+    return found
+
+def check(conn, modules=MODULES):
+    failures = 0
+    total = 0
+    for path in modules:
+        rel = os.path.relpath(path, PROJECT_ROOT)
+        for lineno, sql in collect_queries(path):
+            total += 1
+            try:
+                rows = conn.execute("EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?")).fetchall()
+            except sqlite3.Error as e:
+                print(f"FAIL {rel}:{lineno}: {e}\n     {sql}")
+                failures += 1
+                continue
+            plan = [row[3] for row in rows]
+            bad = problems(plan, sql)
+            status = "FAIL" if bad else "ok  "
+            print(f"{status} {rel}:{lineno}: {sql[:90]}")
+            for detail in plan:
+                print(f"       {'!!' if detail in bad else '  '} {detail}")
+            failures += bool(bad)
+    print(f"--- {total} queries, {failures} regression(s) ---")
+    return failures
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory(prefix="shadow_plans_") as tmp:
+        conn = build_database(tmp)
+        try:
+            failed = check(conn)
+        finally:
+            conn.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,57 @@
+"""Rules-engine keyword check.
+
+Runs sample log phrases through the activity patterns in agents/rules.py
+(plus db/rules.json, if present) and fails if a phrase matches the wrong
+categories: keywords must match whole words ("ran" is not "random") and
+`stem*` keywords every word built on the stem. Run it after touching the
+activity keywords:
+
+    python util/check_rules.py        # exit 1 on mismatches
+"""
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agents import rules  # noqa: E402
+
+# (phrase, stats of every category it must trigger; empty: none)
+CASES = [
+    ("Ran 5km before class", {"Strength", "Agility"}),
+    ("Went running by the river", {"Strength", "Agility"}),
+    ("Generated random test data", set()),
+    ("Reached C rank in the ladder", set()),
+    ("Read two papers on Raft", {"Intelligence"}),
+    ("Got the slides ready", set()),
+    ("Already done", set()),
+    ("Took a 20 min nap", {"Vitality", "Fatigue"}),
+    ("Bought napkins", set()),
+    ("Ten minutes of meditation", {"Vitality", "Fatigue"}),
+    ("Programming contest, 3 problems", {"Intelligence"}),
+    ("3 commits pushed to shadow-system", {"Intelligence"}),
+    ("Committee meeting all afternoon", set()),
+    ("100 push-ups, 50 squats", {"Strength", "Agility"}),
+    ("Sambo training then stretching", {"Strength", "Agility", "Vitality", "Fatigue"}),
+    ("Pulled an all-nighter", {"Fatigue"}),
+    ("Walked to the lab", {"Vitality", "Fatigue"}),
+    ("Walkie-talkie repair", set()),
+]
+
+def matched_stats(ruleset, phrase):
+    stats = set()
+    for pattern, deltas in ruleset.activities:
+        if pattern.search(phrase):
+            stats.update(deltas)
+    return stats
+
+if __name__ == "__main__":
+    ruleset = rules.default_rules()
+    failures = 0
+    for phrase, expected in CASES:
+        got = matched_stats(ruleset, phrase)
+        if got != expected:
+            failures += 1
+            print(f"FAIL  {phrase!r}: expected {sorted(expected) or 'no match'}, got {sorted(got) or 'no match'}")
+    print(f"{len(CASES) - failures}/{len(CASES)} keyword cases OK")
+    sys.exit(1 if failures else 0)